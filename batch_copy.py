@@ -0,0 +1,312 @@
+import json
+import os
+import time
+
+import pandas as pd
+from openai.types.responses import Response
+
+from company_index import COPY_COLUMNS, mark_failed
+from copywrite import (
+    COPY_TEXT_FORMAT,
+    STRUCTURED_OUTPUT_NOTE,
+    CopyValidationError,
+    parse_response,
+    parse_structured_response,
+    store_copy_result
+)
+from incremental import response_time
+from prompt_registry import build_prompt_input
+
+# Batch states after which polling stops
+BATCH_TERMINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+
+def batch_state_path_for(output_file) -> str:
+    """
+    Return where the id of a submitted, not yet applied batch is saved for an output file.
+
+    Args:
+        output_file (str): The output CSV or result store
+
+    Returns:
+        str: The state file path next to the output and its journal
+    """
+    return f"{output_file}.batch.json"
+
+def load_batch_state(state_path):
+    """
+    Read the saved batch id, if a batch was submitted and its results not yet applied.
+
+    Args:
+        state_path (str): The path from batch_state_path_for
+
+    Returns:
+        str: The batch ID, or None
+    """
+    if not state_path or not os.path.exists(state_path):
+        return None
+    with open(state_path, encoding="utf-8") as state_file:
+        return json.load(state_file).get("batch_id")
+
+def save_batch_state(state_path, batch_id):
+    """
+    Save a submitted batch's id, so a run stopped while waiting can reattach to it.
+
+    Args:
+        state_path (str): The path from batch_state_path_for, or None to skip saving
+        batch_id (str): The batch ID
+    """
+    if not state_path:
+        return
+    with open(state_path + ".tmp", "w", encoding="utf-8") as state_file:
+        json.dump({"batch_id": batch_id, "submitted_at": round(time.time())}, state_file)
+    os.replace(state_path + ".tmp", state_path)
+
+def build_batch_file(df, prompt, batch_file_path, model="gpt-4o", skip_indices=None, structured=False):
+    """
+    Serialize one Responses API request per lead into a Batch API JSONL file.
+
+    Each request uses the same model, tools and input layout as execute_api_call and
+    is tagged with a custom_id of the form "row-<index>" so results can be matched back.
+
+    Args:
+        df (pd.DataFrame): The DataFrame of leads
+        prompt (str): The prompt template loaded from CombinedPrompt.txt
+        batch_file_path (str): Where to write the JSONL file
+        model (str): The OpenAI model to use
+        skip_indices (set): Row indices already finished, e.g. from a checkpoint journal
+        structured (bool): Request JSON output matching COPY_SCHEMA instead of free text
+
+    Returns:
+        int: The number of requests written
+    """
+    skip_indices = skip_indices or set()
+    if structured:
+        prompt = prompt + STRUCTURED_OUTPUT_NOTE
+    count = 0
+    with open(batch_file_path, "w", encoding="utf-8") as batch_file:
+        for index, target_url in df["URL"].items():
+            if pd.isna(target_url) or target_url == "":
+                print(f"Skipping row {index+1} due to missing URL")
+                continue
+            if index in skip_indices:
+                continue
+
+            request = {
+                "custom_id": f"row-{index}",
+                "method": "POST",
+                "url": "/v1/responses",
+                "body": {
+                    "model": model,
+                    "tools": [
+                        {
+                            "type": "web_search_preview"
+                        }
+                    ],
+                    "input": build_prompt_input(prompt, f"Target:\n{target_url}"),
+                    "prompt_cache_key": "copywrite"
+                }
+            }
+            if structured:
+                request["body"]["text"] = COPY_TEXT_FORMAT
+            batch_file.write(json.dumps(request, ensure_ascii=False) + "\n")
+            count += 1
+
+    print(f"Wrote {count} batch requests to {batch_file_path}")
+    return count
+
+def submit_batch(client, batch_file_path):
+    """
+    Upload a batch JSONL file and create a batch job for the Responses endpoint.
+
+    Args:
+        client: The OpenAI client
+        batch_file_path (str): Path to the JSONL file from build_batch_file
+
+    Returns:
+        str: The batch ID
+    """
+    with open(batch_file_path, "rb") as batch_file:
+        uploaded_file = client.files.create(file=batch_file, purpose="batch")
+    print(f"Uploaded batch input file {uploaded_file.id}")
+
+    batch = client.batches.create(
+        input_file_id=uploaded_file.id,
+        endpoint="/v1/responses",
+        completion_window="24h"
+    )
+    print(f"Created batch {batch.id} with status {batch.status}")
+    return batch.id
+
+def wait_for_batch(client, batch_id, poll_interval=60):
+    """
+    Poll a batch until it reaches a terminal state.
+
+    Args:
+        client: The OpenAI client
+        batch_id (str): The batch ID from submit_batch
+        poll_interval (float): Seconds between status checks
+
+    Returns:
+        The final batch object
+    """
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = batch.request_counts
+        if counts is not None:
+            print(f"Batch {batch_id} is {batch.status}: {counts.completed}/{counts.total} completed, {counts.failed} failed")
+        else:
+            print(f"Batch {batch_id} is {batch.status}")
+
+        if batch.status in BATCH_TERMINAL_STATES:
+            return batch
+        time.sleep(poll_interval)
+
+def read_batch_errors(client, batch):
+    """
+    Download a finished batch's error file and log each failed request.
+
+    Args:
+        client: The OpenAI client
+        batch: The finished batch object from wait_for_batch
+
+    Returns:
+        dict: Row index mapped to the error message of each request in the error file
+    """
+    errors = {}
+    if not batch.error_file_id:
+        return errors
+
+    with client.files.with_streaming_response.content(batch.error_file_id) as error_file:
+        for line in error_file.iter_lines():
+            if not line:
+                continue
+            result = json.loads(line)
+            result_response = result.get("response") or {}
+            error = result.get("error") or (result_response.get("body") or {}).get("error") or {}
+            message = error.get("message") or f"status {result_response.get('status_code')}"
+            print(f"Batch request {result['custom_id']} failed: {error.get('code') or 'error'}: {message}")
+            errors[int(result["custom_id"].split("-", 1)[1])] = message
+    return errors
+
+def apply_batch_results(df, client, batch, model="gpt-4o", journal=None, structured=False):
+    """
+    Stream a finished batch's output file back into the Subject 1-4 and Body columns.
+
+    Requests that failed, whether listed in the output file with an error status or in
+    the batch's error file, are logged and returned for another round, as are results
+    that fail validation.
+
+    Args:
+        df (pd.DataFrame): The DataFrame the batch was built from
+        client: The OpenAI client
+        batch: The finished batch object from wait_for_batch
+        model (str): The model recorded in "AI Copy Generation Endpoint"
+        journal (CheckpointJournal): Optional journal recording each applied row
+        structured (bool): Parse and validate the output against COPY_SCHEMA
+
+    Returns:
+        set: Indices of rows that failed and can be re-requested
+    """
+    invalid = set()
+    errors = [index for index in read_batch_errors(client, batch) if index in df.index]
+    for index in errors:
+        mark_failed(df, index, COPY_COLUMNS, model)
+        invalid.add(index)
+    if not batch.output_file_id:
+        print(f"Batch {batch.id} has no output file (status {batch.status})")
+        return invalid
+
+    applied = 0
+    failed = 0
+    with client.files.with_streaming_response.content(batch.output_file_id) as output:
+        for line in output.iter_lines():
+            if not line:
+                continue
+
+            result = json.loads(line)
+            index = int(result["custom_id"].split("-", 1)[1])
+            result_response = result.get("response") or {}
+
+            if result.get("error") or result_response.get("status_code") != 200:
+                print(f"Batch request for row {index+1} failed: {result.get('error') or result_response.get('status_code')}")
+                mark_failed(df, index, COPY_COLUMNS, model)
+                invalid.add(index)
+                failed += 1
+                continue
+
+            try:
+                response = Response.model_validate(result_response["body"])
+                parsed_data = parse_structured_response(response) if structured else parse_response(response)
+                ceo_name = df.at[index, "CEO Name"] if pd.notna(df.at[index, "CEO Name"]) else ""
+                fields = store_copy_result(df, index, parsed_data, ceo_name, model=model, written_at=response_time(response))
+                if journal is not None:
+                    journal.record(index, df.at[index, "URL"], fields)
+                applied += 1
+            except CopyValidationError as e:
+                print(f"Batch result for row {index+1} failed validation: {str(e)}")
+                mark_failed(df, index, COPY_COLUMNS, model)
+                invalid.add(index)
+                failed += 1
+            except Exception as e:
+                print(f"\nError applying batch result for row {index+1}: {str(e)}")
+                mark_failed(df, index, COPY_COLUMNS, model)
+                failed += 1
+
+    print(f"Applied {applied} batch results, {failed} failed, {len(errors)} in the error file")
+    return invalid
+
+def run_batch_copy(df, prompt, client, batch_file_path="copy_batch_input.jsonl", poll_interval=60, model="gpt-4o", journal=None, structured=False, max_rounds=3, state_path=None, resume=False):
+    """
+    Generate copy for every lead through the Batch API instead of one synchronous call per row.
+
+    The client's base URL is honoured throughout, so pointing OPENAI_BASE_URL at a local
+    mock server (benchmark.MockResponsesServer) exercises the whole flow without network access.
+
+    Each submitted batch's id is saved to state_path until its results are applied, so a
+    run stopped while waiting reattaches to the same batch on resume instead of paying
+    for a second one.
+
+    Args:
+        df (pd.DataFrame): The DataFrame of leads
+        prompt (str): The prompt template loaded from CombinedPrompt.txt
+        client: The OpenAI client
+        batch_file_path (str): Where to write the batch input JSONL file
+        poll_interval (float): Seconds between batch status checks
+        model (str): The OpenAI model to use
+        journal (CheckpointJournal): Optional journal recording each applied row
+        structured (bool): Request JSON copy matching COPY_SCHEMA
+        max_rounds (int): Batches to submit; each later round holds only the rows that failed or failed validation
+        state_path (str): Where to save the in-flight batch id, e.g. batch_state_path_for(output_file)
+        resume (bool): Reattach to the batch saved in state_path, if any
+
+    Returns:
+        pd.DataFrame: The updated DataFrame
+    """
+    skip_indices = journal.completed if journal is not None else None
+    batch_id = load_batch_state(state_path)
+    if batch_id and resume:
+        print(f"Reattaching to batch {batch_id} from {state_path}")
+    elif batch_id:
+        print(f"Ignoring unfinished batch {batch_id} in {state_path}; pass --resume to reattach to it")
+        batch_id = None
+
+    batch_df = df
+    for round_number in range(max_rounds):
+        if batch_id is None:
+            if build_batch_file(batch_df, prompt, batch_file_path, model=model, skip_indices=skip_indices, structured=structured) == 0:
+                print("No leads to submit.")
+                break
+            batch_id = submit_batch(client, batch_file_path)
+            save_batch_state(state_path, batch_id)
+
+        batch = wait_for_batch(client, batch_id, poll_interval=poll_interval)
+        retry = apply_batch_results(df, client, batch, model=model, journal=journal, structured=structured)
+        batch_id = None
+        if state_path and os.path.exists(state_path):
+            os.remove(state_path)
+        if not retry:
+            break
+
+        print(f"Round {round_number+1}: {len(retry)} rows failed")
+        batch_df = df.loc[sorted(retry)]
+    return df
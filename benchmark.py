@@ -0,0 +1,561 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import queue
+import random
+import sys
+import tempfile
+import threading
+import time
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Scenarios the benchmark can run, in report order
+SCENARIOS = ["parse", "research", "research_async", "copy"]
+
+# Filler used to pad mock responses to a realistic size
+FILLER_SENTENCE = "The company builds connected hardware with computer vision and ships it to enterprise customers. "
+
+def build_mock_text(request_body, payload_chars, rng):
+    """
+    Build output text shaped like the real model output for the request's prompt.
+
+    Args:
+        request_body (dict): The decoded /v1/responses request
+        payload_chars (int): Approximate length of the text to return
+        rng (random.Random): Source of per-response variation
+
+    Returns:
+        str: Structured JSON copy, free-text copy or a target brief
+    """
+    prompt = json.dumps(request_body.get("input", ""))
+    filler = (FILLER_SENTENCE * (payload_chars // len(FILLER_SENTENCE) + 1))[:payload_chars]
+
+    if request_body.get("text", {}).get("format", {}).get("type") == "json_schema":
+        return json.dumps({
+            "product": "vision platform",
+            "highlight": "real-time defect detection",
+            "hook": "speed up development",
+            "subjects": [f"Subject idea {i} #{rng.randint(0, 9999)}" for i in range(1, 5)],
+            "body": f"{filler}\nWe would love to collaborate."
+        })
+    if "Subject Option" in prompt:
+        subjects = "\n".join(f"Subject Option {i}: Subject idea {i} #{rng.randint(0, 9999)}" for i in range(1, 5))
+        return f"{subjects}\nBody:\nHey [Target],\n{filler}\nCall me anytime at +1-000-000-0000"
+    return f"Target brief:\n{filler}"
+
+def build_mock_response(request_body, payload_chars, rng):
+    """
+    Build a Responses API body with a web search call, a cited message and usage.
+
+    Args:
+        request_body (dict): The decoded /v1/responses request
+        payload_chars (int): Approximate length of the output text
+        rng (random.Random): Source of per-response variation
+
+    Returns:
+        dict: The response body
+    """
+    text = build_mock_text(request_body, payload_chars, rng)
+    input_tokens = len(json.dumps(request_body.get("input", ""))) // 4
+    output = []
+    if request_body.get("tools"):
+        output.append({
+            "type": "web_search_call",
+            "id": f"ws_{rng.randint(0, 10**9)}",
+            "status": "completed",
+            "action": {"type": "search", "query": "company overview"}
+        })
+    output.append({
+        "type": "message",
+        "id": f"msg_{rng.randint(0, 10**9)}",
+        "status": "completed",
+        "role": "assistant",
+        "content": [{
+            "type": "output_text",
+            "text": text,
+            "annotations": [{"type": "url_citation", "start_index": 0, "end_index": 10, "url": "https://example.com", "title": "Example"}]
+        }]
+    })
+    return {
+        "id": f"resp_{rng.randint(0, 10**9)}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": request_body.get("model", "gpt-4o"),
+        "status": "completed",
+        "output": output,
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": request_body.get("tools", []),
+        "usage": {
+            "input_tokens": input_tokens,
+            "input_tokens_details": {"cached_tokens": input_tokens * 3 // 4, "cache_write_tokens": 0},
+            "output_tokens": len(text) // 4,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": input_tokens + len(text) // 4
+        }
+    }
+
+def multipart_file(content_type, body) -> bytes:
+    """
+    Return the "file" field of a multipart/form-data upload.
+
+    Args:
+        content_type (str): The request's Content-Type header, with the boundary
+        body (bytes): The request body
+
+    Returns:
+        bytes: The uploaded file's content, empty if there is no file field
+    """
+    message = BytesParser(policy=policy.HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode("utf-8") + body)
+    for part in message.iter_parts():
+        if part.get_param("name", header="content-disposition") == "file":
+            return part.get_payload(decode=True)
+    return b""
+
+class MockResponsesServer:
+    """
+    Local stand-in for the /v1/responses endpoint with configurable latency and 429s.
+
+    Point a client's base_url at the value returned by start() to exercise the real
+    request, retry and parsing code without network access or API credits. The
+    /v1/files and /v1/batches endpoints used by batch_copy are served too: a batch
+    answers every request with a mock response, except for error_rate of them, which
+    go to the batch's error file, and completes on its second status check.
+    """
+
+    def __init__(self, latency_ms=800.0, latency_sigma=0.5, error_rate=0.0, payload_chars=4000,
+                 requests_per_minute=10000, tokens_per_minute=10000000, seed=0):
+        """
+        Args:
+            latency_ms (float): Median response latency in milliseconds
+            latency_sigma (float): Log-normal spread of the latency; 0 makes it fixed
+            error_rate (float): Share of requests answered with a 429
+            payload_chars (int): Approximate length of each response's output text
+            requests_per_minute (int): Limit reported in the x-ratelimit-* headers
+            tokens_per_minute (int): Limit reported in the x-ratelimit-* headers
+            seed (int): Seed for latency, 429 and payload variation
+        """
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.payload_chars = payload_chars
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "rate_limited": 0, "bytes_sent": 0, "batches": 0}
+        self.files = {}
+        self.batches = {}
+        self.server = None
+
+    def _next_request(self):
+        with self.lock:
+            self.stats["requests"] += 1
+            delay = self.latency_ms / 1000 * self.rng.lognormvariate(0, self.latency_sigma)
+            rate_limited = self.rng.random() < self.error_rate
+            if rate_limited:
+                self.stats["rate_limited"] += 1
+            seed = self.rng.randint(0, 10**9)
+        return delay, rate_limited, random.Random(seed)
+
+    def _store_file(self, content, purpose):
+        with self.lock:
+            file_id = f"file-{len(self.files)}"
+            self.files[file_id] = content
+        return {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": f"{file_id}.jsonl",
+            "purpose": purpose,
+            "status": "processed"
+        }
+
+    def _create_batch(self, request_body):
+        """
+        Run every request of a batch input file and store its output and error files.
+        """
+        output_lines = []
+        error_lines = []
+        for line in self.files[request_body["input_file_id"]].splitlines():
+            if not line.strip():
+                continue
+            batch_request = json.loads(line)
+            with self.lock:
+                failed = self.rng.random() < self.error_rate
+                rng = random.Random(self.rng.randint(0, 10**9))
+            result = {"id": f"batch_req_{rng.randint(0, 10**9)}", "custom_id": batch_request["custom_id"]}
+            if failed:
+                error_lines.append(json.dumps({**result, "response": None, "error": {"code": "server_error", "message": "Mock batch request failed"}}))
+            else:
+                response = build_mock_response(batch_request["body"], self.payload_chars, rng)
+                output_lines.append(json.dumps({**result, "response": {"status_code": 200, "request_id": result["id"], "body": response}, "error": None}))
+
+        output_file = self._store_file("\n".join(output_lines).encode("utf-8"), "batch_output") if output_lines else None
+        error_file = self._store_file("\n".join(error_lines).encode("utf-8"), "batch_output") if error_lines else None
+        with self.lock:
+            batch_id = f"batch_{len(self.batches)}"
+            self.stats["batches"] += 1
+            self.batches[batch_id] = {
+                "id": batch_id,
+                "object": "batch",
+                "endpoint": request_body["endpoint"],
+                "input_file_id": request_body["input_file_id"],
+                "completion_window": request_body["completion_window"],
+                "status": "validating",
+                "created_at": int(time.time()),
+                "output_file_id": None,
+                "error_file_id": None,
+                "request_counts": {"total": len(output_lines) + len(error_lines), "completed": 0, "failed": 0},
+                "_result": (output_file, error_file, len(output_lines), len(error_lines))
+            }
+            return self._public_batch(batch_id)
+
+    def _poll_batch(self, batch_id):
+        """
+        Advance a batch from validating to in_progress to completed, one step per status check.
+        """
+        with self.lock:
+            batch = self.batches[batch_id]
+            if batch["status"] == "validating":
+                batch["status"] = "in_progress"
+            elif batch["status"] == "in_progress":
+                output_file, error_file, completed, failed = batch["_result"]
+                batch["status"] = "completed"
+                batch["output_file_id"] = output_file["id"] if output_file else None
+                batch["error_file_id"] = error_file["id"] if error_file else None
+                batch["request_counts"] = {"total": completed + failed, "completed": completed, "failed": failed}
+            return self._public_batch(batch_id)
+
+    def _public_batch(self, batch_id):
+        return {key: value for key, value in self.batches[batch_id].items() if not key.startswith("_")}
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def send_json(self, status, body, headers):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+                with mock.lock:
+                    mock.stats["bytes_sent"] += len(data)
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0].rstrip("/")
+                parts = path.split("/")
+                if "/batches/" in path and parts[-2] == "batches" and parts[-1] in mock.batches:
+                    self.send_json(200, mock._poll_batch(parts[-1]), {})
+                elif path.endswith("/content") and parts[-2] in mock.files:
+                    data = mock.files[parts[-2]]
+                    self.send_response(200)
+                    self.send_header("content-type", "application/octet-stream")
+                    self.send_header("content-length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                else:
+                    self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}}, {})
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("content-length", 0)))
+                path = self.path.split("?", 1)[0].rstrip("/")
+                if path.endswith("/files"):
+                    self.send_json(200, mock._store_file(multipart_file(self.headers.get("content-type", ""), body), "batch"), {})
+                    return
+                if path.endswith("/batches"):
+                    request_body = json.loads(body or b"{}")
+                    if request_body.get("input_file_id") not in mock.files:
+                        self.send_json(400, {"error": {"message": "Unknown input_file_id"}}, {})
+                        return
+                    self.send_json(200, mock._create_batch(request_body), {})
+                    return
+
+                request_body = json.loads(body or b"{}")
+                if not path.endswith("/responses"):
+                    self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}}, {})
+                    return
+
+                delay, rate_limited, rng = mock._next_request()
+                if rate_limited:
+                    self.send_json(429, {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}, {
+                        "retry-after-ms": "200",
+                        "x-ratelimit-remaining-requests": "0"
+                    })
+                    return
+
+                time.sleep(delay)
+                self.send_json(200, build_mock_response(request_body, mock.payload_chars, rng), {
+                    "x-ratelimit-limit-requests": str(mock.requests_per_minute),
+                    "x-ratelimit-limit-tokens": str(mock.tokens_per_minute),
+                    "x-ratelimit-remaining-requests": str(mock.requests_per_minute - 1),
+                    "x-ratelimit-remaining-tokens": str(mock.tokens_per_minute - 5000)
+                })
+
+        return Handler
+
+    def start(self) -> str:
+        """
+        Start serving on a free local port in a background thread.
+
+        Returns:
+            str: The base URL to pass to the OpenAI client
+        """
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def stop(self):
+        """
+        Stop the server.
+        """
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+def make_benchmark_leads(rows, seed=0) -> pd.DataFrame:
+    """
+    Build a synthetic lead list with the columns the scripts read.
+
+    Args:
+        rows (int): Number of leads
+        seed (int): Seed for the generated names
+
+    Returns:
+        pd.DataFrame: The leads
+    """
+    rng = random.Random(seed)
+    return pd.DataFrame({
+        "Name": [f"Company {i}" for i in range(rows)],
+        "URL": [f"https://company{i}.example.com" for i in range(rows)],
+        "Industry": [rng.choice(["Robotics", "IoT", "Computer Vision", "Health"]) for _ in range(rows)],
+        "Description": ["Builds connected devices with computer vision." for _ in range(rows)],
+        "CEO Name": [f"Alex{i} Smith" for i in range(rows)],
+        "CEO Email": [f"alex{i}@company{i}.example.com" for i in range(rows)]
+    })
+
+def peak_rss_mb() -> float:
+    """
+    Return this process's peak resident set size in MB, or NaN where it is unavailable.
+    """
+    if resource is None:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def timed(function, latencies):
+    """
+    Wrap a per-row call so each call's wall time is appended to latencies.
+    """
+    if asyncio.iscoroutinefunction(function):
+        async def async_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                latencies.append(time.perf_counter() - start)
+        return async_wrapper
+
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+    return wrapper
+
+def run_scenario(scenario, base_url, rows, concurrency, payload_chars, work_dir, results):
+    """
+    Run one scenario end-to-end against the mock server and report its measurements.
+
+    Runs in its own process so peak RSS belongs to the scenario alone. The scripts'
+    progress output is discarded.
+
+    Args:
+        scenario (str): One of SCENARIOS
+        base_url (str): The mock server's base URL
+        rows (int): Number of leads
+        concurrency (int): Calls in flight for research_async
+        payload_chars (int): Response text length, used by the parse scenario
+        work_dir (str): Directory for output files
+        results (multiprocessing.Queue): Receives the result dict
+    """
+    from openai import AsyncOpenAI, OpenAI
+    from openai.types.responses import Response
+
+    import copywrite
+    import rate_limiter
+    import target_brief
+    from checkpoint import CheckpointJournal
+
+    # Pace only on what the mock server reports, not the production defaults
+    rate_limiter.default_rate_limiter = rate_limiter.RateLimiter(requests_per_minute=100000, tokens_per_minute=10**9)
+
+    df = make_benchmark_leads(rows)
+    output_file = os.path.join(work_dir, f"{scenario}.csv")
+    journal = CheckpointJournal(os.path.join(work_dir, f"{scenario}.journal.jsonl"))
+    latencies = []
+
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        if scenario == "parse":
+            rng = random.Random(0)
+            responses = [
+                Response.model_validate(build_mock_response({"input": "Subject Option", "tools": [{"type": "web_search_preview"}]}, payload_chars, rng))
+                for _ in range(rows)
+            ]
+            start = time.perf_counter()
+            for index, response in zip(df.index, responses):
+                row_start = time.perf_counter()
+                fields = copywrite.store_copy_result(df, index, copywrite.parse_response(response), df.at[index, "CEO Name"])
+                journal.record(index, df.at[index, "URL"], fields)
+                latencies.append(time.perf_counter() - row_start)
+        elif scenario == "research":
+            target_brief.target_research_search = timed(target_brief.target_research_search, latencies)
+            client = OpenAI(api_key="benchmark", base_url=base_url, max_retries=0)
+            df = target_brief.research_companies(df, "target_brief_prompt.txt", client, journal=journal)
+        elif scenario == "research_async":
+            target_brief.async_target_research_search = timed(target_brief.async_target_research_search, latencies)
+            client = AsyncOpenAI(api_key="benchmark", base_url=base_url, max_retries=0)
+            df = asyncio.run(target_brief.research_companies_async(df, "target_brief_prompt.txt", client, max_concurrency=concurrency, journal=journal))
+        elif scenario == "copy":
+            copywrite.execute_api_call = timed(copywrite.execute_api_call, latencies)
+            client = OpenAI(api_key="benchmark", base_url=base_url, max_retries=0)
+            prompt = copywrite.default_prompt_registry.get("CombinedPrompt.txt").text
+            df = copywrite.openai_call(df, prompt, client, journal=journal)
+        df.to_csv(output_file, index=False)
+    elapsed = time.perf_counter() - start
+    journal.close()
+
+    percentiles = np.percentile(latencies, [50, 95, 99]) * 1000 if latencies else [float("nan")] * 3
+    results.put({
+        "scenario": scenario,
+        "rows": rows,
+        "seconds": elapsed,
+        "rows_per_sec": rows / elapsed if elapsed else float("nan"),
+        "p50_ms": percentiles[0],
+        "p95_ms": percentiles[1],
+        "p99_ms": percentiles[2],
+        "peak_rss_mb": peak_rss_mb(),
+        "bytes_written": sum(os.path.getsize(os.path.join(work_dir, name)) for name in os.listdir(work_dir) if name.startswith(f"{scenario}."))
+    })
+
+def run_benchmark(scenarios=None, rows=50, concurrency=10, latency_ms=800.0, latency_sigma=0.5, error_rate=0.0, payload_chars=4000, seed=0):
+    """
+    Run the selected scenarios against a fresh mock server and collect their measurements.
+
+    Args:
+        scenarios (list): Scenarios to run, all of SCENARIOS if omitted
+        rows (int): Leads per scenario
+        concurrency (int): Calls in flight for research_async
+        latency_ms (float): Median mock latency in milliseconds
+        latency_sigma (float): Log-normal spread of the mock latency
+        error_rate (float): Share of requests answered with a 429
+        payload_chars (int): Approximate length of each response's output text
+        seed (int): Seed for the mock server
+
+    Returns:
+        list: One result dict per scenario
+    """
+    scenarios = scenarios or SCENARIOS
+    server = MockResponsesServer(latency_ms=latency_ms, latency_sigma=latency_sigma, error_rate=error_rate, payload_chars=payload_chars, seed=seed)
+    base_url = server.start()
+    results = []
+    try:
+        for scenario in scenarios:
+            with tempfile.TemporaryDirectory() as work_dir:
+                result_queue = multiprocessing.Queue()
+                process = multiprocessing.Process(target=run_scenario, args=(scenario, base_url, rows, concurrency, payload_chars, work_dir, result_queue))
+                process.start()
+                while True:
+                    try:
+                        result = result_queue.get(timeout=1)
+                        break
+                    except queue.Empty:
+                        if not process.is_alive():
+                            raise RuntimeError(f"Scenario {scenario} exited with code {process.exitcode} without a result")
+                process.join()
+            results.append(result)
+            print(f"Finished {scenario}: {result['rows_per_sec']:.2f} rows/sec")
+    finally:
+        print(f"Mock server stats: {server.stats}")
+        server.stop()
+    return results
+
+def format_report(results, settings) -> str:
+    """
+    Format benchmark results as a plain-text table.
+
+    Args:
+        results (list): The output of run_benchmark
+        settings (dict): The options the benchmark ran with
+
+    Returns:
+        str: The report
+    """
+    lines = [
+        f"Benchmark {time.strftime('%Y-%m-%d %H:%M:%S')} " + " ".join(f"{key}={value}" for key, value in settings.items()),
+        f"{'scenario':<16}{'rows':>6}{'rows/sec':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'peak RSS MB':>13}{'bytes written':>15}"
+    ]
+    for result in results:
+        lines.append(
+            f"{result['scenario']:<16}{result['rows']:>6}{result['rows_per_sec']:>10.2f}{result['p50_ms']:>10.1f}"
+            f"{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}{result['peak_rss_mb']:>13.1f}{result['bytes_written']:>15}"
+        )
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the research and copy scripts offline against a mock Responses API server.")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="Scenario to run; repeat for several (default: all)")
+    parser.add_argument("--rows", type=int, default=50, help="Leads per scenario")
+    parser.add_argument("--concurrency", type=int, default=10, help="Calls in flight for research_async")
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="Median mock latency in milliseconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Log-normal spread of the mock latency, 0 for fixed")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with a 429")
+    parser.add_argument("--payload-chars", type=int, default=4000, help="Approximate length of each response's output text")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the mock server")
+    parser.add_argument("--output", default="bench_output.txt", help="File the report is appended to")
+    args = parser.parse_args()
+
+    settings = {
+        "rows": args.rows,
+        "concurrency": args.concurrency,
+        "latency_ms": args.latency_ms,
+        "latency_sigma": args.latency_sigma,
+        "error_rate": args.error_rate,
+        "payload_chars": args.payload_chars
+    }
+    results = run_benchmark(args.scenario, rows=args.rows, concurrency=args.concurrency, latency_ms=args.latency_ms,
+                            latency_sigma=args.latency_sigma, error_rate=args.error_rate, payload_chars=args.payload_chars, seed=args.seed)
+
+    report = format_report(results, settings)
+    print(report)
+    with open(args.output, "a", encoding="utf-8") as output:
+        output.write(report + "\n\n")
+    print(f"Report appended to {args.output}")
@@ -0,0 +1,155 @@
+import threading
+import time
+
+from telemetry import default_metrics
+
+# Soft limits are this share of each hard limit; the downgrade applies from the soft limit on
+BUDGET_CONFIG = {
+    "soft_fraction": 0.8,
+    "downgrade_model": "gpt-4o-mini",
+    "downgrade_search_context_size": "low"
+}
+
+class BudgetExceeded(RuntimeError):
+    """
+    Raised instead of making a call once a hard budget limit is reached.
+    """
+
+class BudgetGovernor:
+    """
+    Caps the dollars, tokens and wall time one run may spend.
+
+    Spend is read from the actual response usage recorded in the shared Metrics, so
+    retries and web searches count, and cache hits cost nothing. At the soft limit, or
+    when the projected total for the planned rows would pass the hard limit, later
+    calls are downgraded to a cheaper model and a smaller search context. At the hard
+    limit no further calls are started; rows finished so far stay in the checkpoint
+    journal, so the run can be continued with --resume. A deadline is only a hard
+    stop: it never downgrades the model.
+    """
+
+    def __init__(self, max_cost_usd=None, max_tokens=None, max_seconds=None, config=BUDGET_CONFIG, metrics=default_metrics, deadline_seconds=None):
+        """
+        Args:
+            max_cost_usd (float): Hard limit on spend in USD, None for no limit
+            max_tokens (int): Hard limit on input plus output tokens, None for no limit
+            max_seconds (float): Hard limit on wall time, None for no limit
+            config (dict): Soft-limit fraction and downgrade targets
+            metrics (Metrics): Where calls are recorded, defaults to the shared metrics
+            deadline_seconds (float): Seconds until a deadline after which no calls start,
+                without a soft limit before it; None for no deadline
+        """
+        self.limits = {"cost_usd": max_cost_usd, "tokens": max_tokens, "seconds": max_seconds}
+        self.deadline_seconds = deadline_seconds
+        self.config = config
+        self.metrics = metrics
+        self.baseline = metrics.totals()
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.planned_rows = 0
+        self.finished_rows = 0
+        self.downgraded = False
+        self.exhausted = False
+
+    def usage(self) -> dict:
+        """
+        Return what this run has used so far.
+
+        Returns:
+            dict: "cost_usd", "tokens" and "seconds"
+        """
+        totals = self.metrics.totals()
+        return {
+            "cost_usd": totals["cost_usd"] - self.baseline["cost_usd"],
+            "tokens": totals["tokens"] - self.baseline["tokens"],
+            "seconds": time.monotonic() - self.started
+        }
+
+    def plan(self, rows):
+        """
+        Add rows the run intends to process, for projecting the total spend.
+
+        Args:
+            rows (int): Number of rows about to be processed
+        """
+        with self.lock:
+            self.planned_rows += rows
+
+    def row_finished(self):
+        """
+        Count one processed row towards the projection.
+        """
+        with self.lock:
+            self.finished_rows += 1
+
+    def projected(self) -> dict:
+        """
+        Project the usage at the end of the planned rows from the average so far.
+
+        Returns:
+            dict: Projected "cost_usd" and "tokens", equal to the usage until a row has finished
+        """
+        usage = self.usage()
+        with self.lock:
+            finished, remaining = self.finished_rows, max(self.planned_rows - self.finished_rows, 0)
+        if not finished:
+            return {"cost_usd": usage["cost_usd"], "tokens": usage["tokens"]}
+        return {name: usage[name] + usage[name] / finished * remaining for name in ("cost_usd", "tokens")}
+
+    def request_settings(self, model, search_context_size=None) -> tuple:
+        """
+        Decide the model and search context size for the next call, or refuse it.
+
+        Args:
+            model (str): The model the caller would use
+            search_context_size (str): The search context size the caller would use, None for the API default
+
+        Returns:
+            tuple: (model, search_context_size) to use for the call
+
+        Raises:
+            BudgetExceeded: If any hard limit has been reached
+        """
+        usage = self.usage()
+        over = [name for name, limit in self.limits.items() if limit is not None and usage[name] >= limit]
+        if self.deadline_seconds is not None and usage["seconds"] >= self.deadline_seconds:
+            over.append("deadline")
+        if over or self.exhausted:
+            with self.lock:
+                first = not self.exhausted
+                self.exhausted = True
+            if first:
+                print(f"\nBudget hard limit reached ({', '.join(over)}): {self.describe(usage)}. No further calls will be made.")
+            raise BudgetExceeded(f"Hard budget limit reached: {', '.join(over) or 'earlier in this run'}")
+
+        if not self.downgraded:
+            projected = self.projected()
+            soft = [name for name, limit in self.limits.items() if limit is not None and usage[name] >= limit * self.config["soft_fraction"]]
+            soft += [f"projected {name}" for name in ("cost_usd", "tokens") if self.limits[name] is not None and projected[name] > self.limits[name]]
+            if soft:
+                with self.lock:
+                    first = not self.downgraded
+                    self.downgraded = True
+                if first:
+                    print(f"\nBudget soft limit reached ({', '.join(soft)}): {self.describe(usage)}. "
+                          f"Switching to {self.config['downgrade_model']} with {self.config['downgrade_search_context_size']} search context.")
+
+        if self.downgraded:
+            return self.config["downgrade_model"], self.config["downgrade_search_context_size"]
+        return model, search_context_size
+
+    def describe(self, usage=None) -> str:
+        """
+        Format usage against the limits, e.g. "$1.20/$5.00, 40000 tokens, 310/1800s".
+        """
+        usage = usage or self.usage()
+        limits = dict(self.limits)
+        if self.deadline_seconds is not None:
+            limits["seconds"] = min(limit for limit in (limits["seconds"], self.deadline_seconds) if limit is not None)
+        parts = []
+        for name, template, unit in (("cost_usd", "${:.2f}", ""), ("tokens", "{:.0f}", " tokens"), ("seconds", "{:.0f}", "s")):
+            text = template.format(usage[name])
+            if limits[name] is not None:
+                text += "/" + template.format(limits[name])
+            parts.append(text + unit)
+        return ", ".join(parts)
@@ -0,0 +1,201 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from budget import BudgetExceeded
+from company_index import COPY_COLUMNS, RESEARCH_COLUMNS, TRIAGE_SUFFIX, completed_mask, run_deduplicated
+from prompt_registry import build_prompt_input, default_prompt_registry, input_text
+from rate_limiter import create_response_with_retry, estimate_tokens
+from research_cache import make_cache_key
+
+# Triage settings; leads scoring below triage_threshold never reach the full research or copy call
+CASCADE_CONFIG = {
+    "triage_model": "gpt-4o-mini",
+    "triage_threshold": 0.6,
+    "triage_search_context_size": None,  # None triages from the lead row alone, without web search
+    "triage_prompt_file": "target_brief_prompt.txt",  # Source of the ICP the triage model judges against
+    "max_workers": 8
+}
+
+# Columns written by the triage pass
+TRIAGE_COLUMNS = ["Triage Score", "Triage Reason"]
+
+# Output columns of each stage; the first records which tier handled the row
+STAGE_COLUMNS = {
+    "research": RESEARCH_COLUMNS,
+    "copy": COPY_COLUMNS
+}
+
+# Lead fields shown to the triage model
+TRIAGE_FIELDS = ["Name", "URL", "Description", "Industry", "B2B or B2C", "Country", "Funding Type", "Funding Amount (in USD)", "Funding Date", "Number of Employees", "Technologies"]
+
+# Expected size of a triage answer, reserved against the tokens-per-minute limit
+TRIAGE_OUTPUT_TOKENS = 100
+
+TRIAGE_INSTRUCTIONS = (
+    "\n---\nTriage task: do not write a target brief. Using the Ideal Client Profile above, decide whether "
+    "the lead that follows is worth a full research brief and a personalized email. Reply with JSON: "
+    "\"fit\" (true or false), \"confidence\" in that decision from 0 to 1, and a one-sentence \"reason\"."
+)
+
+TRIAGE_TEXT_FORMAT = {
+    "format": {
+        "type": "json_schema",
+        "name": "lead_triage",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "fit": {"type": "boolean"},
+                "confidence": {"type": "number"},
+                "reason": {"type": "string"}
+            },
+            "required": ["fit", "confidence", "reason"],
+            "additionalProperties": False
+        },
+        "strict": True
+    }
+}
+
+def lead_summary(row) -> str:
+    """
+    Render the triage fields of one lead as short "Field: value" lines.
+
+    Args:
+        row (pd.Series): The lead row
+
+    Returns:
+        str: The per-lead part of the triage request
+    """
+    lines = [f"{field}: {row[field]}" for field in TRIAGE_FIELDS if field in row.index and pd.notna(row[field]) and str(row[field]).strip()]
+    return "Lead:\n" + "\n".join(lines)
+
+def triage_lead(client, triage_prompt, row, config=CASCADE_CONFIG, cache=None) -> dict:
+    """
+    Ask the triage model whether one lead fits the ICP.
+
+    Args:
+        client: The OpenAI client
+        triage_prompt (str): The static triage prompt (ICP plus TRIAGE_INSTRUCTIONS)
+        row (pd.Series): The lead row
+        config (dict): The cascade settings
+        cache (ResearchCache): Optional response cache consulted before calling the API
+
+    Returns:
+        dict: "score" (0-1 likelihood of a fit) and "reason"
+    """
+    lead_text = lead_summary(row)
+    triage_input = build_prompt_input(triage_prompt, lead_text)
+    tools = []
+    if config["triage_search_context_size"]:
+        tools = [{"type": "web_search_preview", "search_context_size": config["triage_search_context_size"]}]
+
+    cache_key = make_cache_key(config["triage_model"], tools, triage_prompt, lead_text)
+    response = cache.get(cache_key) if cache is not None else None
+    if response is None:
+        response = create_response_with_retry(
+            client,
+            estimated_tokens=estimate_tokens(input_text(triage_input)) + TRIAGE_OUTPUT_TOKENS,
+            model=config["triage_model"],
+            tools=tools,
+            input=triage_input,
+            text=TRIAGE_TEXT_FORMAT,
+            prompt_cache_key="triage"
+        )
+        if cache is not None:
+            cache.put(cache_key, response)
+
+    result = json.loads(response.output_text)
+    confidence = min(max(float(result["confidence"]), 0.0), 1.0)
+    return {
+        "score": confidence if result["fit"] else 1.0 - confidence,
+        "reason": result["reason"]
+    }
+
+def triage_leads(df, client, config=CASCADE_CONFIG, cache=None, budget=None):
+    """
+    Score every lead with the triage model, several calls at a time.
+
+    Leads whose triage call fails, or that are left once the budget is spent, get no
+    score and are escalated, so an outage never silently drops leads.
+
+    Args:
+        df (pd.DataFrame): The leads to triage
+        client: The OpenAI client
+        config (dict): The cascade settings
+        cache (ResearchCache): Optional response cache
+        budget (BudgetGovernor): Optional spend limits; no triage call starts past a hard limit
+
+    Returns:
+        pd.DataFrame: The DataFrame with TRIAGE_COLUMNS filled in
+    """
+    triage_prompt = default_prompt_registry.get(config["triage_prompt_file"]).text + TRIAGE_INSTRUCTIONS
+
+    def triage(index):
+        if budget is not None:
+            try:
+                # Triage already runs on the cheap tier, so only the hard limit applies
+                budget.request_settings(config["triage_model"], config["triage_search_context_size"])
+            except BudgetExceeded:
+                return index, {"score": float("nan"), "reason": "Triage skipped: budget exhausted"}
+        try:
+            return index, triage_lead(client, triage_prompt, df.loc[index], config=config, cache=cache)
+        except Exception as e:
+            print(f"\nError triaging row {index+1}: {str(e)}")
+            return index, {"score": float("nan"), "reason": f"Triage failed: {str(e)}"}
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=config["max_workers"]) as executor:
+        for index, result in executor.map(triage, df.index):
+            results[index] = result
+
+    df["Triage Score"] = pd.Series({index: result["score"] for index, result in results.items()}, dtype=float)
+    df["Triage Reason"] = pd.Series({index: result["reason"] for index, result in results.items()}, dtype=object)
+    return df
+
+def run_cascade(df, candidates, stage, client, config=CASCADE_CONFIG, cache=None, index=None, budget=None):
+    """
+    Triage the candidate leads and return only those worth the full stage call.
+
+    Triage results are written into df, and rejected rows get the triage model recorded
+    in the stage's endpoint column, so the output shows which tier handled every row.
+    Rows that already have results (e.g. from a resumed journal) are not triaged again.
+    Each company is triaged once through run_deduplicated and its verdict fanned out to
+    its other rows; with a company index, verdicts are also reused across lead files.
+
+    Args:
+        df (pd.DataFrame): The full lead DataFrame, updated in place
+        candidates (pd.DataFrame): The rows that would otherwise go to the full stage
+        stage (str): "research" or "copy"
+        client: The OpenAI client used for triage
+        config (dict): The cascade settings
+        cache (ResearchCache): Optional response cache
+        index (CompanyIndex): The persistent company index, a fresh in-memory one if omitted
+        budget (BudgetGovernor): Optional spend limits the triage calls count against
+
+    Returns:
+        pd.DataFrame: The escalated candidates
+    """
+    done = completed_mask(candidates, STAGE_COLUMNS[stage])
+    pending = candidates[~done].copy()
+    for column in TRIAGE_COLUMNS:
+        if column not in pending.columns:
+            pending[column] = pd.Series(dtype=float if column == "Triage Score" else object)
+
+    # The score goes last, so only scored verdicts count as done; failed and skipped
+    # triage is neither stored in the index nor fanned out
+    triaged = run_deduplicated(pending, f"{stage} triage", ["Triage Reason", "Triage Score"],
+                               lambda work_df: triage_leads(work_df, client, config=config, cache=cache, budget=budget), index=index)
+    triaged["Triage Score"] = pd.to_numeric(triaged["Triage Score"], errors="coerce")
+    for column in TRIAGE_COLUMNS:
+        if column not in df.columns:
+            df[column] = pd.Series(dtype=triaged[column].dtype)
+    df.loc[triaged.index, TRIAGE_COLUMNS] = triaged[TRIAGE_COLUMNS]
+
+    scores = triaged["Triage Score"]
+    escalated = scores.isna() | (scores >= config["triage_threshold"])
+    rejected = triaged.index[~escalated]
+    df.loc[rejected, STAGE_COLUMNS[stage][0]] = f"{config['triage_model']}{TRIAGE_SUFFIX}"
+
+    print(f"Cascade {stage}: {int(escalated.sum())}/{len(triaged)} triaged leads escalated (threshold {config['triage_threshold']})")
+    return candidates.loc[done | candidates.index.isin(triaged.index[escalated])]
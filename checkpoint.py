@@ -0,0 +1,174 @@
+import json
+import os
+import time
+
+def journal_path_for(output_file: str) -> str:
+    """
+    Return the journal file that belongs to an output CSV.
+
+    Args:
+        output_file (str): Path to the final output CSV
+
+    Returns:
+        str: Path to the checkpoint journal
+    """
+    return f"{output_file}.journal.jsonl"
+
+def backup_journal(path):
+    """
+    Move a non-empty journal aside to a timestamped name next to it.
+
+    Args:
+        path (str): Path to the journal file
+
+    Returns:
+        str: The backup path, or None if there was nothing to keep
+    """
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    root, extension = os.path.splitext(path)
+    backup = f"{root}.{time.strftime('%Y%m%d-%H%M%S')}{extension}"
+    counter = 1
+    while os.path.exists(backup):
+        backup = f"{root}.{time.strftime('%Y%m%d-%H%M%S')}-{counter}{extension}"
+        counter += 1
+    os.replace(path, backup)
+    return backup
+
+class CheckpointJournal:
+    """
+    Append-only JSONL journal with one record per completed row.
+
+    Each record holds the row index, its URL and the column values produced for it,
+    so the cost of a checkpoint does not grow with the size of the DataFrame.
+    Writes are flushed immediately and fsynced in batches.
+    """
+
+    def __init__(self, path, resume=False, fsync_every=20, fsync_interval=5.0):
+        """
+        Args:
+            path (str): Path to the journal file
+            resume (bool): Keep and replay an existing journal instead of starting a new one;
+                without it a non-empty journal is moved aside to a timestamped backup
+            fsync_every (int): Records written between fsyncs
+            fsync_interval (float): Seconds allowed between fsyncs regardless of record count
+        """
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.records = {}
+        self.completed = set()
+        self.pending_syncs = 0
+        self.last_sync = time.monotonic()
+
+        if resume:
+            self.records, valid_length = self.replay()
+            self.completed = set(self.records)
+            print(f"Replayed {len(self.completed)} completed rows from {path}")
+            # Cut off a torn final line so new records start on a clean line
+            if os.path.exists(path):
+                with open(path, "r+b") as file:
+                    file.truncate(valid_length)
+            mode = "a"
+        else:
+            # Never truncate paid results because --resume was forgotten
+            backup = backup_journal(path)
+            if backup:
+                print(f"Moved the existing journal {path} to {backup}; pass --resume to continue from it instead")
+            mode = "w"
+
+        self.file = open(path, mode, encoding="utf-8")
+
+    def replay(self) -> tuple:
+        """
+        Read every complete record in the journal.
+
+        A torn final line left by a crash is ignored; later records for the same row win.
+
+        Returns:
+            tuple: Row index mapped to {"url": ..., "fields": {...}}, and the byte length
+                of the journal up to the end of the last complete record
+        """
+        records = {}
+        valid_length = 0
+        if not os.path.exists(self.path):
+            return records, valid_length
+
+        with open(self.path, "rb") as file:
+            for line in file:
+                if not line.endswith(b"\n"):
+                    print(f"Ignoring incomplete journal line in {self.path}")
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"Ignoring unreadable journal line in {self.path}")
+                    valid_length += len(line)
+                    continue
+                records[record["index"]] = {"url": record.get("url", ""), "fields": record["fields"]}
+                valid_length += len(line)
+        return records, valid_length
+
+    def apply(self, df):
+        """
+        Write replayed results back into the DataFrame.
+
+        Records whose URL no longer matches the row are dropped so that a changed input
+        file is re-processed instead of being filled with another company's results.
+
+        Args:
+            df (pd.DataFrame): The DataFrame to restore
+
+        Returns:
+            pd.DataFrame: The restored DataFrame
+        """
+        for index, record in list(self.records.items()):
+            if index not in df.index or str(df.at[index, "URL"]) != record["url"]:
+                self.completed.discard(index)
+                continue
+            for column, value in record["fields"].items():
+                df.at[index, column] = value
+        print(f"Restored {len(self.completed)} rows from checkpoint journal")
+        return df
+
+    def record(self, index, url, fields):
+        """
+        Append the results for one completed row.
+
+        Args:
+            index: The DataFrame index of the row
+            url (str): The row's URL, used to validate the record on resume
+            fields (dict): Column name mapped to the value produced for this row
+        """
+        record = {"index": int(index), "url": str(url), "fields": fields}
+        self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+        self.completed.add(index)
+
+        self.pending_syncs += 1
+        now = time.monotonic()
+        if self.pending_syncs >= self.fsync_every or now - self.last_sync >= self.fsync_interval:
+            self.sync()
+
+    def sync(self):
+        """
+        Force every written record to disk.
+        """
+        os.fsync(self.file.fileno())
+        self.pending_syncs = 0
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        """
+        Sync and close the journal file.
+        """
+        if self.file.closed:
+            return
+        self.sync()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -0,0 +1,122 @@
+import argparse
+import os
+import runpy
+import sys
+
+# Only the standard library is imported up front; each command imports what it needs,
+# so help, argument errors and dry runs do not wait on pandas and the OpenAI SDK
+
+# Script behind each API command, with the defaults of its __main__ block
+COMMANDS = {
+    "brief": {
+        "script": "target_brief.py",
+        "help": "Research each lead's company with web search",
+        "input": "Test3 Growth List Startup Plan_usa_leads - Growth List Startup Plan_usa_leads.csv",
+        "output": "Growth_List_Research.csv",
+        "concurrency": 20
+    },
+    "copy": {
+        "script": "copywrite.py",
+        "help": "Generate outreach email copy for each lead",
+        "input": "Test3 Growth List Startup Plan_usa_leads - Growth List Startup Plan_usa_leads.csv",
+        "output": "Growth_List_copy.csv",
+        # Copy calls are made one at a time
+        "concurrency": None
+    },
+    "run": {
+        "script": "pipeline.py",
+        "help": "Research each lead and write its copy in one pass",
+        "input": "Test3 Growth List Startup Plan_usa_leads - Growth List Startup Plan_usa_leads.csv",
+        "output": "Growth_List_pipeline.csv",
+        "concurrency": 10
+    }
+}
+
+def build_parser():
+    """
+    Build the argument parser with one subcommand per script.
+
+    Returns:
+        argparse.ArgumentParser: The parser
+    """
+    parser = argparse.ArgumentParser(
+        description="promptsales: research leads and write outreach copy with OpenAI.",
+        epilog="Flags not listed for a command (e.g. --resume, --cascade, --batch) are passed on to its script."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    for command, settings in COMMANDS.items():
+        subparser = subparsers.add_parser(command, help=settings["help"], description=f"{settings['help']} ({settings['script']}).")
+        subparser.add_argument("--input", default=settings["input"], help="Lead CSV or .store result store to read")
+        subparser.add_argument("--output", default=settings["output"], help="CSV to write, or a .store directory for a typed result store")
+        if settings["concurrency"]:
+            subparser.add_argument("--max-concurrency", type=int, default=settings["concurrency"], help="API calls in flight at once")
+        subparser.add_argument("--dry-run", action="store_true", help="Report rows, companies, prompt tokens and projected cost and time, without calling the API")
+        subparser.add_argument("--index-file", default="company_index.sqlite3", help="Company index consulted by --dry-run")
+
+    segment = subparsers.add_parser("segment", help="Write one lead segment to a CSV without calling the API")
+    segment.add_argument("name", help="Segment name, see SEGMENTS in sort_leads.py")
+    segment.add_argument("--input", default="Growth List Startup Plan.csv", help="Lead export to segment")
+    segment.add_argument("--output", help="Where to write the segment (default: '<input>_<segment>.csv')")
+
+    consolidate = subparsers.add_parser("consolidate", help="Merge research and copy outputs into one master table keyed by company")
+    consolidate.add_argument("files", nargs="*", help="Result files or glob patterns to merge (default: the scripts' usual outputs)")
+    consolidate.add_argument("--output", default="Growth_List_master.csv", help="CSV to write, or a .store directory for a typed result store")
+    return parser
+
+def run_script(script, argv):
+    """
+    Run a script's __main__ block as if it had been started with argv.
+
+    Args:
+        script (str): The script file name, next to this file
+        argv (list): The arguments after the script name
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), script)
+    sys.argv = [path] + argv
+    runpy.run_path(path, run_name="__main__")
+
+def main(argv=None):
+    """
+    Parse the command line and run the chosen command.
+
+    Args:
+        argv (list): Arguments, defaults to sys.argv[1:]
+    """
+    parser = build_parser()
+    args, passthrough = parser.parse_known_args(argv)
+
+    if args.command == "segment":
+        if passthrough:
+            parser.error(f"unrecognized arguments: {' '.join(passthrough)}")
+        from sort_leads import SEGMENTS, write_segment
+        if args.name not in SEGMENTS:
+            parser.error(f"unknown segment {args.name!r}, choose from {', '.join(sorted(SEGMENTS))}")
+        write_segment(args.input, args.output or f"{os.path.splitext(args.input)[0]}_{args.name}.csv", args.name)
+        return
+
+    if args.command == "consolidate":
+        if passthrough:
+            parser.error(f"unrecognized arguments: {' '.join(passthrough)}")
+        from consolidate import DEFAULT_PATTERNS, consolidate, result_files
+        from result_store import save_results
+        paths = result_files(args.files or DEFAULT_PATTERNS, exclude=[args.output])
+        if not paths:
+            parser.error("no result files found")
+        save_results(consolidate(paths), args.output)
+        print(f"Master table saved to {args.output}")
+        return
+
+    concurrency = getattr(args, "max_concurrency", None) or 1
+    if args.dry_run:
+        from estimate import estimate_command, format_estimate
+        print(format_estimate(estimate_command(args.command, args.input, args.output, concurrency, index_file=args.index_file)))
+        return
+
+    script_argv = ["--input", args.input, "--output", args.output] + passthrough
+    if COMMANDS[args.command]["concurrency"]:
+        script_argv += ["--max-concurrency", str(concurrency)]
+    run_script(COMMANDS[args.command]["script"], script_argv)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,424 @@
+import json
+import math
+import re
+from collections import Counter, defaultdict
+
+import pandas as pd
+
+from budget import BudgetExceeded
+from company_index import COPY_COLUMNS, mark_failed
+from prompt_registry import build_prompt_input, default_prompt_registry, input_text, usage_summary
+from rate_limiter import create_response_with_retry, estimate_tokens
+from research_cache import make_cache_key
+
+# Clustering and generation settings for archetype copy
+CLUSTER_CONFIG = {
+    "similarity_threshold": 0.3,  # Cosine similarity to a cluster's first lead needed to join it
+    "max_cluster_size": 25,  # Larger groups are split, so shared copy stays specific
+    "shared_model": "gpt-4o",
+    "personalize_model": "gpt-4o-mini",
+    "personalize_prompt_file": "personalize_prompt.txt",
+    "personalize_search_context_size": "low",  # None personalizes from the lead row alone, without web search
+    "archetype_examples": 5  # Member descriptions shown when writing a cluster's shared copy
+}
+
+# How much each text column counts towards similarity; Technologies is mostly the website's
+# hosting and analytics stack, so it only breaks ties
+TEXT_FIELD_WEIGHTS = {
+    "Industry": 3.0,
+    "Description": 1.0,
+    "Technologies": 0.2
+}
+
+# Words that say nothing about what a company does
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is", "it", "its",
+    "of", "on", "or", "that", "the", "their", "to", "we", "with", "which", "our", "company", "provides",
+    "based", "inc", "llc", "platform", "solutions", "solution", "services", "products"
+}
+
+# Template placeholders in the order they appear in CombinedPrompt.txt; the two case study
+# placeholders joined by "+" are filled as one
+PLACEHOLDER_FIELDS = ["intro", "capabilities", "case_study", "product", "highlight", "hook"]
+
+# Placeholders written once per cluster; the rest are written per lead
+SHARED_FIELDS = ["capabilities", "case_study"]
+
+# Expected size of each answer, reserved against the tokens-per-minute limit
+SHARED_OUTPUT_TOKENS = 400
+PERSONALIZE_OUTPUT_TOKENS = 300
+
+SHARED_INSTRUCTIONS = (
+    "\n---\nArchetype task: do not write a full email and do not search the web. The companies that follow "
+    "are similar, and each will get its own email built from the template. Write only the two template "
+    "paragraphs that can be shared by all of them, using our case studies and website copy above. Reply with "
+    "JSON: \"capabilities\" completes \"We've launched and grown [...]\" with relevant numbers of relevant "
+    "product categories, and \"case_study\" completes \"For example [...]\" with the most relevant case study "
+    "and the big win it achieved."
+)
+
+SHARED_TEXT_FORMAT = {
+    "format": {
+        "type": "json_schema",
+        "name": "archetype_paragraphs",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "capabilities": {"type": "string"},
+                "case_study": {"type": "string"}
+            },
+            "required": SHARED_FIELDS,
+            "additionalProperties": False
+        },
+        "strict": True
+    }
+}
+
+PERSONALIZE_TEXT_FORMAT = {
+    "format": {
+        "type": "json_schema",
+        "name": "lead_personalization",
+        "schema": {
+            "type": "object",
+            "properties": {
+                "intro": {"type": "string"},
+                "product": {"type": "string"},
+                "highlight": {"type": "string"},
+                "hook": {"type": "string"},
+                "subjects": {"type": "array", "items": {"type": "string"}, "minItems": 4, "maxItems": 4}
+            },
+            "required": ["intro", "product", "highlight", "hook", "subjects"],
+            "additionalProperties": False
+        },
+        "strict": True
+    }
+}
+
+def lead_terms(row) -> Counter:
+    """
+    Turn a lead's Industry, Description and Technologies into weighted terms.
+
+    Words from Industry and Description share one vocabulary, so "aerospace" in either
+    matches; each Technologies entry is one term.
+
+    Args:
+        row (dict): The lead row
+
+    Returns:
+        Counter: Term weights
+    """
+    terms = Counter()
+    for field, weight in TEXT_FIELD_WEIGHTS.items():
+        if field not in row or pd.isna(row[field]):
+            continue
+        text = str(row[field]).lower()
+        if field == "Technologies":
+            tokens = [f"tech:{item.strip()}" for item in text.split(",") if item.strip()]
+        else:
+            tokens = [word for word in re.findall(r"[a-z0-9][a-z0-9+\-]*", text) if word not in STOP_WORDS and len(word) > 1]
+        for token in tokens:
+            terms[token] += weight
+    return terms
+
+def tfidf_vectors(df) -> list:
+    """
+    Build sparse L2-normalized TF-IDF vectors for every lead.
+
+    Args:
+        df (pd.DataFrame): The lead DataFrame
+
+    Returns:
+        list: One {term: weight} dict per lead; empty for leads without text
+    """
+    documents = [lead_terms(row) for row in df.to_dict("records")]
+    document_frequency = Counter(term for document in documents for term in document)
+
+    vectors = []
+    for document in documents:
+        vector = {term: weight * (math.log((1 + len(documents)) / (1 + document_frequency[term])) + 1) for term, weight in document.items()}
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        vectors.append({term: value / norm for term, value in vector.items()} if norm > 0 else {})
+    return vectors
+
+def cluster_leads(df, threshold=CLUSTER_CONFIG["similarity_threshold"], max_cluster_size=CLUSTER_CONFIG["max_cluster_size"]) -> pd.Series:
+    """
+    Group leads into archetypes by cosine similarity of their TF-IDF vectors.
+
+    Each lead joins the most similar cluster whose first lead it matches at or above
+    threshold and that is not full, otherwise it starts a new cluster. The result only
+    depends on the row order, so the same list always clusters the same way.
+
+    Similarities are summed through an inverted index from each term to the first leads
+    of the open clusters that contain it, so a lead is only compared with clusters it
+    shares a term with, and full clusters drop out of the index.
+
+    Args:
+        df (pd.DataFrame): The lead DataFrame
+        threshold (float): Minimum cosine similarity to a cluster's first lead
+        max_cluster_size (int): Most leads in one cluster
+
+    Returns:
+        pd.Series: Cluster number per row
+    """
+    vectors = tfidf_vectors(df)
+    # Term mapped to {cluster: weight of the term in the cluster's first lead}
+    postings = defaultdict(dict)
+    leaders = []
+    sizes = []
+    labels = []
+
+    for vector in vectors:
+        similarity = defaultdict(float)
+        for term, weight in vector.items():
+            for cluster, leader_weight in postings.get(term, {}).items():
+                similarity[cluster] += weight * leader_weight
+
+        # Ties go to the earliest cluster
+        best = min(similarity, key=lambda cluster: (-similarity[cluster], cluster), default=None)
+        if best is not None and similarity[best] >= threshold:
+            labels.append(best)
+            sizes[best] += 1
+            if sizes[best] >= max_cluster_size:
+                for term in vectors[leaders[best]]:
+                    del postings[term][best]
+            continue
+
+        cluster = len(sizes)
+        labels.append(cluster)
+        sizes.append(1)
+        leaders.append(len(labels) - 1)
+        if max_cluster_size > 1:
+            for term, weight in vector.items():
+                postings[term][cluster] = weight
+
+    return pd.Series(labels, index=df.index, dtype=int)
+
+def body_template(prompt) -> str:
+    """
+    Extract the email body template from CombinedPrompt.txt.
+
+    The body is cut the same way parse_response stores generated copy: without the
+    "Hey [Target]," greeting and from the "Call me anytime" line on.
+
+    Args:
+        prompt (str): The copy prompt text
+
+    Returns:
+        str: The body template with its bracketed placeholders
+
+    Raises:
+        ValueError: If the prompt has no template or the placeholders do not match PLACEHOLDER_FIELDS
+    """
+    match = re.search(r"Template:\s*\n(.*?)\n---", prompt, re.S)
+    if not match:
+        raise ValueError("Copy prompt has no \"Template:\" section")
+    body = re.sub(r"^\s*Hey \[Target\],", "", match.group(1))
+    body = re.split(r"\nCall me anytime", body, maxsplit=1)[0]
+    body = "\n".join(line.rstrip() for line in body.strip().splitlines())
+
+    found = len(placeholder_spans(body))
+    if found != len(PLACEHOLDER_FIELDS):
+        raise ValueError(f"Copy template has {found} placeholders, expected {len(PLACEHOLDER_FIELDS)} ({', '.join(PLACEHOLDER_FIELDS)})")
+    return body
+
+def placeholder_spans(template) -> list:
+    """
+    Find the top-level bracketed placeholders of a template, other than [Target].
+
+    Nested brackets belong to their outer placeholder, and placeholders joined by "+"
+    are one span.
+
+    Args:
+        template (str): The template text
+
+    Returns:
+        list: [start, end] character offsets of each placeholder
+    """
+    spans = []
+    depth = 0
+    start = 0
+    for position, char in enumerate(template):
+        if char == "[":
+            if depth == 0:
+                start = position
+            depth += 1
+        elif char == "]" and depth:
+            depth -= 1
+            if depth == 0 and template[start:position + 1] != "[Target]":
+                if spans and template[spans[-1][1]:start].strip() == "+":
+                    spans[-1][1] = position + 1
+                else:
+                    spans.append([start, position + 1])
+    return spans
+
+def fill_body(template, values) -> str:
+    """
+    Fill every placeholder of the body template.
+
+    Args:
+        template (str): The output of body_template
+        values (dict): Text for each of PLACEHOLDER_FIELDS
+
+    Returns:
+        str: The email body
+    """
+    body = template
+    for (start, end), field in reversed(list(zip(placeholder_spans(template), PLACEHOLDER_FIELDS))):
+        body = body[:start] + values[field].strip() + body[end:]
+    return body
+
+def archetype_summary(cluster_df, examples=CLUSTER_CONFIG["archetype_examples"]) -> str:
+    """
+    Describe a cluster by its common industries and technologies and a few member descriptions.
+
+    Args:
+        cluster_df (pd.DataFrame): The leads of one cluster
+        examples (int): Member descriptions to include
+
+    Returns:
+        str: The per-cluster part of the shared copy request
+    """
+    lines = [f"Companies in this group: {len(cluster_df)}"]
+    if "Industry" in cluster_df.columns:
+        industries = cluster_df["Industry"].dropna().astype(str).value_counts().head(3)
+        lines.append("Industries: " + ", ".join(industries.index))
+    if "Description" in cluster_df.columns:
+        descriptions = cluster_df["Description"].dropna().astype(str).str.strip()
+        lines.extend(f"- {description}" for description in descriptions.head(examples))
+    return "\n".join(lines)
+
+def request_json(client, model, static_prompt, lead_text, text_format, output_tokens, prompt_cache_key, tools=None, cache=None) -> dict:
+    """
+    Make one JSON-schema request, consulting the response cache first.
+
+    Args:
+        client: The OpenAI client
+        model (str): The model to use
+        static_prompt (str): The prompt shared by every request of this kind
+        lead_text (str): The per-request part of the input
+        text_format (dict): The Responses API text format
+        output_tokens (int): Expected output size, reserved against the tokens-per-minute limit
+        prompt_cache_key (str): Prompt cache key, also the telemetry stage label
+        tools (list): Tools to enable, none by default
+        cache (ResearchCache): Optional response cache
+
+    Returns:
+        dict: The parsed JSON answer
+    """
+    tools = tools or []
+    request_input = build_prompt_input(static_prompt, lead_text)
+    cache_key = make_cache_key(model, tools, static_prompt, lead_text)
+    response = cache.get(cache_key) if cache is not None else None
+    if response is None:
+        response = create_response_with_retry(
+            client,
+            estimated_tokens=estimate_tokens(input_text(request_input)) + output_tokens,
+            model=model,
+            tools=tools,
+            input=request_input,
+            text=text_format,
+            prompt_cache_key=prompt_cache_key
+        )
+        print(f"{prompt_cache_key} call completed ({usage_summary(response)['cached_tokens']} cached input tokens)")
+        if cache is not None:
+            cache.put(cache_key, response)
+    return json.loads(response.output_text)
+
+def archetype_copy(df, prompt, client, cache=None, journal=None, config=CLUSTER_CONFIG, budget=None, cluster_df=None):
+    """
+    Generate copy once per cluster of similar leads, then personalize it per lead.
+
+    The capability and case study paragraphs are written once per cluster with the full
+    copy prompt. Each lead then gets a small personalization call (intro, product,
+    highlight, hook and subjects), and the body is assembled locally from the template,
+    so full-prompt calls scale with the number of archetypes instead of rows.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to process, with the copy columns
+        prompt (str): The copy prompt loaded from CombinedPrompt.txt
+        client: The OpenAI client
+        cache (ResearchCache): Optional response cache shared by every call
+        journal (CheckpointJournal): Optional journal recording each finished row; rows it already holds are skipped
+        config (dict): The clustering and model settings
+        budget (BudgetGovernor): Optional spend limits; may downgrade the models or stop the loop
+        cluster_df (pd.DataFrame): The leads to cluster, including ones finished in an earlier
+            run, so a resumed run keeps the first run's archetypes and shared copy; defaults to df
+
+    Returns:
+        pd.DataFrame: The updated DataFrame
+    """
+    from copywrite import store_copy_result
+
+    template = body_template(prompt)
+    shared_prompt = prompt + SHARED_INSTRUCTIONS
+    personalize_prompt = default_prompt_registry.get(config["personalize_prompt_file"]).text
+
+    leads = df if cluster_df is None else pd.concat([cluster_df, df[~df.index.isin(cluster_df.index)]])
+    leads = leads[leads["URL"].fillna("").astype(str).str.strip() != ""]
+    clusters = cluster_leads(leads, threshold=config["similarity_threshold"], max_cluster_size=config["max_cluster_size"])
+    print(f"Clustered {len(leads)} leads into {clusters.nunique()} archetypes")
+
+    urls = df["URL"].fillna("").astype(str).str.strip()
+    pending = df.index[(urls != "") & ~df.index.isin(journal.completed if journal is not None else [])]
+    if budget is not None:
+        budget.plan(len(pending))
+
+    for cluster, members in clusters.groupby(clusters):
+        todo = members.index[members.index.isin(pending)]
+        if not len(todo):
+            continue
+        members_df = leads.loc[members.index]
+        print(f"\n--- Archetype {cluster+1}/{clusters.nunique()}: {len(todo)}/{len(members_df)} leads to write ---")
+
+        # Stop before the call once the budget is spent; finished rows are already journaled
+        shared_model = config["shared_model"]
+        if budget is not None:
+            try:
+                shared_model, _ = budget.request_settings(shared_model)
+            except BudgetExceeded:
+                print(f"Stopping at archetype {cluster+1}: budget exhausted. Re-run with --resume to continue.")
+                return df
+
+        try:
+            shared = request_json(client, shared_model, shared_prompt, archetype_summary(members_df, config["archetype_examples"]),
+                                  SHARED_TEXT_FORMAT, SHARED_OUTPUT_TOKENS, "copy_shared", cache=cache)
+        except Exception as e:
+            print(f"\nError writing shared copy for archetype {cluster+1}: {str(e)}")
+            for index in todo:
+                mark_failed(df, index, COPY_COLUMNS, f"{shared_model} + {config['personalize_model']}")
+            continue
+
+        shared_text = f"Shared paragraphs:\nWe've launched and grown {shared['capabilities']}\nFor example {shared['case_study']}"
+        for index in todo:
+            row = df.loc[index]
+            description = row["Description"] if "Description" in row.index and pd.notna(row["Description"]) else ""
+            lead_text = f"{shared_text}\nTarget:\n{row['URL']}\nDescription: {description}"
+            ceo_name = row["CEO Name"] if pd.notna(row["CEO Name"]) else ""
+
+            personalize_model, context_size = config["personalize_model"], config["personalize_search_context_size"]
+            if budget is not None:
+                try:
+                    personalize_model, context_size = budget.request_settings(personalize_model, context_size)
+                except BudgetExceeded:
+                    print(f"Stopping at row {index+1}: budget exhausted. Re-run with --resume to continue.")
+                    return df
+            personalize_tools = [{"type": "web_search_preview", "search_context_size": context_size}] if context_size else []
+            endpoint = f"{shared_model} + {personalize_model}"
+
+            try:
+                personal = request_json(client, personalize_model, personalize_prompt, lead_text,
+                                        PERSONALIZE_TEXT_FORMAT, PERSONALIZE_OUTPUT_TOKENS, "copy_personalize", tools=personalize_tools, cache=cache)
+                body = fill_body(template, {**shared, **personal})
+                fields = store_copy_result(df, index, {"subjects": personal["subjects"], "body": body}, ceo_name, model=endpoint)
+                if journal is not None:
+                    journal.record(index, row["URL"], fields)
+                print(f"--- Finished row {index+1} (archetype {cluster+1}) ---")
+            except Exception as e:
+                print(f"\nError personalizing row {index+1}: {str(e)}")
+                mark_failed(df, index, COPY_COLUMNS, endpoint)
+
+            if budget is not None:
+                budget.row_finished()
+
+    print("\nAll rows processed successfully")
+    return df
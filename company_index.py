@@ -0,0 +1,373 @@
+import json
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import pandas as pd
+
+# Default index location
+DEFAULT_INDEX_PATH = "company_index.sqlite3"
+
+# Query parameters that only track the click and never identify a page
+TRACKING_PARAMS = {"gclid", "fbclid", "msclkid", "mc_cid", "mc_eid", "ref", "ref_src", "source", "igshid", "_hsenc", "_hsmi"}
+
+# Mail providers whose domain says nothing about the company
+FREE_EMAIL_DOMAINS = {"gmail.com", "googlemail.com", "yahoo.com", "hotmail.com", "outlook.com", "live.com", "icloud.com", "me.com", "aol.com", "protonmail.com", "proton.me"}
+
+# Output columns filled by each stage
+RESEARCH_COLUMNS = ["AI Research Endpoint", "Research Data"]
+COPY_COLUMNS = ["AI Copy Generation Endpoint", "Subject 1", "Subject 2", "Subject 3", "Subject 4", "Body"]
+
+# When each row's copy was written, as a Unix timestamp
+COPY_WRITTEN_AT_COLUMN = "Copy Written At"
+
+# Endpoint suffixes of rows a stage handled without writing results: rejected by the
+# cascade's triage model, or given up on after an error
+TRIAGE_SUFFIX = " (triage)"
+FAILED_SUFFIX = " (failed)"
+
+def canonicalize_url(url) -> str:
+    """
+    Normalize a company URL so that variants of the same site compare equal.
+
+    Scheme, "www.", letter case, default ports, fragments, trailing slashes and tracking
+    parameters are removed, e.g. "https://www.X.com/?utm_source=a" becomes "x.com".
+
+    Args:
+        url (str): The URL from the lead list
+
+    Returns:
+        str: The canonical form, or "" if the URL is missing
+    """
+    if url is None or pd.isna(url):
+        return ""
+    url = str(url).strip()
+    if not url:
+        return ""
+    if "://" not in url:
+        url = f"http://{url}"
+
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower().rstrip(".")
+    if host.startswith("www."):
+        host = host[4:]
+
+    path = parts.path.rstrip("/")
+    if path.lower() in ("/index.html", "/index.htm", "/home"):
+        path = ""
+
+    query = [
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    ]
+
+    canonical = host + path
+    if query:
+        canonical += "?" + urlencode(sorted(query))
+    return canonical
+
+def email_domain(email) -> str:
+    """
+    Return the lowercased domain of an email address.
+
+    Args:
+        email (str): The email address
+
+    Returns:
+        str: The domain without "www.", or "" if there is none
+    """
+    if email is None or pd.isna(email) or "@" not in str(email):
+        return ""
+    domain = str(email).strip().lower().rsplit("@", 1)[1].rstrip(".")
+    if domain.startswith("www."):
+        domain = domain[4:]
+    return domain
+
+def company_key(url, ceo_email="") -> str:
+    """
+    Build the canonical key that identifies a company across lead files.
+
+    The canonical URL is used when there is one; otherwise the CEO email domain, unless
+    it belongs to a free mail provider.
+
+    Args:
+        url (str): The company URL
+        ceo_email (str): The CEO's email address
+
+    Returns:
+        str: The company key, or "" if the row cannot be identified
+    """
+    canonical_url = canonicalize_url(url)
+    if canonical_url:
+        return canonical_url
+
+    domain = email_domain(ceo_email)
+    if domain and domain not in FREE_EMAIL_DOMAINS:
+        return domain
+    return ""
+
+def add_company_keys(df):
+    """
+    Add a "Company Key" column to a lead DataFrame.
+
+    Args:
+        df (pd.DataFrame): The lead DataFrame
+
+    Returns:
+        pd.DataFrame: The DataFrame with the new column
+    """
+    urls = df["URL"] if "URL" in df.columns else pd.Series("", index=df.index)
+    emails = df["CEO Email"] if "CEO Email" in df.columns else pd.Series("", index=df.index)
+    df["Company Key"] = [company_key(url, email) for url, email in zip(urls, emails)]
+    return df
+
+def stage_keys(df, stage):
+    """
+    Return the key that identifies duplicate work for a stage.
+
+    Research depends only on the company. Copy is personalized to the CEO, so it is
+    shared only between rows for the same company and the same CEO email.
+
+    Args:
+        df (pd.DataFrame): A DataFrame with a "Company Key" column
+        stage (str): "research" or "copy"
+
+    Returns:
+        pd.Series: One key per row ("" for rows that cannot be identified)
+    """
+    keys = df["Company Key"]
+    if stage == "copy" and "CEO Email" in df.columns:
+        emails = df["CEO Email"].fillna("").astype(str).str.strip().str.lower()
+        keys = keys.where(keys == "", keys + "|" + emails)
+    return keys
+
+class CompanyIndex:
+    """
+    Persistent SQLite index of stage results keyed by canonical company.
+
+    Results recorded from one lead file are reused for every row of the same company
+    in any other file, so a company is researched and written to once.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        """
+        Args:
+            path (str): Path to the SQLite database file
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        # Lets shard worker processes read while another one writes
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                fields TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (key, stage)
+            )
+            """
+        )
+        self.connection.commit()
+
+    def lookup(self, keys, stage, max_age_seconds=None, timestamp_column=None) -> dict:
+        """
+        Fetch stored results for a set of keys.
+
+        Args:
+            keys (iterable): Stage keys to look up
+            stage (str): "research" or "copy"
+            max_age_seconds (float): Ignore results recorded longer ago than this, None for any age
+            timestamp_column (str): If given, each result also holds its recorded time under this name
+
+        Returns:
+            dict: Key mapped to its stored column values
+        """
+        keys = [key for key in set(keys) if key]
+        oldest = time.time() - max_age_seconds if max_age_seconds is not None else float("-inf")
+        found = {}
+        with self.lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.connection.execute(
+                    f"SELECT key, fields, updated_at FROM results WHERE stage = ? AND key IN ({placeholders})",
+                    [stage] + chunk
+                ).fetchall()
+                for key, fields, updated_at in rows:
+                    if updated_at < oldest:
+                        continue
+                    found[key] = json.loads(fields)
+                    if timestamp_column:
+                        found[key][timestamp_column] = updated_at
+        return found
+
+    def record_frame(self, df, stage, columns, timestamp_column=None):
+        """
+        Store the results of every row that has a non-empty value in its stage columns.
+
+        Args:
+            df (pd.DataFrame): A DataFrame with a "Company Key" column
+            stage (str): "research" or "copy"
+            columns (list): The output columns of the stage
+            timestamp_column (str): Column holding when each row's result was produced, as a
+                Unix timestamp. Rows without one are recorded as of unknown age (0), so a
+                freshness limit never reuses them. Without the column every result is
+                recorded as of now.
+
+        Returns:
+            int: The number of companies recorded
+        """
+        keys = stage_keys(df, stage)
+        done = completed_mask(df, columns) & (keys != "")
+        if timestamp_column is None:
+            produced_at = pd.Series(time.time(), index=df.index)
+        elif timestamp_column in df.columns:
+            produced_at = pd.to_numeric(df[timestamp_column], errors="coerce").fillna(0.0)
+        else:
+            produced_at = pd.Series(0.0, index=df.index)
+        rows = []
+        for key, updated_at, values in zip(keys[done], produced_at[done], df.loc[done, columns].itertuples(index=False, name=None)):
+            fields = {column: ("" if pd.isna(value) else value) for column, value in zip(columns, values)}
+            rows.append((key, stage, json.dumps(fields, ensure_ascii=False), float(updated_at)))
+
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO results (key, stage, fields, updated_at) VALUES (?, ?, ?, ?)", rows
+            )
+            self.connection.commit()
+        return len(rows)
+
+    def fan_out(self, df, stage, columns, max_age_seconds=None, timestamp_column=None):
+        """
+        Fill every unfinished row whose company already has stored results.
+
+        Args:
+            df (pd.DataFrame): A DataFrame with a "Company Key" column
+            stage (str): "research" or "copy"
+            columns (list): The output columns of the stage
+            max_age_seconds (float): Only reuse results recorded within this many seconds, None for any age
+            timestamp_column (str): If given, filled with the time each reused result was recorded
+
+        Returns:
+            int: The number of rows filled
+        """
+        keys = stage_keys(df, stage)
+        pending = ~completed_mask(df, columns) & (keys != "")
+        found = self.lookup(keys[pending], stage, max_age_seconds=max_age_seconds, timestamp_column=timestamp_column)
+        if not found:
+            return 0
+
+        fill = pending & keys.isin(found.keys())
+        for column in columns + ([timestamp_column] if timestamp_column else []):
+            df.loc[fill, column] = keys[fill].map(lambda key: found[key].get(column, ""))
+        return int(fill.sum())
+
+    def forget(self, keys, stage):
+        """
+        Drop stored results so those companies are processed again.
+
+        Args:
+            keys (iterable): Stage keys to drop
+            stage (str): "research" or "copy"
+
+        Returns:
+            int: The number of results dropped
+        """
+        keys = [key for key in set(keys) if key]
+        dropped = 0
+        with self.lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                dropped += self.connection.execute(
+                    f"DELETE FROM results WHERE stage = ? AND key IN ({placeholders})",
+                    [stage] + chunk
+                ).rowcount
+            self.connection.commit()
+        return dropped
+
+    def close(self):
+        """
+        Close the underlying database connection.
+        """
+        with self.lock:
+            self.connection.close()
+
+def completed_mask(df, columns):
+    """
+    Return which rows already have a value in the stage's last column.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to check
+        columns (list): The output columns of the stage; the last one holds the main result
+
+    Returns:
+        pd.Series: True for rows that are done
+    """
+    values = df[columns[-1]]
+    return values.notna() & (values.astype(str).str.strip() != "")
+
+def mark_failed(df, index, columns, model):
+    """
+    Record in a row's endpoint column that its call failed, so reports can tell it apart
+    from rows that were never started. The row stays unfinished and is retried next run.
+
+    Args:
+        df (pd.DataFrame): The DataFrame being processed, updated in place
+        index: The row's index
+        columns (list): The output columns of the stage; the first one is the endpoint
+        model (str): The model the failed call was made with
+    """
+    df.at[index, columns[0]] = f"{model}{FAILED_SUFFIX}"
+
+def run_deduplicated(df, stage, columns, process, index=None, timestamp_column=None, max_age_seconds=None):
+    """
+    Run a stage once per unique company and fan the results out to every row.
+
+    Rows already filled (e.g. from a resumed journal) are recorded in the index, rows
+    whose company is in the index are filled from it, and only one representative row
+    per remaining company is passed to process.
+
+    Args:
+        df (pd.DataFrame): The full lead DataFrame
+        stage (str): "research" or "copy"
+        columns (list): The output columns of the stage
+        process (callable): Takes a DataFrame of representative rows and returns it filled in
+        index (CompanyIndex): The persistent index, a fresh in-memory one if omitted
+        timestamp_column (str): Column process writes each result's time to; it is stored in
+            the index and filled in for reused results
+        max_age_seconds (float): Only reuse indexed results this recent, None for any age
+
+    Returns:
+        pd.DataFrame: The full DataFrame with results fanned out
+    """
+    if index is None:
+        index = CompanyIndex(":memory:")
+    if "Company Key" not in df.columns:
+        df = add_company_keys(df)
+
+    index.record_frame(df, stage, columns, timestamp_column=timestamp_column)
+    reused = index.fan_out(df, stage, columns, max_age_seconds=max_age_seconds, timestamp_column=timestamp_column)
+
+    keys = stage_keys(df, stage)
+    pending = ~completed_mask(df, columns)
+    # Rows that cannot be identified are always processed on their own
+    representatives = pending & ((keys == "") | ~keys.duplicated())
+    work_df = df.loc[representatives].copy()
+
+    print(f"{stage}: {reused} rows reused from the company index, {len(work_df)} unique companies to process ({int(pending.sum())} pending rows)")
+
+    if len(work_df):
+        work_df = process(work_df)
+        for column in columns + [column for column in [timestamp_column] if column in work_df.columns]:
+            df.loc[work_df.index, column] = work_df[column]
+        index.record_frame(work_df, stage, columns, timestamp_column=timestamp_column)
+        fanned = index.fan_out(df, stage, columns, max_age_seconds=max_age_seconds, timestamp_column=timestamp_column)
+        print(f"{stage}: fanned results out to {fanned} duplicate rows")
+
+    return df
@@ -0,0 +1,193 @@
+import argparse
+import glob
+import os
+import time
+
+import pandas as pd
+
+from company_index import COPY_COLUMNS, COPY_WRITTEN_AT_COLUMN, RESEARCH_COLUMNS, company_key, completed_mask
+from incremental import FINGERPRINT_COLUMN, RESEARCHED_AT_COLUMN, row_fingerprints
+from result_store import load_leads, save_results
+
+# Output files of the research, copy and pipeline scripts, including interim saves
+DEFAULT_PATTERNS = [
+    "research_results_*.csv",
+    "interim_results_*.csv",
+    "Growth_List_Research.csv",
+    "Growth_List_copy.csv",
+    "Growth_List_pipeline.csv",
+    "*.store"
+]
+
+# Result columns of each stage, followed by where and when the kept values came from
+STAGES = {
+    "research": {
+        "columns": RESEARCH_COLUMNS,
+        "timestamp": RESEARCHED_AT_COLUMN,
+        "source": "Research Source"
+    },
+    "copy": {
+        "columns": COPY_COLUMNS,
+        "timestamp": COPY_WRITTEN_AT_COLUMN,
+        "source": "Copy Source"
+    }
+}
+
+# Bookkeeping columns that are not lead fields
+KEY_COLUMN = "Company Key"
+MASTER_DEFAULT_OUTPUT = "Growth_List_master.csv"
+
+def result_files(patterns=DEFAULT_PATTERNS, exclude=()):
+    """
+    Expand file patterns into the result files to merge, oldest first.
+
+    Args:
+        patterns (list): Paths or glob patterns
+        exclude (tuple): Paths to leave out, such as the master table itself
+
+    Returns:
+        list: Existing paths sorted by modification time, each listed once
+    """
+    excluded = {os.path.abspath(path) for path in exclude}
+    paths = {os.path.abspath(path): path for pattern in patterns for path in glob.glob(pattern)}
+    paths = [path for absolute, path in paths.items() if absolute not in excluded]
+    return sorted(paths, key=os.path.getmtime)
+
+def add_keys(df):
+    """
+    Add the company key to result rows, computing it once per distinct URL and email.
+
+    Args:
+        df (pd.DataFrame): Result rows, usually from many files
+
+    Returns:
+        pd.DataFrame: The rows that can be identified, with a KEY_COLUMN
+    """
+    urls = (df["URL"] if "URL" in df.columns else pd.Series("", index=df.index)).fillna("").astype(str)
+    emails = (df["CEO Email"] if "CEO Email" in df.columns else pd.Series("", index=df.index)).fillna("").astype(str)
+    pairs = pd.MultiIndex.from_arrays([urls, emails])
+    unique_pairs = pairs.unique()
+    keys = pd.Series([company_key(url, email) for url, email in unique_pairs], index=unique_pairs)
+    df[KEY_COLUMN] = keys.reindex(pairs).to_numpy()
+    return df[df[KEY_COLUMN] != ""]
+
+def load_results(paths):
+    """
+    Read result files into one long DataFrame with their origin and age.
+
+    Each row gets "_source" (the file), "_order" (its place in paths, so later files win
+    ties) and "_mtime" (the file's modification time, used where a row has no timestamp).
+
+    Args:
+        paths (list): Result files, oldest first
+
+    Returns:
+        pd.DataFrame: All identifiable rows of all files
+    """
+    frames = []
+    for order, path in enumerate(paths):
+        df = load_leads(path)
+        df["_source"] = os.path.basename(path.rstrip("/\\"))
+        df["_order"] = order
+        df["_mtime"] = os.path.getmtime(path)
+        frames.append(df)
+        print(f"Read {len(df)} rows from {path}")
+    # The same leads recur in every file, so keys are built once for all of them
+    return add_keys(pd.concat(frames, ignore_index=True, sort=False))
+
+def newest_stage_results(rows, stage):
+    """
+    Keep the newest complete result of one stage for each company.
+
+    A stage's columns are kept together, so a subject line is never paired with another
+    run's body. Rows whose stage has no result, such as triage rejections, are ignored.
+
+    Args:
+        rows (pd.DataFrame): The output of load_results
+        stage (str): A key of STAGES
+
+    Returns:
+        pd.DataFrame: The stage columns with provenance, indexed by company key
+    """
+    settings = STAGES[stage]
+    columns = [column for column in settings["columns"] if column in rows.columns]
+    if len(columns) < len(settings["columns"]):
+        return pd.DataFrame(columns=settings["columns"] + [settings["timestamp"], settings["source"]])
+
+    done = rows[completed_mask(rows, columns)].copy()
+    written_at = pd.to_numeric(done[settings["timestamp"]], errors="coerce") if settings["timestamp"] in done.columns else pd.Series(float("nan"), index=done.index)
+    done[settings["timestamp"]] = written_at.fillna(done["_mtime"])
+    done[settings["source"]] = done["_source"]
+
+    done = done.sort_values([settings["timestamp"], "_order"], kind="stable")
+    newest = done.drop_duplicates(KEY_COLUMN, keep="last").set_index(KEY_COLUMN)
+    if stage == "research":
+        # Keep the inputs the research was based on, so the master can seed --incremental runs
+        missing = newest[FINGERPRINT_COLUMN].isna() if FINGERPRINT_COLUMN in newest.columns else pd.Series(True, index=newest.index)
+        newest.loc[missing, FINGERPRINT_COLUMN] = row_fingerprints(newest.loc[missing])
+        columns = columns + [FINGERPRINT_COLUMN]
+    return newest[columns + [settings["timestamp"], settings["source"]]]
+
+def newest_lead_fields(rows, lead_columns):
+    """
+    Take each lead field's newest non-empty value per company.
+
+    Args:
+        rows (pd.DataFrame): The output of load_results
+        lead_columns (list): The lead columns to keep
+
+    Returns:
+        pd.DataFrame: One row per company key
+    """
+    leads = rows.sort_values(["_mtime", "_order"], kind="stable")
+    fields = {}
+    for column in lead_columns:
+        values = leads[column]
+        present = values.notna()
+        if not pd.api.types.is_numeric_dtype(values):
+            present &= values.astype(str).str.strip() != ""
+        # A newer file's blank never hides an older value
+        newest = leads.loc[present, [KEY_COLUMN, column]].drop_duplicates(KEY_COLUMN, keep="last")
+        fields[column] = newest.set_index(KEY_COLUMN)[column]
+    companies = leads[KEY_COLUMN].drop_duplicates(keep="last")
+    return pd.DataFrame(fields, index=pd.Index(companies, name=KEY_COLUMN), columns=lead_columns)
+
+def consolidate(paths):
+    """
+    Merge research and copy outputs into one table with a row per company.
+
+    Args:
+        paths (list): Result files, oldest first
+
+    Returns:
+        pd.DataFrame: The master table, lead fields first, then each stage with its provenance
+    """
+    rows = load_results(paths)
+    result_columns = {KEY_COLUMN, "_source", "_order", "_mtime", FINGERPRINT_COLUMN}
+    for settings in STAGES.values():
+        result_columns.update(settings["columns"] + [settings["timestamp"], settings["source"]])
+    lead_columns = [column for column in rows.columns if column not in result_columns]
+
+    master = newest_lead_fields(rows, lead_columns)
+    for stage in STAGES:
+        master = master.join(newest_stage_results(rows, stage), how="left")
+
+    researched = master[RESEARCH_COLUMNS[-1]].notna().sum()
+    written = master[COPY_COLUMNS[-1]].notna().sum()
+    print(f"Consolidated {len(rows)} rows from {len(paths)} files into {len(master)} companies: {researched} with research, {written} with copy")
+    return master.reset_index()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Merge research and copy outputs into one master table keyed by company.")
+    parser.add_argument("files", nargs="*", help="Result files or glob patterns to merge (default: the scripts' usual outputs)")
+    parser.add_argument("--output", default=MASTER_DEFAULT_OUTPUT, help="CSV to write the master table to, or a .store directory for a typed result store")
+    args = parser.parse_args()
+
+    paths = result_files(args.files or DEFAULT_PATTERNS, exclude=[args.output])
+    if not paths:
+        parser.error("no result files found")
+
+    start_time = time.time()
+    master = consolidate(paths)
+    save_results(master, args.output)
+    print(f"Master table saved to {args.output} in {time.time() - start_time:.1f}s")
@@ -1,23 +1,104 @@
 import pandas as pd
 import os
-import time
+import argparse
 from typing import Dict, List
 from openai import OpenAI
 from dotenv import load_dotenv
 import re
+import json
+import time
+from rate_limiter import estimate_tokens, create_response_with_retry
+from research_cache import ResearchCache, make_cache_key
+from checkpoint import CheckpointJournal, journal_path_for
+from company_index import CompanyIndex, COPY_COLUMNS, COPY_WRITTEN_AT_COLUMN, add_company_keys, mark_failed, run_deduplicated, stage_keys
+from prompt_registry import default_prompt_registry, build_prompt_input, input_text, usage_summary
+from icp_score import score_leads, select_leads
+from budget import BUDGET_CONFIG, BudgetExceeded, BudgetGovernor
+from cascade import CASCADE_CONFIG, run_cascade
+from clustering import CLUSTER_CONFIG, archetype_copy
+from scheduler import SCHEDULE_CONFIG, parse_deadline, report_deferred, schedule_leads, seconds_until
+from resilience import RESILIENCE_CONFIG, default_request_guard
+from telemetry import default_metrics, metrics_path_for
+from result_store import load_leads, save_results
+from incremental import response_time
+
+# Expected size of a generated email, reserved against the tokens-per-minute limit
+COPY_OUTPUT_TOKENS = 1500
+
+# JSON schema for structured copy output: the template's bracketed brief fields, then the email
+COPY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "product": {
+            "type": "string",
+            "description": "The target's product, as it fills [product] in the template"
+        },
+        "highlight": {
+            "type": "string",
+            "description": "The most interesting or compelling aspect of the product"
+        },
+        "hook": {
+            "type": "string",
+            "description": "How Conifer would help, e.g. speed up development or reduce costs"
+        },
+        "subjects": {
+            "type": "array",
+            "items": {"type": "string"},
+            "minItems": 4,
+            "maxItems": 4,
+            "description": "Exactly four subject line options"
+        },
+        "body": {
+            "type": "string",
+            "description": "The filled-in email from the line after \"Hey [Target],\" up to, not including, the \"Call me anytime\" line"
+        }
+    },
+    "required": ["product", "highlight", "hook", "subjects", "body"],
+    "additionalProperties": False
+}
+
+# Responses API text format requesting COPY_SCHEMA
+COPY_TEXT_FORMAT = {
+    "format": {
+        "type": "json_schema",
+        "name": "sales_email",
+        "schema": COPY_SCHEMA,
+        "strict": True
+    }
+}
+
+# Appended to the prompt in structured mode; static, so the prompt prefix is still cached
+STRUCTURED_OUTPUT_NOTE = (
+    "\n\nOutput format override: instead of the \"Subject Option\" layout above, reply with JSON "
+    "matching the sales_email schema. Put the four subject options in \"subjects\" and the email "
+    "body in \"body\", keeping [Target] as the placeholder for the recipient's name."
+)
+
+# Appended to the prompt in packed mode; static, so the prompt prefix is still cached
+PACKED_OUTPUT_NOTE = (
+    "\n\nOutput format override: this request contains several numbered leads. Write one separate email "
+    "per lead, in the same order, each following all of the instructions above. Start each email with a "
+    "line \"### Lead <number>\" and then use the \"Subject Option\" layout above, keeping [Target] as the "
+    "placeholder for the recipient's name."
+)
+
+class CopyValidationError(ValueError):
+    """
+    Raised when a structured copy response does not match COPY_SCHEMA.
+    """
 
 def process_growth_list_csv(input_file_path):
     """
     Load a CSV file into a pandas DataFrame and add specified columns.
     
     Args:
-        input_file_path (str): Path to the input CSV file
+        input_file_path (str): Path to the input CSV file or result store
         
     Returns:
         pd.DataFrame: The modified DataFrame
     """
     # Load the CSV file into a DataFrame
-    df = pd.read_csv(input_file_path)
+    df = load_leads(input_file_path)
     
     # Add the six new columns with empty values
     new_columns = [
@@ -71,12 +152,13 @@ def setup_openai_api():
     if not api_key:
         raise ValueError("OpenAI API key not found. Please check your .env file.")
     
-    # Initialize the OpenAI client
-    client = OpenAI(api_key=api_key)
+    # Initialize the OpenAI client (retries are handled by the rate limiter)
+    client = OpenAI(api_key=api_key, max_retries=0)
     print("OpenAI API configured successfully")
     return client
 
-def execute_api_call(client, prompt_content, target_url):
+def execute_api_call(client, prompt_content, target_url, rate_limiter=None, cache=None, structured=False, refresh=False,
+                     model="gpt-4o", search_context_size=None):
     """
     Execute an API call to OpenAI with web search enabled.
     
@@ -84,25 +166,56 @@ def execute_api_call(client, prompt_content, target_url):
         client: The OpenAI client
         prompt_content (str): The content to use as a prompt
         target_url (str): The URL to search
+        rate_limiter (RateLimiter): Limiter to pace the call, defaults to the shared limiter
+        cache (ResearchCache): Optional response cache consulted before calling the API
+        structured (bool): Request JSON output matching COPY_SCHEMA instead of free text
+        refresh (bool): Skip the cached response, e.g. when it failed validation, and cache the new one
+        model (str): The OpenAI model to use
+        search_context_size (str): Web search context size ("low", "medium" or "high"), the API default if None
         
     Returns:
         The response from the OpenAI API
     """
     print(f"\nMaking OpenAI API call for target URL: {target_url}")
     
+    request_options = {}
+    if structured:
+        prompt_content = prompt_content + STRUCTURED_OUTPUT_NOTE
+        request_options["text"] = COPY_TEXT_FORMAT
+    
+    # Static prompt first and the target last, so the prompt prefix is cached by the provider
+    copy_input = build_prompt_input(prompt_content, f"Target:\n{target_url}")
+    copy_tools = [
+        {
+            "type": "web_search_preview"
+        }
+    ]
+    if search_context_size:
+        copy_tools[0]["search_context_size"] = search_context_size
+    
+    # Reuse an earlier response for the identical request if one is cached
+    cache_key = make_cache_key(model, copy_tools, prompt_content, target_url)
+    if cache is not None and not refresh:
+        cached_response = cache.get(cache_key)
+        if cached_response is not None:
+            return cached_response
+    
     try:
         # Using the responses.create method with web search as shown in the documentation
-        response = client.responses.create(
-            model="gpt-4o",
-            tools=[
-                {
-                    "type": "web_search_preview"
-                }
-            ],
-            input=f"{prompt_content}\nTarget:\n{target_url}"
+        response = create_response_with_retry(
+            client,
+            limiter=rate_limiter,
+            estimated_tokens=estimate_tokens(input_text(copy_input)) + COPY_OUTPUT_TOKENS,
+            model=model,
+            tools=copy_tools,
+            input=copy_input,
+            prompt_cache_key="copywrite",
+            **request_options
         )
         
-        print("OpenAI API call completed successfully")
+        print(f"OpenAI API call completed successfully ({usage_summary(response)['cached_tokens']} cached input tokens)")
+        if cache is not None:
+            cache.put(cache_key, response)
         return response
     except Exception as e:
         print(f"Error making OpenAI API call: {str(e)}")
@@ -150,9 +263,21 @@ def parse_response(response):
     # Print the response for debugging
     print(f"\nResponse received (first 200 chars):\n{response_text[:200]}...\n")
     
+    return parse_copy_text(response_text)
+
+def parse_copy_text(response_text):
+    """
+    Extract the subjects and body from copy in the "Subject Option" layout.
+    
+    Args:
+        response_text (str): The generated copy for one lead
+        
+    Returns:
+        dict: A dictionary containing the subjects and body
+    """
     # Extract the subjects and body using regex
     subjects = []
-    subject_pattern = r"Subject Option (\d+): (.*?)(?:\n|$)"
+    subject_pattern = r"Subject (?:Option )?(\d+): (.*?)(?:\n|$)"
     body_pattern = r"Hey \[Target\],([\s\S]*?)(?:\nCall me anytime|$)"
     
     # Extract subjects
@@ -175,7 +300,212 @@ def parse_response(response):
         "body": body
     }
 
-def openai_call(df: pd.DataFrame, prompt, client):
+def parse_structured_response(response):
+    """
+    Parse and validate a structured (COPY_SCHEMA) response in one pass.
+    
+    Args:
+        response: The response from the OpenAI API, requested with COPY_TEXT_FORMAT
+        
+    Returns:
+        dict: The subjects, body and brief fields, in the same shape as parse_response
+        
+    Raises:
+        CopyValidationError: If the output is not valid JSON or is missing copy
+    """
+    try:
+        data = json.loads(response.output_text)
+    except (TypeError, ValueError) as e:
+        raise CopyValidationError(f"Response is not valid JSON: {str(e)}")
+    if not isinstance(data, dict):
+        raise CopyValidationError("Response JSON is not an object")
+    
+    subjects = data.get("subjects")
+    if not isinstance(subjects, list) or len(subjects) != 4 or not all(isinstance(subject, str) and subject.strip() for subject in subjects):
+        raise CopyValidationError(f"Expected 4 non-empty subjects, got {subjects!r}")
+    
+    body = data.get("body")
+    if not isinstance(body, str) or not body.strip():
+        raise CopyValidationError("Body is empty")
+    
+    # Match parse_response, which stores the body without the greeting and sign-off
+    body = re.sub(r"^\s*Hey \[Target\],", "", body)
+    body = re.split(r"\nCall me anytime", body, maxsplit=1)[0].strip()
+    
+    print(f"Parsed structured copy: 4 subjects and body text of length {len(body)}")
+    
+    return {
+        "subjects": [subject.strip() for subject in subjects],
+        "body": body,
+        "brief": {field: data.get(field, "") for field in ("product", "highlight", "hook")}
+    }
+
+def generate_structured_copy(client, prompt_content, target_url, cache=None, max_attempts=3, model="gpt-4o", search_context_size=None):
+    """
+    Request structured copy for one target, re-requesting it only while the output fails validation.
+    
+    Args:
+        client: The OpenAI client
+        prompt_content (str): The prompt template
+        target_url (str): The URL to search
+        cache (ResearchCache): Optional response cache; an invalid cached response is replaced
+        max_attempts (int): Requests to make before giving up on the row
+        model (str): The OpenAI model to use
+        search_context_size (str): Web search context size, the API default if None
+        
+    Returns:
+        dict: The output of parse_structured_response
+        
+    Raises:
+        CopyValidationError: If no attempt produced valid copy
+    """
+    for attempt in range(max_attempts):
+        response = execute_api_call(client, prompt_content, target_url, cache=cache, structured=True, refresh=attempt > 0, model=model, search_context_size=search_context_size)
+        try:
+            return parse_structured_response(response)
+        except CopyValidationError as e:
+            print(f"Invalid structured copy for {target_url} (attempt {attempt+1}/{max_attempts}): {str(e)}")
+            if attempt == max_attempts - 1:
+                raise
+
+def packed_lead_text(leads):
+    """
+    Lay out several leads as numbered sections of one request.
+    
+    Args:
+        leads (list): Dicts with "target_url" and optionally "ceo_name", "description" and "research_data"
+        
+    Returns:
+        str: The per-request part of a packed copy request
+    """
+    sections = []
+    for number, lead in enumerate(leads, start=1):
+        lines = [f"Lead {number}:", f"Target:\n{lead['target_url']}"]
+        if lead.get("ceo_name"):
+            lines.append(f"CEO: {lead['ceo_name']}")
+        if lead.get("description"):
+            lines.append(f"Description: {lead['description']}")
+        if lead.get("research_data"):
+            lines.append(f"Research Data (already researched, use this instead of searching the website):\n{lead['research_data']}")
+        sections.append("\n".join(lines))
+    return "\n\n".join(sections)
+
+def execute_packed_call(client, prompt_content, leads, rate_limiter=None, cache=None, model="gpt-4o", search_context_size=None):
+    """
+    Execute one API call that writes copy for several leads, sending the prompt once.
+    
+    Args:
+        client: The OpenAI client
+        prompt_content (str): The content to use as a prompt
+        leads (list): The leads to write copy for, as accepted by packed_lead_text
+        rate_limiter (RateLimiter): Limiter to pace the call, defaults to the shared limiter
+        cache (ResearchCache): Optional response cache consulted before calling the API
+        model (str): The OpenAI model to use
+        search_context_size (str): Web search context size ("low", "medium" or "high"), the API default if None
+        
+    Returns:
+        The response from the OpenAI API
+    """
+    print(f"\nMaking packed OpenAI API call for {len(leads)} leads")
+    
+    prompt_content = prompt_content + PACKED_OUTPUT_NOTE
+    lead_text = packed_lead_text(leads)
+    copy_input = build_prompt_input(prompt_content, lead_text)
+    copy_tools = [
+        {
+            "type": "web_search_preview"
+        }
+    ]
+    if search_context_size:
+        copy_tools[0]["search_context_size"] = search_context_size
+    
+    # The whole pack is one cache entry; a different grouping of the same leads is a new request
+    cache_key = make_cache_key(model, copy_tools, prompt_content, lead_text)
+    if cache is not None:
+        cached_response = cache.get(cache_key)
+        if cached_response is not None:
+            return cached_response
+    
+    response = create_response_with_retry(
+        client,
+        limiter=rate_limiter,
+        estimated_tokens=estimate_tokens(input_text(copy_input)) + COPY_OUTPUT_TOKENS * len(leads),
+        model=model,
+        tools=copy_tools,
+        input=copy_input,
+        prompt_cache_key="copywrite_packed"
+    )
+    
+    print(f"Packed API call completed successfully ({usage_summary(response)['cached_tokens']} cached input tokens)")
+    if cache is not None:
+        cache.put(cache_key, response)
+    return response
+
+def parse_packed_response(response, count):
+    """
+    Split a packed response into per-lead copy.
+    
+    Args:
+        response: The response from execute_packed_call
+        count (int): Number of leads in the request
+        
+    Returns:
+        list: The parse_copy_text result for each lead in request order, None where the
+            lead's section is missing or incomplete
+    """
+    response_text = response.output_text or ""
+    sections = {}
+    for match in re.finditer(r"^#+\s*Lead (\d+)[^\n]*\n([\s\S]*?)(?=^#+\s*Lead \d+|\Z)", response_text, re.M):
+        sections.setdefault(int(match.group(1)), match.group(2))
+    
+    results = []
+    for number in range(1, count + 1):
+        parsed_data = parse_copy_text(sections[number]) if number in sections else None
+        if parsed_data is not None and (not parsed_data["body"] or not all(parsed_data["subjects"])):
+            parsed_data = None
+        results.append(parsed_data)
+    return results
+
+def store_copy_result(df, index, parsed_data, ceo_name, model="gpt-4o", written_at=None):
+    """
+    Write parsed subjects and body into a DataFrame row.
+    
+    The row is stamped with COPY_WRITTEN_AT_COLUMN, so consolidate can tell which of
+    several files holds a company's newest copy.
+    
+    Args:
+        df (pd.DataFrame): The DataFrame to update
+        index: The index of the row to update
+        parsed_data (dict): The output of parse_response
+        ceo_name (str): The CEO's full name, used to personalize the body
+        model (str): The model that generated the copy
+        written_at (float): When the copy was produced, e.g. response_time(response); now if None
+        
+    Returns:
+        dict: The column values written to the row
+    """
+    # Get the CEO's first name (first word in CEO Name)
+    ceo_first_name = ceo_name.split()[0] if ceo_name else "[Target]"
+    print(f"Using CEO first name: {ceo_first_name}")
+    
+    # Replace [Target] with CEO's first name in the body
+    body_text = parsed_data["body"].replace("[Target]", ceo_first_name)
+    
+    fields = {"AI Copy Generation Endpoint": model}
+    for i, subject in enumerate(parsed_data["subjects"]):
+        fields[f"Subject {i+1}"] = subject
+        print(f"Subject {i+1}: {subject[:50]}...")
+    fields["Body"] = body_text
+    print(f"Body preview: {body_text[:100]}...")
+    fields[COPY_WRITTEN_AT_COLUMN] = written_at if written_at is not None else round(time.time())
+    
+    # Update the DataFrame with the results
+    for column, value in fields.items():
+        df.at[index, column] = value
+    
+    return fields
+
+def openai_call(df: pd.DataFrame, prompt, client, cache=None, journal=None, structured=False, model="gpt-4o", search_context_size=None, budget=None):
     """
     Process each row in the DataFrame, call OpenAI API, and update the DataFrame with results.
     
@@ -183,11 +513,19 @@ def openai_call(df: pd.DataFrame, prompt, client):
         df (pd.DataFrame): The DataFrame to process
         prompt (str): The prompt template to use
         client: The OpenAI client
+        cache (ResearchCache): Optional response cache shared by every row
+        journal (CheckpointJournal): Optional journal recording each finished row; rows it already holds are skipped
+        structured (bool): Request schema-validated JSON copy, re-requesting rows that fail validation
+        model (str): The OpenAI model to use
+        search_context_size (str): Web search context size, the API default if None
+        budget (BudgetGovernor): Optional spend limits; may downgrade the model or stop the loop
         
     Returns:
         pd.DataFrame: The updated DataFrame
     """
     total_rows = len(df)
+    if budget is not None:
+        budget.plan(total_rows)
     
     # Iterate through each row in the DataFrame
     for index, row in df.iterrows():
@@ -199,6 +537,11 @@ def openai_call(df: pd.DataFrame, prompt, client):
             print(f"Skipping row {index+1} due to missing URL")
             continue
         
+        # Skip rows already finished in an earlier run
+        if journal is not None and index in journal.completed:
+            print(f"Skipping row {index+1}, copy already generated")
+            continue
+        
         # Create target dictionary
         target_dict = {
             "target_url": row["URL"] if pd.notna(row["URL"]) else "",
@@ -209,81 +552,197 @@ def openai_call(df: pd.DataFrame, prompt, client):
         print(f"Target URL: {target_dict['target_url']}")
         print(f"CEO Name: {target_dict['ceo_name']}")
         
+        # Stop before the call once the budget is spent; finished rows are already journaled
+        row_model, context_size = model, search_context_size
+        if budget is not None:
+            try:
+                row_model, context_size = budget.request_settings(model, search_context_size)
+            except BudgetExceeded:
+                print(f"Stopping at row {index+1}: budget exhausted. Re-run with --resume to continue.")
+                return df
+        
         try:
-            # Call OpenAI API with prompt, target URL
-            response = execute_api_call(client, prompt, target_dict["target_url"])
-            
-            # Debug the response structure
-            print("Response Object Properties:")
-            for attr in dir(response):
-                if not attr.startswith('_'):
-                    try:
-                        attr_value = getattr(response, attr)
-                        print(f"  {attr}: {type(attr_value)}")
-                    except:
-                        print(f"  {attr}: <unable to access>")
-                        
-            # Try to print the output structure
-            if hasattr(response, 'output'):
-                print("\nOutput Structure:")
-                for i, item in enumerate(response.output):
-                    print(f"  Item {i} type: {type(item)}")
-                    print(f"  Item {i} attributes: {dir(item)}")
-                    
-                    # Try to access content if it exists
-                    if hasattr(item, 'content'):
-                        print(f"  Item {i} content: {item.content}")
-                    
-                    # Try to get message content if it's a message
-                    if hasattr(item, 'role') and item.role == 'assistant':
-                        print(f"  Found assistant message")
-                        if hasattr(item, 'content'):
-                            for content_item in item.content:
-                                if hasattr(content_item, 'text'):
-                                    print(f"  Message text: {content_item.text[:100]}...")
-            
-            # Parse the response to extract subjects and body
-            parsed_data = parse_response(response)
-            
-            # Get the CEO's first name (first word in CEO Name)
-            ceo_first_name = target_dict["ceo_name"].split()[0] if target_dict["ceo_name"] else "[Target]"
-            print(f"Using CEO first name: {ceo_first_name}")
+            written_at = None
+            if structured:
+                # Request JSON copy; only this row is re-requested if it fails validation
+                parsed_data = generate_structured_copy(client, prompt, target_dict["target_url"], cache=cache, model=row_model, search_context_size=context_size)
+            else:
+                # Call OpenAI API with prompt, target URL
+                response = execute_api_call(client, prompt, target_dict["target_url"], cache=cache, model=row_model, search_context_size=context_size)
+                
+                # Parse the response to extract subjects and body
+                parsed_data = parse_response(response)
+                written_at = response_time(response)
             
-            # Replace [Target] with CEO's first name in the body
-            body_text = parsed_data["body"].replace("[Target]", ceo_first_name)
+            # Save the subjects and body in the DataFrame
+            fields = store_copy_result(df, index, parsed_data, target_dict["ceo_name"], model=row_model, written_at=written_at)
             
-            # Update the DataFrame with the results
-            df.at[index, "AI Copy Generation Endpoint"] = "gpt-4o"
-            
-            # Add subjects to the DataFrame
-            for i, subject in enumerate(parsed_data["subjects"]):
-                df.at[index, f"Subject {i+1}"] = subject
-                print(f"Subject {i+1}: {subject[:50]}...")
-            
-            # Add body to the DataFrame
-            df.at[index, "Body"] = body_text
-            print(f"Body preview: {body_text[:100]}...")
-            
-            # Save intermediate results after each successful row
-            df.to_csv(f"interim_results_{index+1}.csv", index=False)
-            print(f"Saved interim results to interim_results_{index+1}.csv")
-            
-            # Small delay to avoid rate limiting
-            print(f"Waiting for 3 seconds before next API call...")
-            time.sleep(3)
+            # Checkpoint this row's results
+            if journal is not None:
+                journal.record(index, target_dict["target_url"], fields)
             
         except Exception as e:
             print(f"\nError processing row {index}: {str(e)}")
+            mark_failed(df, index, COPY_COLUMNS, row_model)
             # Continue to the next row rather than failing completely
+        
+        if budget is not None:
+            budget.row_finished()
+    
+    print("\nAll rows processed successfully")
+    return df
+
+def packed_openai_call(df: pd.DataFrame, prompt, client, pack_size=5, cache=None, journal=None, model="gpt-4o", search_context_size=None, budget=None):
+    """
+    Generate copy for pack_size leads per API call, so the prompt is sent once per pack.
+    
+    Each pack's response is split back into rows by its "### Lead <n>" markers. Leads
+    whose section is missing or incomplete, or whose pack failed, are retried on their own.
+    
+    Args:
+        df (pd.DataFrame): The DataFrame to process
+        prompt (str): The prompt template to use
+        client: The OpenAI client
+        pack_size (int): Leads per request
+        cache (ResearchCache): Optional response cache shared by every call
+        journal (CheckpointJournal): Optional journal recording each finished row; rows it already holds are skipped
+        model (str): The OpenAI model to use
+        search_context_size (str): Web search context size, the API default if None
+        budget (BudgetGovernor): Optional spend limits; may downgrade the model or stop the loop
+        
+    Returns:
+        pd.DataFrame: The updated DataFrame
+    """
+    total_rows = len(df)
+    
+    # Collect the leads that still need copy, in row order
+    leads = []
+    for index, row in df.iterrows():
+        if pd.isna(row["URL"]) or row["URL"] == "":
+            print(f"Skipping row {index+1} due to missing URL")
+            continue
+        if journal is not None and index in journal.completed:
+            continue
+        leads.append({
+            "index": index,
+            "target_url": row["URL"],
+            "ceo_name": row["CEO Name"] if pd.notna(row["CEO Name"]) else "",
+            "description": row["Description"] if "Description" in row.index and pd.notna(row["Description"]) else "",
+            "research_data": row["Research Data"] if "Research Data" in row.index and pd.notna(row["Research Data"]) else ""
+        })
+    
+    packs = [leads[start:start + pack_size] for start in range(0, len(leads), pack_size)]
+    print(f"Packing {len(leads)}/{total_rows} rows into {len(packs)} requests of up to {pack_size} leads")
+    if budget is not None:
+        budget.plan(len(leads))
+    
+    for number, pack in enumerate(packs, start=1):
+        print(f"\n--- Processing pack {number}/{len(packs)} ---")
+        
+        # Stop before the call once the budget is spent; finished rows are already journaled
+        pack_model, context_size = model, search_context_size
+        if budget is not None:
+            try:
+                pack_model, context_size = budget.request_settings(model, search_context_size)
+            except BudgetExceeded:
+                print(f"Stopping at pack {number}: budget exhausted. Re-run with --resume to continue.")
+                return df
+        
+        try:
+            response = execute_packed_call(client, prompt, pack, cache=cache, model=pack_model, search_context_size=context_size)
+            results = parse_packed_response(response, len(pack))
+        except Exception as e:
+            print(f"\nError processing pack {number}: {str(e)}")
+            results = [None] * len(pack)
+        
+        failed = sum(parsed_data is None for parsed_data in results)
+        if failed:
+            print(f"{failed}/{len(pack)} leads in pack {number} did not parse; retrying them on their own")
+        
+        for lead, parsed_data in zip(pack, results):
+            index = lead["index"]
+            row_model = pack_model
+            try:
+                if parsed_data is None:
+                    # A retry is a call of its own, so it is checked against the budget too
+                    row_context_size = context_size
+                    if budget is not None:
+                        try:
+                            row_model, row_context_size = budget.request_settings(model, search_context_size)
+                        except BudgetExceeded:
+                            print(f"Stopping at row {index+1}: budget exhausted. Re-run with --resume to continue.")
+                            return df
+                    response = execute_api_call(client, prompt, lead["target_url"], cache=cache, model=row_model, search_context_size=row_context_size)
+                    parsed_data = parse_response(response)
+                
+                fields = store_copy_result(df, index, parsed_data, lead["ceo_name"], model=row_model, written_at=response_time(response))
+                if journal is not None:
+                    journal.record(index, lead["target_url"], fields)
+            except Exception as e:
+                print(f"\nError processing row {index}: {str(e)}")
+                mark_failed(df, index, COPY_COLUMNS, row_model)
+            
+            if budget is not None:
+                budget.row_finished()
     
     print("\nAll rows processed successfully")
     return df
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate outreach email copy for each lead with OpenAI.")
+    parser.add_argument("--input", default="Test3 Growth List Startup Plan_usa_leads - Growth List Startup Plan_usa_leads.csv", help="Lead CSV or .store result store to write copy for")
+    parser.add_argument("--output", default="Growth_List_copy.csv", help="CSV to write the copy to, or a .store directory for a typed result store")
+    parser.add_argument("--resume", action="store_true", help="Replay the checkpoint journal and skip rows finished in an earlier run")
+    parser.add_argument("--batch", action="store_true", help="Submit every lead through the OpenAI Batch API and wait for the results")
+    parser.add_argument("--poll-interval", type=float, default=60, help="Seconds between batch status checks in --batch mode")
+    parser.add_argument("--structured", action="store_true", help="Request JSON-schema copy and re-request only the rows that fail validation")
+    parser.add_argument("--pack-size", type=int, default=1, help="Write copy for this many leads per request, sending the prompt once per pack")
+    parser.add_argument("--archetypes", action="store_true", help="Write shared paragraphs once per cluster of similar leads and only personalize the rest per lead")
+    parser.add_argument("--cascade", action="store_true", help="Triage leads with a small model first and only write copy for those above the threshold")
+    parser.add_argument("--max-cost", type=float, help="Stop starting new calls once this run has spent this many USD (cheaper model from 80%% of it)")
+    parser.add_argument("--max-tokens", type=int, help="Stop starting new calls once this run has used this many input plus output tokens (cheaper model from 80%% of them)")
+    parser.add_argument("--max-minutes", type=float, help="Stop starting new calls after this many minutes (cheaper model from 80%% of them)")
+    parser.add_argument("--deadline", help="Stop starting new calls at this local time, HH:MM or YYYY-MM-DD HH:MM, without switching to a cheaper model before it; leads are dispatched by priority")
+    parser.add_argument("--max-rows", type=int, help="Only write copy for this many of the highest-priority leads")
+    parser.add_argument("--request-timeout", type=float, help="Give up on a single API attempt after this many seconds (default: per stage, see RESILIENCE_CONFIG)")
+    parser.add_argument("--hedge", action="store_true", help="Send a duplicate of any call still running past the stage's p95 latency and take the first response")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this port while the run is in progress")
+    args = parser.parse_args()
+    try:
+        deadline = parse_deadline(args.deadline) if args.deadline else None
+    except ValueError as e:
+        parser.error(str(e))
+    if args.archetypes and (args.batch or args.structured or args.pack_size > 1):
+        # Archetype copy is always schema-validated JSON and makes its own per-cluster calls
+        parser.error("--archetypes cannot be combined with --batch, --structured or --pack-size")
+    if args.pack_size > 1 and (args.batch or args.structured):
+        # Packed copy is free text split by lead and has no batch or schema-validated variant
+        parser.error("--pack-size cannot be combined with --batch or --structured")
+    
+    if args.metrics_port:
+        default_metrics.serve_prometheus(args.metrics_port)
+    
     # File paths
-    input_file = "Test3 Growth List Startup Plan_usa_leads - Growth List Startup Plan_usa_leads.csv"
-    output_file = "Growth_List_copy.csv"
+    input_file = args.input
+    output_file = args.output
     prompt_file = "CombinedPrompt.txt"  # File containing the prompt template
+    cache_file = "research_cache.sqlite3"  # Responses reused across runs on overlapping lead files
+    index_file = "company_index.sqlite3"  # Results shared by every row of the same company across lead files
+    icp_min_score = None  # Only write copy for leads with at least this ICP score (0-100), e.g. 50
+    icp_top_k = None  # Only write copy for this many of the best-scoring leads
+    copy_model = "gpt-4o"  # Model for the full copy call
+    copy_search_context_size = None  # Web search context size for the copy call, None for the API default
+    cascade_config = dict(CASCADE_CONFIG)  # Triage model, threshold and search context size for --cascade
+    budget_config = dict(BUDGET_CONFIG)  # Soft-limit fraction and the cheaper model and search context used past it
+    schedule_config = dict(SCHEDULE_CONFIG)  # Funding recency half-life and priority weights for dispatch order
+    resilience_config = dict(RESILIENCE_CONFIG)  # Per-attempt timeouts, hedging and circuit breaker thresholds
+    cluster_config = dict(CLUSTER_CONFIG)  # Similarity threshold, cluster size and models for --archetypes
+    
+    # Bound each call's latency: timeouts and the circuit breaker always apply, duplicate slow calls with --hedge
+    resilience_config["hedge"] = args.hedge
+    if args.request_timeout:
+        resilience_config["timeouts"] = {"default": args.request_timeout}
+    default_request_guard.configure(resilience_config)
     
     print(f"Starting processing with input file: {input_file}")
     
@@ -291,16 +750,75 @@ if __name__ == "__main__":
     df = process_growth_list_csv(input_file)
     print(f"DataFrame loaded with {len(df)} rows and {len(df.columns)} columns")
     
-    # Load the prompt template
-    prompt = load_text_file(prompt_file)
+    # Load and validate the prompt template once
+    prompt = default_prompt_registry.get(prompt_file).text
     
     # Set up OpenAI API
     openai_client = setup_openai_api()
     print("OpenAI client initialized")
 
-    # Process the DataFrame with OpenAI API calls
-    updated_df = openai_call(df, prompt, openai_client)
+    # Open the response cache
+    response_cache = ResearchCache(cache_file)
+
+    # Open the checkpoint journal, restoring finished rows when resuming
+    journal = CheckpointJournal(journal_path_for(output_file), resume=args.resume)
+    if args.resume:
+        df = journal.apply(df)
+
+    # Score every lead locally against the ICP and keep the best fits for paid generation
+    df = score_leads(df)
+    selected_df = select_leads(df, min_score=icp_min_score, top_k=icp_top_k)
+
+    # Dispatch recently funded, best-fitting leads first so a run cut short has done the most valuable work
+    selected_df, cut_df = schedule_leads(selected_df, max_rows=args.max_rows, config=schedule_config)
+
+    # Cap this run's spend; the governor downgrades the model near the limit and stops at it
+    budget = BudgetGovernor(args.max_cost, args.max_tokens, args.max_minutes * 60 if args.max_minutes else None, config=budget_config, deadline_seconds=seconds_until(deadline))
+
+    # Open the company index so each company gets copy once across all lead files
+    company_index = CompanyIndex(index_file)
+
+    if args.cascade:
+        # Only leads the triage model rates as a fit get the full copy call
+        selected_df = run_cascade(df, selected_df, "copy", openai_client, config=cascade_config, cache=response_cache, index=company_index, budget=budget)
+
+    if args.batch:
+        # Generate copy for the unique companies in one Batch API job
+        from batch_copy import batch_state_path_for, run_batch_copy
+        copied_df = run_deduplicated(selected_df, "copy", COPY_COLUMNS, lambda work_df: run_batch_copy(work_df, prompt, openai_client, model=copy_model, poll_interval=args.poll_interval, journal=journal, structured=args.structured, state_path=batch_state_path_for(output_file), resume=args.resume), index=company_index, timestamp_column=COPY_WRITTEN_AT_COLUMN)
+    elif args.pack_size > 1:
+        # Send the prompt once per pack of leads and split the copy back into rows
+        copied_df = run_deduplicated(selected_df, "copy", COPY_COLUMNS, lambda work_df: packed_openai_call(work_df, prompt, openai_client, pack_size=args.pack_size, cache=response_cache, journal=journal, model=copy_model, search_context_size=copy_search_context_size, budget=budget), index=company_index, timestamp_column=COPY_WRITTEN_AT_COLUMN)
+    elif args.archetypes:
+        # Write the shared paragraphs once per cluster of similar companies, then personalize each lead;
+        # every selected company is clustered, finished or not, so a resumed run keeps its archetypes
+        copy_keys = stage_keys(add_company_keys(selected_df.copy()), "copy")
+        cluster_df = selected_df[(copy_keys == "") | ~copy_keys.duplicated()]
+        copied_df = run_deduplicated(selected_df, "copy", COPY_COLUMNS, lambda work_df: archetype_copy(work_df, prompt, openai_client, cache=response_cache, journal=journal, config=cluster_config, budget=budget, cluster_df=cluster_df), index=company_index, timestamp_column=COPY_WRITTEN_AT_COLUMN)
+    else:
+        # Process the unique companies with OpenAI API calls
+        copied_df = run_deduplicated(selected_df, "copy", COPY_COLUMNS, lambda work_df: openai_call(work_df, prompt, openai_client, cache=response_cache, journal=journal, structured=args.structured, model=copy_model, search_context_size=copy_search_context_size, budget=budget), index=company_index, timestamp_column=COPY_WRITTEN_AT_COLUMN)
+
+    # Write the results back into the full list, leaving pruned leads without copy
+    updated_df = df
+    result_columns = COPY_COLUMNS + [column for column in [COPY_WRITTEN_AT_COLUMN] if column in copied_df.columns]
+    updated_df.loc[copied_df.index, result_columns] = copied_df[result_columns]
+    company_index.close()
+    journal.close()
+    print(f"Response cache stats: {response_cache.stats()}")
+    response_cache.close()
+    
+    # Report spend against the budget
+    print(f"Budget used: {budget.describe()}")
+    if budget.exhausted:
+        print("Budget exhausted before every row was processed; re-run with --resume to continue")
+    
+    # Report the highest-priority leads left for the next run
+    report_deferred(copied_df, cut_df, COPY_COLUMNS, output_file)
+    
+    # Save per-stage latency, token, web search and cost metrics next to the output
+    default_metrics.write_json(metrics_path_for(output_file))
     
-    # Save the updated DataFrame to a CSV file
-    updated_df.to_csv(output_file, index=False)
+    # Save the updated DataFrame to a CSV file or result store
+    save_results(updated_df, output_file)
     print(f"Updated DataFrame saved to {output_file}")
\ No newline at end of file
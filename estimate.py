@@ -0,0 +1,271 @@
+import json
+import math
+import os
+
+import pandas as pd
+
+from company_index import CompanyIndex, add_company_keys, stage_keys
+from copywrite import COPY_OUTPUT_TOKENS
+from prompt_registry import count_tokens, default_prompt_registry
+from rate_limiter import default_rate_limiter
+from result_store import load_leads
+from target_brief import RESEARCH_OUTPUT_TOKENS
+from telemetry import metrics_path_for, request_cost
+
+# Prompts shorter than this are never served from the provider's prompt cache
+PROMPT_CACHE_MIN_TOKENS = 1024
+
+# Seconds per call assumed when there is no metrics file from an earlier run
+DEFAULT_LATENCY_SECONDS = {
+    "target_brief": 30.0,
+    "copywrite": 30.0,
+    "pipeline_copy": 15.0
+}
+
+# The API calls each command makes per lead; label is the call's prompt_cache_key and metrics stage
+COMMAND_STAGES = {
+    "brief": [
+        {"label": "target_brief", "stage": "research", "prompt_file": "target_brief_prompt.txt", "model": "gpt-4o",
+         "output_tokens": RESEARCH_OUTPUT_TOKENS, "web_search": True, "deduplicated": True}
+    ],
+    "copy": [
+        {"label": "copywrite", "stage": "copy", "prompt_file": "CombinedPrompt.txt", "model": "gpt-4o",
+         "output_tokens": COPY_OUTPUT_TOKENS, "web_search": True, "deduplicated": True}
+    ],
+    "run": [
+        {"label": "target_brief", "stage": "research", "prompt_file": "target_brief_prompt.txt", "model": "gpt-4o",
+         "output_tokens": RESEARCH_OUTPUT_TOKENS, "web_search": True, "deduplicated": False},
+        # The brief is sent along with the copy prompt instead of searching again
+        {"label": "pipeline_copy", "stage": "copy", "prompt_file": "CombinedPrompt.txt", "model": "gpt-4o",
+         "output_tokens": COPY_OUTPUT_TOKENS, "web_search": False, "deduplicated": False, "extra_input_tokens": RESEARCH_OUTPUT_TOKENS}
+    ]
+}
+
+def count_calls(df, stage, deduplicated, index=None) -> dict:
+    """
+    Count the API calls a stage would make for a lead DataFrame.
+
+    Deduplicated stages make one call per unique company that is not already in the
+    company index, matching run_deduplicated.
+
+    Args:
+        df (pd.DataFrame): The lead DataFrame
+        stage (str): "research" or "copy"
+        deduplicated (bool): Whether the command runs the stage through run_deduplicated
+        index (CompanyIndex): The company index to check, or None to ignore it
+
+    Returns:
+        dict: "rows", "with_url", "unique", "indexed" and "calls"
+    """
+    urls = df["URL"].fillna("").astype(str).str.strip() if "URL" in df.columns else pd.Series("", index=df.index)
+    with_url = df[urls != ""]
+    counts = {"rows": len(df), "with_url": len(with_url), "unique": len(with_url), "indexed": 0, "calls": len(with_url)}
+    if not deduplicated:
+        return counts
+
+    keys = stage_keys(add_company_keys(df.copy()), stage)
+    # Rows that cannot be identified are always processed on their own
+    unique_keys = set(key for key in keys if key)
+    counts["unique"] = len(unique_keys) + int((keys == "").sum())
+    if index is not None:
+        counts["indexed"] = len(index.lookup(unique_keys, stage))
+    counts["calls"] = counts["unique"] - counts["indexed"]
+    return counts
+
+def call_profile(spec, lead_tokens, metrics=None) -> dict:
+    """
+    Work out the tokens, web searches and latency of one call.
+
+    Averages from an earlier run's metrics summary are used when it has the stage;
+    otherwise tokens come from the prompt template and the reserved output size.
+
+    Args:
+        spec (dict): One entry of COMMAND_STAGES
+        lead_tokens (float): Average tokens of the per-lead part of the request
+        metrics (dict): A summary written by Metrics.write_json, or None
+
+    Returns:
+        dict: Per-call "input_tokens", "cached_tokens", "output_tokens", "web_searches",
+            "latency" and the "source" of these numbers
+    """
+    prompt_tokens = default_prompt_registry.get(spec["prompt_file"]).token_count
+    observed = (metrics or {}).get("stages", {}).get(spec["label"])
+    if observed and observed["requests"]:
+        requests = observed["requests"]
+        return {
+            "prompt_tokens": prompt_tokens,
+            "input_tokens": observed["input_tokens"] / requests,
+            "cached_tokens": observed["cached_tokens"] / requests,
+            "output_tokens": observed["output_tokens"] / requests,
+            "web_searches": observed["web_searches"] / requests,
+            "latency": observed["latency_seconds"]["mean"],
+            "source": f"earlier run ({requests} calls)"
+        }
+
+    return {
+        "prompt_tokens": prompt_tokens,
+        "input_tokens": prompt_tokens + lead_tokens + spec.get("extra_input_tokens", 0),
+        # The static prompt comes first, so after the first call it is cached if it is long enough
+        "cached_tokens": prompt_tokens if prompt_tokens >= PROMPT_CACHE_MIN_TOKENS else 0,
+        "output_tokens": spec["output_tokens"],
+        "web_searches": 1 if spec["web_search"] else 0,
+        "latency": DEFAULT_LATENCY_SECONDS[spec["label"]],
+        "source": "prompt template"
+    }
+
+def stage_wall_time(calls, concurrency, latency, tokens_per_call, limiter=default_rate_limiter) -> tuple:
+    """
+    Project how long a stage takes, limited by concurrency or the rate limits.
+
+    Args:
+        calls (int): Number of API calls
+        concurrency (int): Calls in flight at once
+        latency (float): Seconds per call
+        tokens_per_call (float): Input plus output tokens per call
+        limiter (RateLimiter): Limiter whose requests and tokens per minute apply
+
+    Returns:
+        tuple: (seconds, name of the binding limit)
+    """
+    limits = {
+        "concurrency": math.ceil(calls / max(concurrency, 1)) * latency,
+        "tokens per minute": calls * tokens_per_call / limiter.tokens_per_minute * 60,
+        "requests per minute": calls / limiter.requests_per_minute * 60
+    }
+    binding = max(limits, key=limits.get)
+    return limits[binding], binding
+
+def overlapped_wall_time(stages, concurrency, limiter=default_rate_limiter) -> tuple:
+    """
+    Project how long overlapping stages take when they share one rate limiter, as in the pipeline.
+
+    Each stage has its own workers, so concurrency allows the slower stage plus one call
+    of the last stage. Every stage draws on the same tokens and requests per minute, so
+    those limits apply to the stages' combined demand.
+
+    Args:
+        stages (list): Stage estimates with "calls", "latency", "input_tokens" and "output_tokens"
+        concurrency (int): Calls in flight at once in each stage
+        limiter (RateLimiter): Limiter whose requests and tokens per minute apply
+
+    Returns:
+        tuple: (seconds, name of the binding limit)
+    """
+    limits = {
+        "concurrency": max(math.ceil(stage["calls"] / max(concurrency, 1)) * stage["latency"] for stage in stages) + stages[-1]["latency"],
+        "tokens per minute": sum(stage["calls"] * (stage["input_tokens"] + stage["output_tokens"]) for stage in stages) / limiter.tokens_per_minute * 60,
+        "requests per minute": sum(stage["calls"] for stage in stages) / limiter.requests_per_minute * 60
+    }
+    binding = max(limits, key=limits.get)
+    return limits[binding], binding
+
+def estimate_command(command, input_file, output_file, concurrency, index_file=None) -> dict:
+    """
+    Project rows, calls, tokens, cost and wall time of a command without calling the API.
+
+    Args:
+        command (str): A key of COMMAND_STAGES
+        input_file (str): The lead CSV or result store
+        output_file (str): The output CSV; its metrics summary, if any, calibrates the estimate
+        concurrency (int): Calls in flight at once
+        index_file (str): The company index, or None to assume nothing is indexed
+
+    Returns:
+        dict: The estimate, with one entry per stage
+    """
+    df = load_leads(input_file)
+    urls = df["URL"].dropna().astype(str).str.strip() if "URL" in df.columns else pd.Series(dtype=str)
+    urls = urls[urls != ""]
+    lead_tokens = sum(count_tokens(f"Target:\n{url}") for url in urls) / len(urls) if len(urls) else 0
+
+    metrics = None
+    metrics_path = metrics_path_for(output_file)
+    if os.path.exists(metrics_path):
+        with open(metrics_path, encoding="utf-8") as file:
+            metrics = json.load(file)
+
+    index = CompanyIndex(index_file) if index_file and os.path.exists(index_file) else None
+    stages = []
+    for spec in COMMAND_STAGES[command]:
+        counts = count_calls(df, spec["stage"], spec["deduplicated"], index=index)
+        profile = call_profile(spec, lead_tokens, metrics=metrics)
+        calls = counts["calls"]
+        tokens_per_call = profile["input_tokens"] + profile["output_tokens"]
+        seconds, binding = stage_wall_time(calls, concurrency, profile["latency"], tokens_per_call)
+        stages.append({
+            "label": spec["label"],
+            "model": spec["model"],
+            **counts,
+            **profile,
+            "cost_usd": request_cost(
+                spec["model"],
+                calls * profile["input_tokens"],
+                # The first call writes the prompt cache, later ones read it
+                max(calls - 1, 0) * profile["cached_tokens"],
+                calls * profile["output_tokens"],
+                calls * profile["web_searches"]
+            ),
+            "seconds": seconds,
+            "binding": binding
+        })
+    if index is not None:
+        index.close()
+
+    if command == "run":
+        # Copy overlaps research, but both stages share the rate limiter
+        wall_seconds, binding = overlapped_wall_time(stages, concurrency)
+    else:
+        wall_seconds = sum(stage["seconds"] for stage in stages)
+        binding = stages[-1]["binding"] if len(stages) == 1 else None
+
+    return {
+        "command": command,
+        "input_file": input_file,
+        "concurrency": concurrency,
+        "tokens_per_minute": default_rate_limiter.tokens_per_minute,
+        "requests_per_minute": default_rate_limiter.requests_per_minute,
+        "stages": stages,
+        "cost_usd": sum(stage["cost_usd"] for stage in stages),
+        "wall_seconds": wall_seconds,
+        "binding": binding
+    }
+
+def format_duration(seconds) -> str:
+    """
+    Format seconds as e.g. "1h 05m", "12m 30s" or "45s".
+    """
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h {seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m {seconds % 60:02d}s"
+    return f"{seconds}s"
+
+def format_estimate(estimate) -> str:
+    """
+    Format an estimate as a plain-text report.
+
+    Args:
+        estimate (dict): The output of estimate_command
+
+    Returns:
+        str: The report
+    """
+    lines = [
+        f"Dry run: {estimate['command']} on {estimate['input_file']} "
+        f"(concurrency {estimate['concurrency']}, {estimate['tokens_per_minute']:.0f} TPM, {estimate['requests_per_minute']:.0f} RPM)"
+    ]
+    for stage in estimate["stages"]:
+        lines.append(
+            f"  {stage['label']}: {stage['rows']} rows, {stage['with_url']} with a URL, {stage['unique']} unique, "
+            f"{stage['indexed']} already indexed -> {stage['calls']} calls to {stage['model']}"
+        )
+        lines.append(
+            f"    per call: {stage['prompt_tokens']} prompt tokens, {stage['input_tokens']:.0f} input "
+            f"({stage['cached_tokens']:.0f} cached), {stage['output_tokens']:.0f} output, {stage['web_searches']:.1f} web searches, "
+            f"{stage['latency']:.1f}s [{stage['source']}]"
+        )
+        lines.append(f"    cost ${stage['cost_usd']:.2f}, time {format_duration(stage['seconds'])} (bound by {stage['binding']})")
+    bound_by = f" (bound by {estimate['binding']})" if estimate["binding"] else ""
+    lines.append(f"  Total: ${estimate['cost_usd']:.2f}, about {format_duration(estimate['wall_seconds'])}{bound_by}")
+    return "\n".join(lines)
@@ -0,0 +1,192 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from sort_leads import parse_employee_band, parse_numeric
+
+# Ideal Client Profile areas from target_brief_prompt.txt and their keywords
+ICP_KEYWORDS = {
+    "Computer Vision": [
+        "computer vision", "machine vision", "vision", "camera", "image", "imaging", "video analytics",
+        "3d vision", "3d sensing", "depth sensing", "stereo", "lidar", "object detection", "tracking", "realsense", "yolo", "spatial computing",
+        "augmented reality", "inspection"
+    ],
+    "IoT": [
+        "iot", "internet of things", "sensor", "sensors", "connected device", "embedded", "hardware",
+        "wearable", "firmware", "remote monitoring", "edge", "smart device", "telematics"
+    ],
+    "Robotics": [
+        "robot", "robots", "robotics", "automation", "autonomous", "drone", "drones", "manipulator",
+        "warehouse automation", "self-driving"
+    ],
+    "Aerospace & Defense": [
+        "aerospace", "space", "satellite", "satellites", "spacecraft", "defense", "defence", "aviation",
+        "aircraft", "launch", "propulsion", "orbit", "military", "uav"
+    ],
+    "Digital Health & Med Devices": [
+        "medical device", "medical devices", "digital health", "medtech", "healthcare", "health",
+        "clinical", "diagnostic", "diagnostics", "patient", "hospital", "surgical", "biosensor"
+    ]
+}
+
+# How much a keyword hit counts in each text column
+COLUMN_WEIGHTS = {
+    "Industry": 2.0,
+    "Description": 1.5,
+    "Technologies": 0.5
+}
+
+# Funding stages that fit a funded SMB
+FUNDING_TYPE_WEIGHTS = {
+    "Pre-Seed": 0.6,
+    "Seed": 1.0,
+    "Series A": 1.0,
+    "Series B": 0.8,
+    "Venture - Series Unknown": 0.6,
+    "Convertible Note": 0.5,
+    "Series C": 0.5,
+    "Series D": 0.3,
+    "Series E": 0.2,
+    "Series F": 0.2,
+    "Private Equity": 0.2
+}
+
+# Share of the final 0-100 score carried by each component
+SCORE_WEIGHTS = {
+    "fit": 0.6,
+    "funding": 0.25,
+    "size": 0.15
+}
+
+def keyword_matrix(df, keywords):
+    """
+    Count whole-word keyword hits in the weighted text columns, one column per keyword.
+
+    Each text column is scanned once with a single alternation of every keyword
+    (longest first, so "medical devices" wins over "medical device").
+
+    Args:
+        df (pd.DataFrame): The lead DataFrame
+        keywords (list): Lowercase keywords
+
+    Returns:
+        np.ndarray: rows x keywords array of weighted, log-scaled hit counts
+    """
+    matrix = np.zeros((len(df), len(keywords)))
+    positions = {keyword: position for position, keyword in enumerate(keywords)}
+    alternation = "|".join(re.escape(keyword) for keyword in sorted(keywords, key=len, reverse=True))
+    pattern = r"(?<![a-z0-9])(" + alternation + r")(?![a-z0-9])"
+
+    for column, weight in COLUMN_WEIGHTS.items():
+        if column not in df.columns:
+            continue
+        text = pd.Series(df[column].fillna("").astype(str).str.lower().to_numpy())
+        matches = text.str.extractall(pattern)[0]
+        if matches.empty:
+            continue
+        rows = matches.index.get_level_values(0).to_numpy()
+        columns = matches.map(positions).to_numpy()
+        counts = np.zeros_like(matrix)
+        np.add.at(counts, (rows, columns), 1)
+        matrix += weight * np.log1p(counts)
+    return matrix
+
+def fit_scores(df):
+    """
+    Score each lead against every ICP area with TF-IDF-weighted keyword matching.
+
+    Keywords that appear in most of the list (e.g. "hardware" in a hardware-heavy
+    export) get a low IDF and count for less than rare, specific ones.
+
+    Args:
+        df (pd.DataFrame): The lead DataFrame
+
+    Returns:
+        pd.DataFrame: One column per ICP area, each scaled to 0-1
+    """
+    keywords = list(dict.fromkeys(keyword for area_keywords in ICP_KEYWORDS.values() for keyword in area_keywords))
+    matrix = keyword_matrix(df, keywords)
+
+    row_count = max(len(df), 1)
+    document_frequency = (matrix > 0).sum(axis=0)
+    idf = np.log((1 + row_count) / (1 + document_frequency)) + 1
+    weighted = matrix * idf
+
+    areas = {}
+    for area, area_keywords in ICP_KEYWORDS.items():
+        raw = weighted[:, [keywords.index(keyword) for keyword in area_keywords]].sum(axis=1)
+        # Saturate so one very wordy description does not dominate
+        areas[area] = 1 - np.exp(-raw / 8)
+    return pd.DataFrame(areas, index=df.index)
+
+def score_leads(df):
+    """
+    Add "ICP Score" (0-100) and "ICP Match" columns to a lead DataFrame in one vectorized pass.
+
+    The score combines the best ICP area fit (with a bonus for matching several areas,
+    e.g. computer vision in robotics), the funding stage and amount, and the company size.
+
+    Args:
+        df (pd.DataFrame): The lead DataFrame
+
+    Returns:
+        pd.DataFrame: The DataFrame with the new columns
+    """
+    areas = fit_scores(df)
+    best_fit = areas.max(axis=1)
+    # Companies in two ICP areas get the "double synergy" bonus
+    second_fit = np.sort(areas.to_numpy(), axis=1)[:, -2] if areas.shape[1] > 1 else 0
+    fit = np.clip(best_fit + 0.3 * second_fit, 0, 1)
+
+    if "Funding Type" in df.columns:
+        stage = df["Funding Type"].map(FUNDING_TYPE_WEIGHTS).fillna(0.3)
+    else:
+        stage = pd.Series(0.3, index=df.index)
+    if "Funding Amount (in USD)" in df.columns:
+        amount = parse_numeric(df["Funding Amount (in USD)"])
+        # $1M scores 0.5, $10M about 0.9; unknown amounts are neutral
+        amount_score = (1 - np.exp(-amount / 1_500_000)).fillna(0.5)
+    else:
+        amount_score = pd.Series(0.5, index=df.index)
+    funding = 0.5 * stage + 0.5 * amount_score
+
+    if "Number of Employees" in df.columns:
+        bands = parse_employee_band(df["Number of Employees"])
+        upper = bands["Employees Max"].fillna(bands["Employees Min"])
+        # SMBs up to ~250 people fit best, large companies rarely hire contractors this way
+        size = pd.Series(np.select([upper <= 250, upper <= 1000], [1.0, 0.5], default=0.1), index=df.index)
+        size = size.where(upper.notna(), 0.5)
+    else:
+        size = pd.Series(0.5, index=df.index)
+
+    score = 100 * (SCORE_WEIGHTS["fit"] * fit + SCORE_WEIGHTS["funding"] * funding + SCORE_WEIGHTS["size"] * size)
+    df["ICP Score"] = score.round(1)
+    matched = areas.ge(0.25)
+    df["ICP Match"] = matched.dot(matched.columns + ", ").str.rstrip(", ") if len(df) else ""
+
+    print(f"Scored {len(df)} leads: median ICP score {df['ICP Score'].median():.1f}")
+    return df
+
+def select_leads(df, min_score=None, top_k=None):
+    """
+    Keep the best-fitting leads before any paid API call.
+
+    Args:
+        df (pd.DataFrame): A DataFrame scored by score_leads
+        min_score (float): Drop leads scoring below this
+        top_k (int): Keep at most this many of the highest-scoring leads
+
+    Returns:
+        pd.DataFrame: The selected rows, original index preserved, highest score first
+    """
+    selected = df
+    if min_score is not None:
+        selected = selected[selected["ICP Score"] >= min_score]
+    if top_k is not None:
+        selected = selected.nlargest(top_k, "ICP Score", keep="first")
+    else:
+        selected = selected.sort_values("ICP Score", ascending=False, kind="stable")
+
+    print(f"Selected {len(selected)}/{len(df)} leads for research (min score {min_score}, top {top_k})")
+    return selected
@@ -0,0 +1,151 @@
+import hashlib
+import os
+import time
+
+import pandas as pd
+
+from company_index import RESEARCH_COLUMNS, add_company_keys, completed_mask
+from result_store import load_leads
+
+# Inputs that change what the research says about a company
+FINGERPRINT_COLUMNS = ["URL", "Description", "Funding Date", "Funding Amount (in USD)", "Technologies"]
+
+# Bookkeeping columns written next to the research
+FINGERPRINT_COLUMN = "Research Fingerprint"
+RESEARCHED_AT_COLUMN = "Researched At"
+
+# Research older than this is redone even if the row is unchanged
+DEFAULT_FRESHNESS_DAYS = 30
+
+def canonical_text(df, column) -> pd.Series:
+    """
+    Return one fingerprint column in a form that does not depend on the file type.
+
+    Funding dates and amounts are parsed the way typed_frame stores them and written out
+    in one form, so a CSV export ("March 2025", "$10,500,000") and a result store
+    (Timestamp('2025-03-01'), 10500000.0) give the same text. Other columns are
+    stripped strings.
+
+    Args:
+        df (pd.DataFrame): The lead DataFrame, from a CSV or a result store
+        column (str): One of FINGERPRINT_COLUMNS
+
+    Returns:
+        pd.Series: The column as strings, "" where missing
+    """
+    from sort_leads import MONEY_COLUMNS, parse_month_year, parse_numeric
+
+    values = df[column]
+    if column == "Funding Date":
+        dates = values if pd.api.types.is_datetime64_any_dtype(values) else parse_month_year(values)
+        return dates.dt.strftime("%Y-%m-%d").fillna("")
+    if column in MONEY_COLUMNS:
+        numbers = values.astype("float64") if pd.api.types.is_numeric_dtype(values) else parse_numeric(values)
+        return numbers.astype(str).where(numbers.notna(), "")
+    return values.fillna("").astype(str).str.strip()
+
+def row_fingerprints(df) -> pd.Series:
+    """
+    Hash each row's FINGERPRINT_COLUMNS so unchanged leads can be recognized across exports.
+
+    Text is compared as stripped strings, so trailing whitespace is not a change; funding
+    dates and amounts are compared by value (see canonical_text), so the same leads
+    fingerprint the same from a CSV or a result store.
+
+    Args:
+        df (pd.DataFrame): The lead DataFrame
+
+    Returns:
+        pd.Series: A short hex fingerprint per row
+    """
+    columns = [column for column in FINGERPRINT_COLUMNS if column in df.columns]
+    values = [canonical_text(df, column) for column in columns]
+    joined = values[0].str.cat(values[1:], sep="\x1f") if values else pd.Series("", index=df.index)
+    return pd.Series([hashlib.sha256(text.encode("utf-8")).hexdigest()[:16] for text in joined], index=df.index)
+
+def carry_forward_research(df, previous_output_file, freshness_days=DEFAULT_FRESHNESS_DAYS):
+    """
+    Copy research from an earlier output into unchanged, still-fresh rows.
+
+    Rows are matched by company key, so reordered or re-exported lists still match.
+    A row is carried forward when its fingerprint equals the earlier one and the earlier
+    research is younger than freshness_days; everything else is left for the API.
+
+    Args:
+        df (pd.DataFrame): The new lead DataFrame with empty research columns
+        previous_output_file (str): The output CSV or result store of an earlier run
+        freshness_days (float): Maximum age of research to carry forward
+
+    Returns:
+        tuple: (DataFrame with carried research, set of company keys whose research must be
+            redone, set of row indices belonging to those companies)
+    """
+    keys = add_company_keys(df.copy())["Company Key"]
+    df[FINGERPRINT_COLUMN] = row_fingerprints(df)
+
+    if not os.path.exists(previous_output_file):
+        print(f"No earlier output at {previous_output_file}; researching every row")
+        return df, set(), set()
+
+    previous = load_leads(previous_output_file)
+    if FINGERPRINT_COLUMN not in previous.columns or RESEARCHED_AT_COLUMN not in previous.columns:
+        # Outputs written before incremental mode carry no fingerprints to compare
+        previous[FINGERPRINT_COLUMN] = row_fingerprints(previous)
+        previous[RESEARCHED_AT_COLUMN] = os.path.getmtime(previous_output_file)
+    previous = add_company_keys(previous)
+    previous = previous[completed_mask(previous, RESEARCH_COLUMNS) & (previous["Company Key"] != "")]
+    previous = previous.drop_duplicates("Company Key", keep="last").set_index("Company Key")
+
+    known = keys.isin(previous.index) & (keys != "")
+    earlier = previous.reindex(keys[known])
+    earlier.index = keys[known].index
+
+    unchanged = earlier[FINGERPRINT_COLUMN].to_numpy() == df.loc[known, FINGERPRINT_COLUMN].to_numpy()
+    researched_at = pd.to_numeric(earlier[RESEARCHED_AT_COLUMN], errors="coerce")
+    fresh = (time.time() - researched_at < freshness_days * 86400).to_numpy()
+
+    carry = earlier.index[unchanged & fresh]
+    for column in RESEARCH_COLUMNS + [RESEARCHED_AT_COLUMN]:
+        df.loc[carry, column] = earlier.loc[carry, column]
+
+    changed = set(keys[earlier.index[~unchanged]])
+    stale = set(keys[earlier.index[unchanged & ~fresh]])
+    new = int((~known).sum())
+    print(f"Incremental research: {len(carry)} rows carried forward, {len(changed)} changed and {len(stale)} stale companies, {new} new rows")
+    refresh_keys = changed | stale
+    return df, refresh_keys, set(df.index[keys.isin(refresh_keys)])
+
+def response_time(response) -> float:
+    """
+    Return when a research response was produced.
+
+    A response served from the cache keeps the time it was first fetched, so cached
+    research is not mistaken for fresh research.
+
+    Args:
+        response: The research response
+
+    Returns:
+        float: The response's creation time as a Unix timestamp, now if it has none
+    """
+    created_at = getattr(response, "created_at", None)
+    return round(created_at) if created_at else round(time.time())
+
+def stamp_research(df):
+    """
+    Record the fingerprint each row's research is based on.
+
+    RESEARCHED_AT_COLUMN is written by the research loops, the company index and
+    carry_forward_research with the time the research was actually produced, so it is
+    only added here where missing; rows without a time count as stale next run.
+
+    Args:
+        df (pd.DataFrame): The researched DataFrame
+
+    Returns:
+        pd.DataFrame: The DataFrame with FINGERPRINT_COLUMN and RESEARCHED_AT_COLUMN
+    """
+    df[FINGERPRINT_COLUMN] = row_fingerprints(df)
+    if RESEARCHED_AT_COLUMN not in df.columns:
+        df[RESEARCHED_AT_COLUMN] = pd.NA
+    return df
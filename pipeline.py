@@ -0,0 +1,263 @@
+import argparse
+import asyncio
+
+import pandas as pd
+
+from checkpoint import CheckpointJournal, journal_path_for
+from copywrite import COPY_OUTPUT_TOKENS, parse_response, store_copy_result
+from incremental import response_time
+from prompt_registry import default_prompt_registry, build_prompt_input, input_text, usage_summary
+from rate_limiter import estimate_tokens, async_create_response_with_retry
+from research_cache import ResearchCache, make_cache_key
+from resilience import RESILIENCE_CONFIG, default_request_guard
+from result_store import load_leads, save_results
+from target_brief import (
+    async_target_research_search,
+    extract_text_from_response,
+    setup_async_openai_api
+)
+from telemetry import default_metrics, metrics_path_for
+
+def process_pipeline_csv(input_file_path):
+    """
+    Load a lead CSV and add the research and copy columns filled by the pipeline.
+
+    Args:
+        input_file_path (str): Path to the input CSV file or result store
+
+    Returns:
+        pd.DataFrame: The modified DataFrame
+    """
+    df = load_leads(input_file_path)
+
+    new_columns = [
+        "AI Research Endpoint",
+        "Research Data",
+        "AI Copy Generation Endpoint",
+        "Subject 1",
+        "Subject 2",
+        "Subject 3",
+        "Subject 4",
+        "Body"
+    ]
+
+    for column in new_columns:
+        df[column] = ""
+
+    return df
+
+def build_copy_input(copy_prompt, research_text, target_url):
+    """
+    Build the copy request input from the static prompt, the target brief and the URL.
+
+    The prompt comes first and is identical for every lead so it is served from the
+    provider's prompt cache; the brief and URL follow as the per-lead message.
+
+    Args:
+        copy_prompt (str): The copy prompt template loaded from CombinedPrompt.txt
+        research_text (str): The target brief produced by the research stage
+        target_url (str): The target's URL
+
+    Returns:
+        list: The request input messages
+    """
+    return build_prompt_input(
+        copy_prompt,
+        "Target Brief (already researched, use this instead of searching the website):\n"
+        f"{research_text}\n"
+        f"Target:\n{target_url}"
+    )
+
+async def async_copy_from_brief(client, copy_prompt, research_text, target_url, model="gpt-4o", rate_limiter=None, cache=None):
+    """
+    Generate email copy from an existing target brief, without the web search tool.
+
+    Args:
+        client: The AsyncOpenAI client
+        copy_prompt (str): The copy prompt template loaded from CombinedPrompt.txt
+        research_text (str): The target brief produced by the research stage
+        target_url (str): The target's URL
+        model (str): The OpenAI model to use for copy generation
+        rate_limiter (RateLimiter): Limiter to pace the call, defaults to the shared limiter
+        cache (ResearchCache): Optional response cache consulted before calling the API
+
+    Returns:
+        The response from the OpenAI API
+    """
+    print(f"\nGenerating copy from brief for target URL: {target_url}")
+
+    copy_input = build_copy_input(copy_prompt, research_text, target_url)
+
+    # The brief is part of the prompt text, so a new brief never hits an old copy
+    cache_key = make_cache_key(model, [], f"{copy_prompt}\n{research_text}", target_url)
+    if cache is not None:
+        cached_response = cache.get(cache_key)
+        if cached_response is not None:
+            return cached_response
+
+    response = await async_create_response_with_retry(
+        client,
+        limiter=rate_limiter,
+        estimated_tokens=estimate_tokens(input_text(copy_input)) + COPY_OUTPUT_TOKENS,
+        model=model,
+        input=copy_input,
+        prompt_cache_key="pipeline_copy"
+    )
+
+    print(f"Copy API call completed successfully for {target_url} ({usage_summary(response)['cached_tokens']} cached input tokens)")
+    if cache is not None:
+        cache.put(cache_key, response)
+    return response
+
+async def run_research_to_copy_pipeline(df, research_prompt_file, copy_prompt_file, client,
+                                        research_model="gpt-4o", copy_model="gpt-4o",
+                                        research_concurrency=10, copy_concurrency=10, queue_size=20,
+                                        cache=None, journal=None):
+    """
+    Research each lead and write its email in one streaming pass.
+
+    Research workers run the web-search target brief and hand each finished brief to
+    copy workers through a bounded queue, so copy for one lead overlaps research for
+    the next and each lead pays for web search once. The queue bound keeps research
+    from running far ahead of copy generation.
+
+    Args:
+        df (pd.DataFrame): The DataFrame from process_pipeline_csv
+        research_prompt_file (str): Path to the research prompt file
+        copy_prompt_file (str): Path to the copy prompt file
+        client: The AsyncOpenAI client
+        research_model (str): The model to use for research
+        copy_model (str): The model to use for copy generation
+        research_concurrency (int): Research calls in flight at once
+        copy_concurrency (int): Copy calls in flight at once
+        queue_size (int): Finished briefs allowed to wait for a copy worker
+        cache (ResearchCache): Optional response cache shared by both stages
+        journal (CheckpointJournal): Optional journal recording each finished row; rows it already holds are skipped
+
+    Returns:
+        pd.DataFrame: The updated DataFrame
+    """
+    try:
+        research_prompt = default_prompt_registry.get(research_prompt_file).text
+        copy_prompt = default_prompt_registry.get(copy_prompt_file).text
+    except (OSError, ValueError) as e:
+        print(f"Failed to load prompts: {str(e)}. Cannot proceed.")
+        return df
+
+    total_rows = len(df)
+    row_queue = asyncio.Queue()
+    brief_queue = asyncio.Queue(maxsize=queue_size)
+
+    for index, row in df.iterrows():
+        if pd.isna(row["URL"]) or row["URL"] == "":
+            print(f"Skipping row {index+1} due to missing URL")
+            continue
+        if journal is not None and index in journal.completed:
+            continue
+        ceo_name = row["CEO Name"] if pd.notna(row["CEO Name"]) else ""
+        row_queue.put_nowait((index, row["URL"], ceo_name))
+
+    print(f"Pipelining {row_queue.qsize()}/{total_rows} rows")
+
+    async def research_worker():
+        while True:
+            try:
+                index, target_url, ceo_name = row_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                research_response = await async_target_research_search(client, research_prompt, target_url, model=research_model, cache=cache)
+                research_text = extract_text_from_response(research_response)
+            except Exception as e:
+                print(f"\nError researching row {index+1}: {str(e)}")
+                continue
+            if not research_text:
+                print(f"No research data obtained for row {index+1}. Skipping.")
+                continue
+
+            df.at[index, "AI Research Endpoint"] = research_model
+            df.at[index, "Research Data"] = research_text
+            # Blocks while copy generation is behind, which bounds the briefs held in memory
+            await brief_queue.put((index, target_url, ceo_name, research_text))
+
+    async def copy_worker():
+        while True:
+            item = await brief_queue.get()
+            if item is None:
+                return
+            index, target_url, ceo_name, research_text = item
+            try:
+                response = await async_copy_from_brief(client, copy_prompt, research_text, target_url, model=copy_model, cache=cache)
+                parsed_data = parse_response(response)
+                fields = store_copy_result(df, index, parsed_data, ceo_name, model=copy_model, written_at=response_time(response))
+            except Exception as e:
+                print(f"\nError generating copy for row {index+1}: {str(e)}")
+                continue
+
+            if journal is not None:
+                fields["AI Research Endpoint"] = research_model
+                fields["Research Data"] = research_text
+                journal.record(index, target_url, fields)
+            print(f"--- Finished row {index+1}/{total_rows} ---")
+
+    copy_tasks = [asyncio.ensure_future(copy_worker()) for _ in range(copy_concurrency)]
+    await asyncio.gather(*(research_worker() for _ in range(research_concurrency)))
+
+    # Research is done; tell every copy worker to stop once the queue drains
+    for _ in copy_tasks:
+        await brief_queue.put(None)
+    await asyncio.gather(*copy_tasks)
+
+    print("\nAll rows processed successfully")
+    return df
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Research each lead and generate its email copy in one pass.")
+    parser.add_argument("--input", default="Test3 Growth List Startup Plan_usa_leads - Growth List Startup Plan_usa_leads.csv", help="Lead CSV or .store result store to process")
+    parser.add_argument("--output", default="Growth_List_pipeline.csv", help="CSV to write the research and copy to, or a .store directory for a typed result store")
+    parser.add_argument("--max-concurrency", type=int, default=10, help="Research calls and copy calls in flight at once, each")
+    parser.add_argument("--resume", action="store_true", help="Replay the checkpoint journal and skip rows finished in an earlier run")
+    parser.add_argument("--request-timeout", type=float, help="Give up on a single API attempt after this many seconds (default: per stage, see RESILIENCE_CONFIG)")
+    parser.add_argument("--hedge", action="store_true", help="Send a duplicate of any call still running past the stage's p95 latency and take the first response")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this port while the run is in progress")
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        default_metrics.serve_prometheus(args.metrics_port)
+
+    # File paths
+    input_file = args.input
+    output_file = args.output
+    research_prompt_file = "target_brief_prompt.txt"
+    copy_prompt_file = "CombinedPrompt.txt"
+    cache_file = "research_cache.sqlite3"
+    resilience_config = dict(RESILIENCE_CONFIG)  # Per-attempt timeouts, hedging and circuit breaker thresholds
+
+    # Bound each call's latency: timeouts and the circuit breaker always apply, duplicate slow calls with --hedge
+    resilience_config["hedge"] = args.hedge
+    if args.request_timeout:
+        resilience_config["timeouts"] = {"default": args.request_timeout}
+    default_request_guard.configure(resilience_config)
+
+    print(f"Starting pipeline with input file: {input_file}")
+
+    df = process_pipeline_csv(input_file)
+    print(f"DataFrame loaded with {len(df)} rows and {len(df.columns)} columns")
+
+    response_cache = ResearchCache(cache_file)
+    journal = CheckpointJournal(journal_path_for(output_file), resume=args.resume)
+    if args.resume:
+        df = journal.apply(df)
+
+    openai_client = setup_async_openai_api()
+    updated_df = asyncio.run(run_research_to_copy_pipeline(df, research_prompt_file, copy_prompt_file, openai_client, research_concurrency=args.max_concurrency, copy_concurrency=args.max_concurrency, cache=response_cache, journal=journal))
+
+    journal.close()
+    print(f"Response cache stats: {response_cache.stats()}")
+    response_cache.close()
+
+    # Save per-stage latency, token, web search and cost metrics next to the output
+    default_metrics.write_json(metrics_path_for(output_file))
+
+    save_results(updated_df, output_file)
+    print(f"Updated DataFrame saved to {output_file}")
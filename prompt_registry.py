@@ -0,0 +1,150 @@
+import hashlib
+import os
+import threading
+
+from rate_limiter import estimate_tokens
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Phrases each known template must contain for its output to be parseable
+REQUIRED_PHRASES = {
+    "CombinedPrompt.txt": ["Subject Option 1", "Hey [Target]"],
+    "target_brief_prompt.txt": ["target brief"],
+    "personalize_prompt.txt": ["lead_personalization", "subjects"]
+}
+
+def count_tokens(text: str, model="gpt-4o") -> int:
+    """
+    Count the tokens in a piece of text, exactly when tiktoken is installed.
+
+    Args:
+        text (str): The text to count
+        model (str): The model whose tokenizer to use
+
+    Returns:
+        int: The token count
+    """
+    if tiktoken is None:
+        return estimate_tokens(text)
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        encoding = tiktoken.get_encoding("o200k_base")
+    return len(encoding.encode(text))
+
+class PromptTemplate:
+    """
+    A prompt file loaded and validated once per run.
+    """
+
+    def __init__(self, path, text, model="gpt-4o"):
+        """
+        Args:
+            path (str): Where the template was loaded from
+            text (str): The template text, with any byte-order mark removed
+            model (str): The model used to count tokens
+        """
+        self.path = path
+        self.name = os.path.basename(path)
+        self.text = text
+        self.sha256 = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        self.token_count = count_tokens(text, model=model)
+
+class PromptRegistry:
+    """
+    Loads each prompt template once, validates it and reports its size.
+    """
+
+    def __init__(self, model="gpt-4o"):
+        """
+        Args:
+            model (str): The model used to count template tokens
+        """
+        self.model = model
+        self.templates = {}
+        self.lock = threading.Lock()
+
+    def get(self, path) -> PromptTemplate:
+        """
+        Return the template at path, loading and validating it on first use.
+
+        Args:
+            path (str): Path to the prompt file
+
+        Returns:
+            PromptTemplate: The loaded template
+        """
+        key = os.path.abspath(path)
+        with self.lock:
+            if key not in self.templates:
+                self.templates[key] = self._load(path)
+            return self.templates[key]
+
+    def _load(self, path):
+        with open(path, "r", encoding="utf-8-sig") as file:
+            text = file.read()
+
+        if not text.strip():
+            raise ValueError(f"Prompt template {path} is empty")
+
+        missing = [phrase for phrase in REQUIRED_PHRASES.get(os.path.basename(path), []) if phrase.lower() not in text.lower()]
+        if missing:
+            raise ValueError(f"Prompt template {path} is missing required text: {', '.join(missing)}")
+
+        template = PromptTemplate(path, text, model=self.model)
+        print(f"Loaded prompt template {template.name}: {template.token_count} tokens, sha256 {template.sha256[:12]}")
+        return template
+
+# Registry shared by every script in this repo
+default_prompt_registry = PromptRegistry()
+
+def build_prompt_input(static_prompt, lead_text):
+    """
+    Lay out a request with the static prompt first and the per-lead data last.
+
+    Args:
+        static_prompt (str): The template text, identical for every lead
+        lead_text (str): The per-lead part of the request
+
+    Returns:
+        list: The Responses API input messages
+    """
+    return [
+        {"role": "user", "content": static_prompt},
+        {"role": "user", "content": lead_text}
+    ]
+
+def input_text(request_input) -> str:
+    """
+    Flatten request input (a string or message list) for token estimates and cache keys.
+
+    Args:
+        request_input: The Responses API input
+
+    Returns:
+        str: The concatenated text
+    """
+    if isinstance(request_input, str):
+        return request_input
+    return "\n".join(message["content"] for message in request_input)
+
+def usage_summary(response) -> dict:
+    """
+    Read input, cached input and output token counts from a response.
+
+    Args:
+        response: The response from the OpenAI API
+
+    Returns:
+        dict: input_tokens, cached_tokens and output_tokens (0 when not reported)
+    """
+    usage = getattr(response, "usage", None)
+    details = getattr(usage, "input_tokens_details", None)
+    return {
+        "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+        "output_tokens": getattr(usage, "output_tokens", 0) or 0
+    }
@@ -0,0 +1,419 @@
+import asyncio
+import inspect
+import random
+import re
+import threading
+import time
+
+from openai import APIConnectionError, APITimeoutError, InternalServerError, RateLimitError
+
+from resilience import default_request_guard
+from telemetry import default_metrics
+
+# Errors worth retrying: throttling and transient server/network failures
+RETRYABLE_ERRORS = (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)
+
+def estimate_tokens(text: str) -> int:
+    """
+    Roughly estimate the number of tokens in a piece of text (about 4 characters per token).
+
+    Args:
+        text (str): The text to estimate
+
+    Returns:
+        int: The estimated token count
+    """
+    return max(1, len(text) // 4)
+
+def parse_reset_duration(value) -> float:
+    """
+    Parse an x-ratelimit-reset-* header value such as "1s", "6m0s" or "20ms" into seconds.
+
+    Args:
+        value (str): The header value
+
+    Returns:
+        float: The duration in seconds, or 0.0 if the value cannot be parsed
+    """
+    if not value:
+        return 0.0
+
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    units = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    total = 0.0
+    for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+        total += float(amount) * units[unit]
+    return total
+
+class RateLimiter:
+    """
+    Token-bucket limiter shared by every API call in a run.
+
+    Two buckets are tracked, one for requests per minute and one for tokens per minute.
+    Both refill continuously and are corrected from the x-ratelimit-* response headers,
+    so throughput settles at the account's actual limits instead of a fixed delay.
+    """
+
+    def __init__(self, requests_per_minute=500, tokens_per_minute=30000):
+        """
+        Args:
+            requests_per_minute (int): Starting request limit, replaced by header values once seen
+            tokens_per_minute (int): Starting token limit, replaced by header values once seen
+        """
+        self.requests_per_minute = float(requests_per_minute)
+        self.tokens_per_minute = float(tokens_per_minute)
+        self.available_requests = float(requests_per_minute)
+        self.available_tokens = float(tokens_per_minute)
+        self.blocked_until = 0.0
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self.last_refill
+        self.last_refill = now
+        self.available_requests = min(
+            self.requests_per_minute,
+            self.available_requests + elapsed * self.requests_per_minute / 60.0
+        )
+        self.available_tokens = min(
+            self.tokens_per_minute,
+            self.available_tokens + elapsed * self.tokens_per_minute / 60.0
+        )
+
+    def _reserve(self, estimated_tokens):
+        """
+        Take one request and estimated_tokens from the buckets if they are available.
+
+        Returns:
+            float: 0.0 if the reservation succeeded, otherwise the seconds to wait before trying again
+        """
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+
+            if now < self.blocked_until:
+                return self.blocked_until - now
+
+            # A single request larger than the whole bucket may proceed once the bucket is full
+            tokens_needed = min(float(estimated_tokens), self.tokens_per_minute)
+
+            request_wait = 0.0
+            if self.available_requests < 1:
+                request_wait = (1 - self.available_requests) * 60.0 / self.requests_per_minute
+            token_wait = 0.0
+            if self.available_tokens < tokens_needed:
+                token_wait = (tokens_needed - self.available_tokens) * 60.0 / self.tokens_per_minute
+
+            wait = max(request_wait, token_wait)
+            if wait > 0:
+                return wait
+
+            self.available_requests -= 1
+            self.available_tokens -= tokens_needed
+            return 0.0
+
+    def acquire(self, estimated_tokens=0):
+        """
+        Block until a request of estimated_tokens can be sent.
+
+        Args:
+            estimated_tokens (int): Estimated prompt plus completion tokens for the request
+        """
+        while True:
+            wait = self._reserve(estimated_tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, estimated_tokens=0):
+        """
+        Wait without blocking the event loop until a request of estimated_tokens can be sent.
+
+        Args:
+            estimated_tokens (int): Estimated prompt plus completion tokens for the request
+        """
+        while True:
+            wait = self._reserve(estimated_tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def record_usage(self, actual_tokens, estimated_tokens):
+        """
+        Correct the token bucket once the real usage of a request is known.
+
+        Args:
+            actual_tokens (int): Total tokens reported in response.usage
+            estimated_tokens (int): The estimate that was reserved in acquire
+        """
+        with self.lock:
+            self.available_tokens -= float(actual_tokens) - min(float(estimated_tokens), self.tokens_per_minute)
+
+    def update_from_headers(self, headers):
+        """
+        Adjust limits and remaining capacity from x-ratelimit-* response headers.
+
+        Args:
+            headers: A mapping of response headers
+        """
+        if not headers:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+
+            limit_requests = headers.get("x-ratelimit-limit-requests")
+            limit_tokens = headers.get("x-ratelimit-limit-tokens")
+            remaining_requests = headers.get("x-ratelimit-remaining-requests")
+            remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+
+            try:
+                if limit_requests:
+                    self.requests_per_minute = float(limit_requests)
+                if limit_tokens:
+                    self.tokens_per_minute = float(limit_tokens)
+                # The server's view wins whenever it is stricter than ours
+                if remaining_requests:
+                    self.available_requests = min(self.available_requests, float(remaining_requests))
+                if remaining_tokens:
+                    self.available_tokens = min(self.available_tokens, float(remaining_tokens))
+            except ValueError:
+                pass
+
+    def block_for(self, seconds):
+        """
+        Pause every caller of this limiter, e.g. after a 429 with a retry-after header.
+
+        Args:
+            seconds (float): How long to hold back new requests
+        """
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+# Limiter shared by every script in this repo unless a caller passes its own
+default_rate_limiter = RateLimiter()
+
+def get_retry_after(error) -> float:
+    """
+    Read the server-suggested wait from a failed API call, if there is one.
+
+    Args:
+        error: The exception raised by the OpenAI client
+
+    Returns:
+        float: Seconds to wait, or 0.0 if the server did not say
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return 0.0
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000.0
+        except ValueError:
+            pass
+
+    retry_after = parse_reset_duration(headers.get("retry-after"))
+    if retry_after:
+        return retry_after
+
+    return max(
+        parse_reset_duration(headers.get("x-ratelimit-reset-requests")),
+        parse_reset_duration(headers.get("x-ratelimit-reset-tokens"))
+    )
+
+def backoff_delay(attempt, base_delay=1.0, max_delay=60.0) -> float:
+    """
+    Exponential backoff with full jitter.
+
+    Args:
+        attempt (int): Zero-based retry attempt
+        base_delay (float): Delay ceiling for the first retry
+        max_delay (float): Upper bound on any single delay
+
+    Returns:
+        float: Seconds to wait before the next attempt
+    """
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+def _retry_delay(error, attempt, limiter, base_delay, max_delay):
+    delay = max(get_retry_after(error), backoff_delay(attempt, base_delay, max_delay))
+    if isinstance(error, RateLimitError):
+        # Hold back every other caller too, not only this one
+        limiter.block_for(delay)
+    return delay
+
+def _finish_call(raw_response, limiter, estimated_tokens, response):
+    limiter.update_from_headers(raw_response.headers)
+    usage = getattr(response, "usage", None)
+    if usage is not None and getattr(usage, "total_tokens", None) is not None:
+        limiter.record_usage(usage.total_tokens, estimated_tokens)
+    return response
+
+def _breaker_outcome(error):
+    # Throttling says nothing about availability; the limiter already handles it
+    return None if isinstance(error, RateLimitError) else False
+
+def _record_call(metrics, request, started, queue_delay, retries, response=None, error=None):
+    metrics.record_request(
+        request.get("prompt_cache_key") or "default",
+        request.get("model", ""),
+        time.monotonic() - started,
+        queue_delay,
+        retries,
+        response=response,
+        error=error
+    )
+
+def create_response_with_retry(client, limiter=None, estimated_tokens=0, max_retries=5,
+                               base_delay=1.0, max_delay=60.0, metrics=None, guard=None, **request):
+    """
+    Call client.responses.create under the rate limiter, retrying throttled and transient failures.
+
+    Each attempt has the stage's timeout, waits while the circuit breaker is open and,
+    with hedging enabled, is duplicated once it runs past the stage's p95 latency.
+
+    Args:
+        client: The OpenAI client
+        limiter (RateLimiter): The limiter to use, defaults to the shared limiter
+        estimated_tokens (int): Estimated prompt plus completion tokens for the request
+        max_retries (int): Retries after the first attempt before giving up
+        base_delay (float): Backoff ceiling for the first retry in seconds
+        max_delay (float): Upper bound on any single backoff in seconds
+        metrics (Metrics): Where to record the call, defaults to the shared metrics; the stage label is the request's prompt_cache_key
+        guard (RequestGuard): Timeouts, hedging and circuit breaker, defaults to the shared guard
+        **request: Keyword arguments passed through to responses.create
+
+    Returns:
+        The response from the OpenAI API
+
+    Raises:
+        CircuitOpen: If the circuit breaker stays open for longer than its maximum wait
+    """
+    limiter = limiter or default_rate_limiter
+    metrics = metrics or default_metrics
+    guard = guard or default_request_guard
+    stage = request.get("prompt_cache_key") or "default"
+    request.setdefault("timeout", guard.timeout_for(stage))
+    started = time.monotonic()
+    queue_delay = 0.0
+
+    def send():
+        return client.responses.with_raw_response.create(**request)
+
+    def send_hedge():
+        limiter.acquire(estimated_tokens)
+        return send()
+
+    def record_abandoned(raw_response):
+        # The slower request of a hedge pair still used tokens and may have searched
+        response = _finish_call(raw_response, limiter, estimated_tokens, raw_response.parse())
+        _record_call(metrics, request, started, 0.0, 0, response=response)
+
+    for attempt in range(max_retries + 1):
+        queued = time.monotonic()
+        probe = guard.wait_for_circuit()
+        limiter.acquire(estimated_tokens)
+        queue_delay += time.monotonic() - queued
+        try:
+            raw_response = guard.call(stage, send, send_hedge=send_hedge, on_abandoned=record_abandoned)
+            guard.breaker.record(True, probe=probe)
+            response = _finish_call(raw_response, limiter, estimated_tokens, raw_response.parse())
+            _record_call(metrics, request, started, queue_delay, attempt, response=response)
+            return response
+        except RETRYABLE_ERRORS as e:
+            guard.breaker.record(_breaker_outcome(e), probe=probe)
+            if attempt == max_retries:
+                _record_call(metrics, request, started, queue_delay, attempt, error=e)
+                raise
+            delay = _retry_delay(e, attempt, limiter, base_delay, max_delay)
+            print(f"Retryable API error ({type(e).__name__}), retry {attempt+1}/{max_retries} in {delay:.1f}s")
+            time.sleep(delay)
+        except Exception as e:
+            guard.breaker.record(None, probe=probe)
+            _record_call(metrics, request, started, queue_delay, attempt, error=e)
+            raise
+
+async def async_create_response_with_retry(client, limiter=None, estimated_tokens=0, max_retries=5,
+                                           base_delay=1.0, max_delay=60.0, metrics=None, guard=None, **request):
+    """
+    Async version of create_response_with_retry for the AsyncOpenAI client.
+
+    Args:
+        client: The AsyncOpenAI client
+        limiter (RateLimiter): The limiter to use, defaults to the shared limiter
+        estimated_tokens (int): Estimated prompt plus completion tokens for the request
+        max_retries (int): Retries after the first attempt before giving up
+        base_delay (float): Backoff ceiling for the first retry in seconds
+        max_delay (float): Upper bound on any single backoff in seconds
+        metrics (Metrics): Where to record the call, defaults to the shared metrics; the stage label is the request's prompt_cache_key
+        guard (RequestGuard): Timeouts, hedging and circuit breaker, defaults to the shared guard
+        **request: Keyword arguments passed through to responses.create
+
+    Returns:
+        The response from the OpenAI API
+
+    Raises:
+        CircuitOpen: If the circuit breaker stays open for longer than its maximum wait
+    """
+    limiter = limiter or default_rate_limiter
+    metrics = metrics or default_metrics
+    guard = guard or default_request_guard
+    stage = request.get("prompt_cache_key") or "default"
+    request.setdefault("timeout", guard.timeout_for(stage))
+    started = time.monotonic()
+    queue_delay = 0.0
+
+    def send():
+        return client.responses.with_raw_response.create(**request)
+
+    async def send_hedge():
+        await limiter.acquire_async(estimated_tokens)
+        return await send()
+
+    async def record_abandoned(raw_response):
+        # The slower request of a hedge pair still used tokens and may have searched
+        response = raw_response.parse()
+        if inspect.isawaitable(response):
+            response = await response
+        response = _finish_call(raw_response, limiter, estimated_tokens, response)
+        _record_call(metrics, request, started, 0.0, 0, response=response)
+
+    for attempt in range(max_retries + 1):
+        queued = time.monotonic()
+        probe = await guard.wait_for_circuit_async()
+        await limiter.acquire_async(estimated_tokens)
+        queue_delay += time.monotonic() - queued
+        try:
+            raw_response = await guard.call_async(stage, send, send_hedge=send_hedge, on_abandoned=record_abandoned)
+            guard.breaker.record(True, probe=probe)
+            # with_raw_response returns a legacy response whose parse() is synchronous
+            response = raw_response.parse()
+            if inspect.isawaitable(response):
+                response = await response
+            response = _finish_call(raw_response, limiter, estimated_tokens, response)
+            _record_call(metrics, request, started, queue_delay, attempt, response=response)
+            return response
+        except RETRYABLE_ERRORS as e:
+            guard.breaker.record(_breaker_outcome(e), probe=probe)
+            if attempt == max_retries:
+                _record_call(metrics, request, started, queue_delay, attempt, error=e)
+                raise
+            delay = _retry_delay(e, attempt, limiter, base_delay, max_delay)
+            print(f"Retryable API error ({type(e).__name__}), retry {attempt+1}/{max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # Free the probe slot if this was the half-open circuit's probe
+            guard.breaker.record(None, probe=probe)
+            raise
+        except Exception as e:
+            guard.breaker.record(None, probe=probe)
+            _record_call(metrics, request, started, queue_delay, attempt, error=e)
+            raise
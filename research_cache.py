@@ -0,0 +1,186 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+from openai.types.responses import Response
+
+# Default cache location and limits
+DEFAULT_CACHE_PATH = "research_cache.sqlite3"
+DEFAULT_TTL_SECONDS = 30 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 20000
+
+def make_cache_key(model, tools, prompt_text, target_url) -> str:
+    """
+    Build a content-addressed key for an API request.
+
+    Args:
+        model (str): The OpenAI model used for the request
+        tools (list): The tool configuration sent with the request
+        prompt_text (str): The prompt text sent with the request
+        target_url (str): The target URL the request is about
+
+    Returns:
+        str: A SHA-256 hex digest identifying the request
+    """
+    payload = json.dumps(
+        {
+            "model": model,
+            "tools": tools,
+            "prompt": prompt_text,
+            "target_url": target_url
+        },
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResearchCache:
+    """
+    On-disk SQLite cache of API responses keyed by make_cache_key.
+
+    Entries expire after ttl_seconds and the least recently used entries are evicted
+    once the cache holds more than max_entries. Hit and miss counts are kept per instance.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        Args:
+            path (str): Path to the SQLite database file
+            ttl_seconds (float): Age after which an entry is treated as missing
+            max_entries (int): Number of entries kept before LRU eviction
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self.connection.commit()
+
+    def get(self, key):
+        """
+        Look up a cached response.
+
+        Args:
+            key (str): The key from make_cache_key
+
+        Returns:
+            Response: The cached response, or None on a miss or expired entry
+        """
+        with self.lock:
+            now = time.time()
+            row = self.connection.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            response_json, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.connection.commit()
+                self.misses += 1
+                return None
+
+            try:
+                response = Response.model_validate_json(response_json)
+            except ValueError as e:
+                # Entries written by an incompatible client version are treated as missing
+                print(f"Discarding unreadable cache entry {key[:12]}: {str(e)}")
+                self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.connection.commit()
+                self.misses += 1
+                return None
+
+            self.connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self.connection.commit()
+            self.hits += 1
+
+        print(f"Cache hit for key {key[:12]}")
+        return response
+
+    def put(self, key, response):
+        """
+        Store a response and evict the least recently used entries over the size cap.
+
+        Args:
+            key (str): The key from make_cache_key
+            response (Response): The response returned by the OpenAI API
+        """
+        if not hasattr(response, "model_dump_json"):
+            return
+
+        with self.lock:
+            now = time.time()
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, response.model_dump_json(exclude_unset=True), now, now)
+            )
+            self.connection.execute(
+                """
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,)
+            )
+            self.connection.commit()
+
+    def purge_expired(self):
+        """
+        Delete every entry older than the TTL.
+
+        Returns:
+            int: The number of entries removed
+        """
+        if self.ttl_seconds is None:
+            return 0
+
+        with self.lock:
+            cursor = self.connection.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self.connection.commit()
+            return cursor.rowcount
+
+    def stats(self) -> dict:
+        """
+        Return hit/miss counters and the current number of entries.
+
+        Returns:
+            dict: hits, misses, hit_rate and entries
+        """
+        with self.lock:
+            entries = self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries
+        }
+
+    def close(self):
+        """
+        Close the underlying database connection.
+        """
+        with self.lock:
+            self.connection.close()
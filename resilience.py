@@ -0,0 +1,333 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# Tail-latency controls applied to every Responses API call
+RESILIENCE_CONFIG = {
+    "timeouts": {
+        "target_brief": 180,  # High-context web search research
+        "default": 90
+    },
+    "hedge": False,  # Send a duplicate request once a call runs past the stage's observed hedge_quantile
+    "hedge_quantile": 0.95,
+    "hedge_min_samples": 20,  # Successful calls observed in a stage before it is hedged
+    "hedge_max_fraction": 0.1,  # At most this share of calls gets a duplicate, so a general slowdown cannot double spend
+    "breaker_window": 20,  # Recent call outcomes the error rate is measured over
+    "breaker_min_calls": 10,
+    "breaker_error_rate": 0.5,  # Open the circuit at this share of failed calls
+    "breaker_cooldown_seconds": 30,  # First pause before a probe; doubles after each failed probe
+    "breaker_max_cooldown_seconds": 300,
+    "breaker_max_wait_seconds": 900  # A call waiting longer than this for the circuit fails with CircuitOpen
+}
+
+# Samples kept per stage for the hedge threshold
+LATENCY_WINDOW = 200
+
+class CircuitOpen(RuntimeError):
+    """
+    Raised when a call has waited breaker_max_wait_seconds for the circuit to close.
+    """
+
+class CircuitBreaker:
+    """
+    Pauses dispatch while the API is failing, then probes with one call at a time.
+
+    Closed: calls go through and their outcomes fill a sliding window. When the window's
+    error rate reaches the threshold the circuit opens and nothing is sent for the
+    cooldown. Then it is half-open: a single probe call is admitted; success closes the
+    circuit, failure reopens it with a doubled cooldown. Only the probe's outcome counts
+    while half-open; calls that were already in flight when the circuit opened are ignored.
+    """
+
+    def __init__(self, config=RESILIENCE_CONFIG):
+        """
+        Args:
+            config (dict): Window size, minimum calls, error-rate threshold and cooldowns
+        """
+        self.config = config
+        self.lock = threading.Lock()
+        self.outcomes = deque(maxlen=config["breaker_window"])
+        self.state = "closed"
+        self.cooldown = config["breaker_cooldown_seconds"]
+        self.opened_until = 0.0
+        self.probing = False
+
+    def admit(self):
+        """
+        Ask to start a call.
+
+        Returns:
+            tuple: (delay, probe) where delay is 0 if the call may start now, otherwise
+                seconds to wait before asking again, and probe is True if the admitted
+                call is the half-open circuit's probe
+        """
+        with self.lock:
+            now = time.monotonic()
+            if self.state == "open":
+                if now < self.opened_until:
+                    return self.opened_until - now, False
+                self.state = "half_open"
+                self.probing = False
+            if self.state == "half_open":
+                if self.probing:
+                    # Wait for the probe's outcome
+                    return 1.0, False
+                self.probing = True
+                return 0.0, True
+            return 0.0, False
+
+    def record(self, success, probe=False):
+        """
+        Record the outcome of an admitted call.
+
+        Args:
+            success (bool): True for a response, False for a timeout, connection or server
+                error, None for outcomes that say nothing about availability (e.g. a 429)
+            probe (bool): Whether the call was admitted as the probe, as returned by admit
+        """
+        with self.lock:
+            if probe and self.state == "half_open":
+                self.probing = False
+                if success:
+                    print("Circuit closed: the API is answering again")
+                    self.state = "closed"
+                    self.outcomes.clear()
+                    self.cooldown = self.config["breaker_cooldown_seconds"]
+                elif success is not None:
+                    self.cooldown = min(self.cooldown * 2, self.config["breaker_max_cooldown_seconds"])
+                    self._open()
+                return
+            if self.state != "closed" or success is None:
+                # Calls started before the circuit opened
+                return
+
+            self.outcomes.append(bool(success))
+            failures = self.outcomes.count(False)
+            if len(self.outcomes) >= self.config["breaker_min_calls"] and failures / len(self.outcomes) >= self.config["breaker_error_rate"]:
+                self._open()
+
+    def _open(self):
+        self.state = "open"
+        self.opened_until = time.monotonic() + self.cooldown
+        print(f"Circuit open: pausing API calls for {self.cooldown:.0f}s after repeated failures")
+
+class RequestGuard:
+    """
+    Per-request timeouts, hedged requests and a circuit breaker for Responses API calls.
+
+    create_response_with_retry and its async version consult the shared guard on every
+    attempt; stages are the requests' prompt_cache_key, as in the metrics.
+    """
+
+    def __init__(self, config=RESILIENCE_CONFIG):
+        """
+        Args:
+            config (dict): See RESILIENCE_CONFIG
+        """
+        self.configure(config)
+
+    def configure(self, config):
+        """
+        Replace the settings and reset the latency samples and the circuit.
+
+        Args:
+            config (dict): See RESILIENCE_CONFIG
+        """
+        self.config = config
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.calls = 0
+        self.hedges = 0
+        self.breaker = CircuitBreaker(config)
+        self.executor = None
+        # Slower calls of async hedge pairs, kept referenced until their usage is recorded
+        self.abandoned = set()
+
+    def timeout_for(self, stage) -> float:
+        """
+        Return the per-attempt timeout in seconds for a stage.
+        """
+        timeouts = self.config["timeouts"]
+        return timeouts.get(stage, timeouts["default"])
+
+    def record_latency(self, stage, seconds):
+        """
+        Add the duration of a successful call to the stage's sliding window.
+        """
+        with self.lock:
+            self.latencies.setdefault(stage, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def hedge_delay(self, stage):
+        """
+        Return how long to wait before hedging a call of this stage.
+
+        Args:
+            stage (str): The request's stage label
+
+        Returns:
+            float: The stage's observed hedge_quantile latency, or None if hedging is off or
+                too few calls have been seen
+        """
+        if not self.config["hedge"]:
+            return None
+        with self.lock:
+            self.calls += 1
+            samples = sorted(self.latencies.get(stage, ()))
+        if len(samples) < self.config["hedge_min_samples"]:
+            return None
+        return samples[min(int(self.config["hedge_quantile"] * len(samples)), len(samples) - 1)]
+
+    def claim_hedge(self) -> bool:
+        """
+        Reserve one duplicate request within hedge_max_fraction of all calls.
+
+        Returns:
+            bool: True if the hedge may be sent
+        """
+        with self.lock:
+            if self.hedges + 1 > self.config["hedge_max_fraction"] * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+    def wait_for_circuit(self) -> bool:
+        """
+        Block until the circuit breaker admits a call.
+
+        Returns:
+            bool: True if the call is the circuit's probe; pass it on to breaker.record
+
+        Raises:
+            CircuitOpen: If the circuit stays open for breaker_max_wait_seconds
+        """
+        started = time.monotonic()
+        while True:
+            delay, probe = self.breaker.admit()
+            if delay <= 0:
+                return probe
+            if time.monotonic() - started + delay > self.config["breaker_max_wait_seconds"]:
+                raise CircuitOpen("API circuit still open; giving up on this call")
+            time.sleep(min(delay, 1.0))
+
+    async def wait_for_circuit_async(self) -> bool:
+        """
+        Async version of wait_for_circuit.
+        """
+        started = time.monotonic()
+        while True:
+            delay, probe = self.breaker.admit()
+            if delay <= 0:
+                return probe
+            if time.monotonic() - started + delay > self.config["breaker_max_wait_seconds"]:
+                raise CircuitOpen("API circuit still open; giving up on this call")
+            await asyncio.sleep(min(delay, 1.0))
+
+    def call(self, stage, send, send_hedge=None, on_abandoned=None):
+        """
+        Run one attempt, hedging it with a duplicate once it runs past the stage's threshold.
+
+        Args:
+            stage (str): The request's stage label
+            send (callable): Makes the request and returns the raw response
+            send_hedge (callable): Makes the duplicate request, e.g. after reserving rate
+                limit capacity for it; defaults to send
+            on_abandoned (callable): Called with the raw response of a hedge pair's slower
+                call when it succeeds, so its usage can still be recorded
+
+        Returns:
+            The first successful raw response
+        """
+        hedge_after = self.hedge_delay(stage)
+        if hedge_after is None:
+            return self._timed(stage, send)
+
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="hedge")
+        primary = self.executor.submit(self._timed, stage, send)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done or not self.claim_hedge():
+            return primary.result()
+
+        print(f"Hedging {stage} call still running after {hedge_after:.1f}s")
+        pending = {primary, self.executor.submit(self._timed, stage, send_hedge or send)}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        # Sync requests cannot be cancelled; keep the usage of the one that loses
+                        if on_abandoned is not None:
+                            other.add_done_callback(lambda late: late.exception() is None and on_abandoned(late.result()))
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    async def call_async(self, stage, send, send_hedge=None, on_abandoned=None):
+        """
+        Async version of call.
+
+        The slower request of a hedge pair is left to finish in the background when
+        on_abandoned is given, since the API bills it either way; otherwise it is cancelled.
+
+        Args:
+            stage (str): The request's stage label
+            send (callable): Returns an awaitable that makes the request and returns the raw response
+            send_hedge (callable): Returns an awaitable that makes the duplicate request; defaults to send
+            on_abandoned (callable): Returns an awaitable that records the raw response of a
+                hedge pair's slower call when it succeeds
+
+        Returns:
+            The first successful raw response
+        """
+        hedge_after = self.hedge_delay(stage)
+        if hedge_after is None:
+            return await self._timed_async(stage, send)
+
+        primary = asyncio.ensure_future(self._timed_async(stage, send))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        if done or not self.claim_hedge():
+            return await primary
+
+        print(f"Hedging {stage} call still running after {hedge_after:.1f}s")
+        pending = {primary, asyncio.ensure_future(self._timed_async(stage, send_hedge or send))}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        if on_abandoned is None:
+                            other.cancel()
+                            continue
+                        drain = asyncio.ensure_future(self._drain(other, on_abandoned))
+                        self.abandoned.add(drain)
+                        drain.add_done_callback(self.abandoned.discard)
+                    return task.result()
+                error = error or task.exception()
+        raise error
+
+    def _timed(self, stage, send):
+        started = time.monotonic()
+        raw_response = send()
+        self.record_latency(stage, time.monotonic() - started)
+        return raw_response
+
+    async def _timed_async(self, stage, send):
+        started = time.monotonic()
+        raw_response = await send()
+        self.record_latency(stage, time.monotonic() - started)
+        return raw_response
+
+    async def _drain(self, task, on_abandoned):
+        try:
+            raw_response = await task
+        except Exception:
+            return
+        await on_abandoned(raw_response)
+
+# Shared by every API call in the process
+default_request_guard = RequestGuard()
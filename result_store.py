@@ -0,0 +1,273 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# Directory suffix that marks a result store instead of a CSV file
+STORE_SUFFIX = ".store"
+
+# Typed lead and result columns, read selectively by column
+COLUMNS_FILE = "columns.parquet"
+
+# Multi-KB free text, kept uncompressed in an Arrow IPC file that is memory-mapped on read
+TEXT_FILE = "text.arrow"
+TEXT_COLUMNS = ["Research Data", "Body", "Technologies", "Triage Reason"]
+
+# Whole-number columns that pd.read_csv turns into floats ("2016.0")
+INTEGER_COLUMNS = ["Founding Year", "Number of Lead Investors", "Number of Investors"]
+
+# Result columns with a handful of distinct values
+ENDPOINT_COLUMNS = ["AI Research Endpoint", "AI Copy Generation Endpoint"]
+
+# Column order and row count
+MANIFEST_FILE = "manifest.json"
+
+def require_pyarrow():
+    """
+    Raise a helpful error if pyarrow is not installed.
+    """
+    if pa is None:
+        raise ImportError("The result store needs pyarrow: pip install pyarrow")
+
+def is_store(path) -> bool:
+    """
+    Return whether a path names a result store rather than a CSV file.
+
+    Args:
+        path (str): An input or output path
+
+    Returns:
+        bool: True for "<name>.store" paths
+    """
+    return str(path).rstrip("/\\").endswith(STORE_SUFFIX)
+
+def typed_frame(df):
+    """
+    Apply the store's explicit column types to a lead or result DataFrame.
+
+    Lead columns are parsed as in sort_leads.parse_lead_columns (numeric funding and
+    spend, datetime funding dates, categorical Industry/Country, derived "Employees
+    Min"/"Employees Max"). Whole-number columns become nullable Int64, endpoint columns
+    become categorical and any other text becomes the string dtype. Frames read back
+    from a store keep their values, so the result can feed sort_leads.segment_leads.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to type
+
+    Returns:
+        pd.DataFrame: A typed copy
+    """
+    from sort_leads import PERCENT_COLUMNS, parse_lead_columns
+
+    typed = parse_lead_columns(df)
+    for column in PERCENT_COLUMNS:
+        # Already fractions when the frame came from a store
+        if column in df.columns and pd.api.types.is_numeric_dtype(df[column]):
+            typed[column] = df[column]
+
+    for column in INTEGER_COLUMNS:
+        if column in typed.columns:
+            typed[column] = pd.to_numeric(typed[column], errors="coerce").round().astype("Int64")
+
+    for column in typed.columns:
+        if column in ENDPOINT_COLUMNS:
+            typed[column] = typed[column].replace("", pd.NA).astype("string").astype("category")
+        elif pd.api.types.is_object_dtype(typed[column]):
+            typed[column] = typed[column].astype("string")
+    return typed
+
+def write_store(df, path):
+    """
+    Write a DataFrame to a result store directory.
+
+    TEXT_COLUMNS go to an uncompressed Arrow file so readers can memory-map them; every
+    other column is typed by typed_frame and written to Parquet. The whole store is built
+    in a temporary sibling directory and renamed into place, so an interrupted write
+    leaves the previous store untouched rather than a mix of old and new files.
+
+    Args:
+        df (pd.DataFrame): The DataFrame to store
+        path (str): The store directory, conventionally ending in STORE_SUFFIX
+
+    Returns:
+        str: The store path
+    """
+    require_pyarrow()
+    path = str(path).rstrip("/\\")
+    df = df.reset_index(drop=True)
+
+    text_columns = [column for column in df.columns if column in TEXT_COLUMNS]
+    stored_columns = [column for column in df.columns if column not in text_columns]
+    typed = typed_frame(df[stored_columns])[stored_columns]
+    text = pd.DataFrame({column: df[column].astype("string") for column in text_columns}, index=df.index)
+
+    parent, name = os.path.split(os.path.abspath(path))
+    staging = tempfile.mkdtemp(prefix=f"{name}.", suffix=".tmp", dir=parent)
+    try:
+        pq.write_table(pa.Table.from_pandas(typed, preserve_index=False), os.path.join(staging, COLUMNS_FILE))
+
+        text_table = pa.Table.from_pandas(text, preserve_index=False)
+        with pa.OSFile(os.path.join(staging, TEXT_FILE), "wb") as sink:
+            with pa.ipc.new_file(sink, text_table.schema) as writer:
+                writer.write_table(text_table)
+
+        with open(os.path.join(staging, MANIFEST_FILE), "w", encoding="utf-8") as manifest:
+            json.dump({"columns": list(df.columns), "rows": len(df), "text_columns": text_columns}, manifest)
+
+        replace_store(staging, path)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    print(f"Saved {len(df)} rows to result store {path}")
+    return path
+
+def replace_store(staging, path):
+    """
+    Move a fully written store directory to path, replacing any store already there.
+
+    A directory cannot be renamed over a non-empty one, so an existing store is first
+    renamed aside and deleted once the new one is in place. Readers see either the old
+    store or the new one, never a mix of their files.
+
+    Args:
+        staging (str): The complete new store directory, a sibling of path
+        path (str): The store directory to replace
+    """
+    if not os.path.exists(path):
+        os.rename(staging, path)
+        return
+
+    retired = staging[:-len(".tmp")] + ".old"
+    os.rename(path, retired)
+    try:
+        os.rename(staging, path)
+    except OSError:
+        os.rename(retired, path)
+        raise
+    shutil.rmtree(retired, ignore_errors=True)
+
+def read_store(path, columns=None):
+    """
+    Read some or all columns of a result store.
+
+    Only the requested Parquet columns are decoded. Text columns are memory-mapped and
+    returned as Arrow-backed strings, so they cost no copy until they are used.
+
+    Args:
+        path (str): The store directory
+        columns (list): Columns to read in this order, all of them if None
+
+    Returns:
+        pd.DataFrame: The requested columns
+    """
+    require_pyarrow()
+    with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as manifest:
+        manifest = json.load(manifest)
+
+    columns = list(manifest["columns"]) if columns is None else list(columns)
+    unknown = [column for column in columns if column not in manifest["columns"]]
+    if unknown:
+        raise KeyError(f"Columns not in result store {path}: {', '.join(unknown)}")
+
+    text_columns = [column for column in columns if column in manifest["text_columns"]]
+    typed_columns = [column for column in columns if column not in text_columns]
+
+    parts = []
+    if typed_columns or not text_columns:
+        table = pq.read_table(os.path.join(path, COLUMNS_FILE), columns=typed_columns, memory_map=True)
+        parts.append(table.to_pandas())
+        if not typed_columns:
+            # No columns selected still needs the right number of rows
+            parts[-1] = pd.DataFrame(index=range(manifest["rows"]))
+    if text_columns:
+        text_table = pa.ipc.open_file(pa.memory_map(os.path.join(path, TEXT_FILE))).read_all()
+        parts.append(text_table.select(text_columns).to_pandas(types_mapper=pd.ArrowDtype))
+
+    return pd.concat(parts, axis=1)[columns]
+
+def load_leads(path, columns=None, raw=False):
+    """
+    Read a lead or result file, from a result store or a CSV.
+
+    Args:
+        path (str): A "<name>.store" directory or a CSV file
+        columns (list): Columns to read, all of them if None
+        raw (bool): Keep a CSV's values as the strings in the file, blanks as "", so they
+            are written back unchanged (no "2016.0" for "2016"); a store is always typed
+
+    Returns:
+        pd.DataFrame: The data
+    """
+    if is_store(path):
+        return read_store(path, columns=columns)
+    if raw:
+        return pd.read_csv(path, usecols=columns, dtype=str, keep_default_na=False)
+    return pd.read_csv(path, usecols=columns)
+
+def save_results(df, path):
+    """
+    Write results to a result store or a CSV file, chosen by the path.
+
+    Args:
+        df (pd.DataFrame): The results
+        path (str): A "<name>.store" directory or a CSV file
+    """
+    if is_store(path):
+        write_store(df, path)
+    else:
+        df.to_csv(path, index=False)
+
+def store_info(path) -> dict:
+    """
+    Describe a result store without reading its data.
+
+    Args:
+        path (str): The store directory
+
+    Returns:
+        dict: Row count, the Arrow type of each column and file sizes in bytes
+    """
+    require_pyarrow()
+    with open(os.path.join(path, MANIFEST_FILE), encoding="utf-8") as manifest:
+        manifest = json.load(manifest)
+    schema = pq.read_schema(os.path.join(path, COLUMNS_FILE))
+    text_schema = pa.ipc.open_file(pa.memory_map(os.path.join(path, TEXT_FILE))).schema
+    types = {field.name: str(field.type) for field in list(schema) + list(text_schema)}
+    return {
+        "rows": manifest["rows"],
+        "columns": {column: types[column] for column in manifest["columns"]},
+        "bytes": {name: os.path.getsize(os.path.join(path, name)) for name in (COLUMNS_FILE, TEXT_FILE)}
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert lead and result files between CSV and the typed columnar result store.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    import_parser = subparsers.add_parser("import", help="Write a CSV into a result store")
+    import_parser.add_argument("csv_file", help="The CSV to read")
+    import_parser.add_argument("store", help="The store directory to write, ending in .store")
+    export_parser = subparsers.add_parser("export", help="Write a result store (or some of its columns) to CSV")
+    export_parser.add_argument("store", help="The store directory to read")
+    export_parser.add_argument("csv_file", help="The CSV to write")
+    export_parser.add_argument("--column", action="append", help="Column to export; repeat for several (default: all)")
+    info_parser = subparsers.add_parser("info", help="Print a store's row count, column types and file sizes")
+    info_parser.add_argument("store", help="The store directory to describe")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        write_store(pd.read_csv(args.csv_file), args.store)
+    elif args.command == "export":
+        read_store(args.store, columns=args.column).to_csv(args.csv_file, index=False)
+        print(f"Exported {args.store} to {args.csv_file}")
+    else:
+        print(json.dumps(store_info(args.store), indent=2))
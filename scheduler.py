@@ -0,0 +1,198 @@
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from company_index import FAILED_SUFFIX, TRIAGE_SUFFIX, completed_mask
+from icp_score import FUNDING_TYPE_WEIGHTS, score_leads
+from sort_leads import parse_month_year
+
+# Weights of the 0-100 priority and how quickly a raise stops being news
+SCHEDULE_CONFIG = {
+    "recency_half_life_days": 90,  # A raise this old counts half as much as one this month
+    "unknown_date_recency": 0.25,  # Recency assumed when "Funding Date" is missing
+    "weights": {
+        "recency": 0.45,
+        "funding_type": 0.15,
+        "fit": 0.4
+    }
+}
+
+# Lead fields written to the deferred report
+DEFERRED_FIELDS = ["Name", "URL", "Funding Date", "Funding Type", "ICP Score", "Priority"]
+
+def deferred_path_for(output_file) -> str:
+    """
+    Return where the list of deferred leads for an output file is written.
+
+    Args:
+        output_file (str): The output CSV or result store
+
+    Returns:
+        str: The deferred report path next to the output
+    """
+    return f"{output_file}.deferred.csv"
+
+def parse_deadline(text, now=None) -> float:
+    """
+    Parse a wall-clock deadline such as "17:30" or "2025-06-01 09:00".
+
+    A bare time means its next occurrence, so "02:00" given in the evening means tonight.
+
+    Args:
+        text (str): "HH:MM" or any date and time pandas can parse
+        now (datetime): The current local time, defaults to now
+
+    Returns:
+        float: The deadline as a Unix timestamp
+
+    Raises:
+        ValueError: If the text cannot be parsed or the deadline has passed
+    """
+    now = now or datetime.now()
+    try:
+        clock = datetime.strptime(text.strip(), "%H:%M")
+    except ValueError:
+        clock = None
+
+    if clock is not None:
+        deadline = now.replace(hour=clock.hour, minute=clock.minute, second=0, microsecond=0)
+        if deadline <= now:
+            deadline += timedelta(days=1)
+    else:
+        parsed = pd.to_datetime(text, errors="coerce")
+        if pd.isna(parsed):
+            raise ValueError(f"Cannot parse deadline {text!r}; use HH:MM or YYYY-MM-DD HH:MM")
+        deadline = parsed.to_pydatetime()
+        if deadline <= now:
+            raise ValueError(f"Deadline {text!r} has already passed")
+    return deadline.timestamp()
+
+def seconds_until(deadline, max_seconds=None):
+    """
+    Combine a deadline with a run-time limit into the seconds the run may take.
+
+    Args:
+        deadline (float): Unix timestamp to finish by, None for no deadline
+        max_seconds (float): Run-time limit, None for no limit
+
+    Returns:
+        float: The tighter of the two in seconds, None if neither is set
+    """
+    limits = [limit for limit in (max_seconds, deadline - time.time() if deadline is not None else None) if limit is not None]
+    return min(limits) if limits else None
+
+def priority_scores(df, now=None, config=SCHEDULE_CONFIG):
+    """
+    Score how valuable it is to reach each lead now, from 0 to 100.
+
+    Outreach is worth most right after a raise, so the score combines how recent the
+    raise is (halving every recency_half_life_days), the funding stage weight used by
+    the ICP score, and the ICP fit.
+
+    Args:
+        df (pd.DataFrame): A lead DataFrame scored by score_leads
+        now (pd.Timestamp): The date recency is measured from, defaults to today
+        config (dict): Half-life, unknown-date recency and component weights
+
+    Returns:
+        pd.Series: The priority of each row
+    """
+    now = pd.Timestamp(now) if now is not None else pd.Timestamp.now()
+    weights = config["weights"]
+
+    if "Funding Date" in df.columns:
+        dates = df["Funding Date"]
+        funded = dates if pd.api.types.is_datetime64_any_dtype(dates) else parse_month_year(dates)
+        age_days = ((now - funded).dt.days).clip(lower=0)
+        recency = (0.5 ** (age_days / config["recency_half_life_days"])).fillna(config["unknown_date_recency"])
+    else:
+        recency = pd.Series(config["unknown_date_recency"], index=df.index)
+
+    if "Funding Type" in df.columns:
+        funding_type = df["Funding Type"].astype("object").map(FUNDING_TYPE_WEIGHTS).fillna(0.3).astype(float)
+    else:
+        funding_type = pd.Series(0.3, index=df.index)
+
+    fit = df["ICP Score"].astype(float) / 100
+
+    priority = 100 * (weights["recency"] * recency + weights["funding_type"] * funding_type + weights["fit"] * fit)
+    return priority.round(1)
+
+def schedule_leads(df, max_rows=None, config=SCHEDULE_CONFIG):
+    """
+    Put leads in dispatch order, highest priority first, and cut them to a row budget.
+
+    Research and copy calls are started in frame order, so the most valuable leads are
+    in flight first and a run stopped by its deadline or budget has done the best work.
+
+    Args:
+        df (pd.DataFrame): The leads to process
+        max_rows (int): Keep at most this many of the highest-priority leads, None for all
+        config (dict): Passed to priority_scores
+
+    Returns:
+        tuple: (scheduled DataFrame with a "Priority" column, DataFrame of leads cut by max_rows)
+    """
+    if "ICP Score" not in df.columns:
+        df = score_leads(df)
+    df = df.copy()
+    df["Priority"] = priority_scores(df, config=config)
+
+    # Stable sort keeps the ICP order for equal priorities
+    ordered = df.sort_values("Priority", ascending=False, kind="stable")
+    scheduled, deferred = (ordered.iloc[:max_rows], ordered.iloc[max_rows:]) if max_rows is not None else (ordered, ordered.iloc[:0])
+
+    if len(scheduled):
+        print(f"Scheduled {len(scheduled)}/{len(df)} leads by priority (highest {scheduled['Priority'].iloc[0]:.1f}, lowest {scheduled['Priority'].iloc[-1]:.1f})")
+    else:
+        print(f"Scheduled 0/{len(df)} leads")
+    return scheduled, deferred
+
+def report_deferred(scheduled_df, cut_df, columns, output_file=None):
+    """
+    Report the leads a run did not get to, highest priority first.
+
+    Leads are deferred by the row budget, because their call failed, or because they
+    were left unfinished, usually because the deadline or spend limit stopped the run
+    before their call started. Leads the cascade's triage rejected and leads without a
+    URL are never processed, so they are not reported.
+
+    Args:
+        scheduled_df (pd.DataFrame): The scheduled leads after processing
+        cut_df (pd.DataFrame): The leads left out by the row budget
+        columns (list): The output columns of the stage; rows without a result are deferred
+        output_file (str): If given, the report is also written to deferred_path_for(output_file)
+
+    Returns:
+        pd.DataFrame: The deferred leads with a "Deferred By" column
+    """
+    def endpoints(df):
+        values = df[columns[0]] if columns[0] in df.columns else pd.Series(pd.NA, index=df.index)
+        return values.astype("string").fillna("")
+
+    def processable(df):
+        urls = df["URL"] if "URL" in df.columns else pd.Series(pd.NA, index=df.index)
+        has_url = urls.notna() & (urls.astype(str).str.strip() != "")
+        return has_url & ~endpoints(df).str.endswith(TRIAGE_SUFFIX)
+
+    pending = scheduled_df[~completed_mask(scheduled_df, columns) & processable(scheduled_df)]
+    reasons = endpoints(pending).str.endswith(FAILED_SUFFIX).map({True: "failed", False: "unfinished"})
+    unfinished = pending.assign(**{"Deferred By": reasons.astype(object)})
+    deferred = pd.concat([unfinished, cut_df[processable(cut_df)].assign(**{"Deferred By": "row budget"})])
+    deferred = deferred.sort_values("Priority", ascending=False, kind="stable")
+
+    if deferred.empty:
+        print("No leads deferred")
+        return deferred
+
+    counts = deferred["Deferred By"].value_counts()
+    print(f"Deferred {len(deferred)} leads ({', '.join(f'{count} {reason}' for reason, count in counts.items())}); highest priority deferred:")
+    for _, row in deferred.head(5).iterrows():
+        print(f"  {row['Priority']:5.1f}  {row.get('Name', '')}  {row.get('URL', '')}")
+
+    if output_file:
+        fields = [field for field in DEFERRED_FIELDS if field in deferred.columns] + ["Deferred By"]
+        deferred[fields].to_csv(deferred_path_for(output_file), index=False)
+        print(f"Deferred leads saved to {deferred_path_for(output_file)}")
+    return deferred
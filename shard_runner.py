@@ -0,0 +1,240 @@
+import argparse
+import asyncio
+import json
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from company_index import add_company_keys
+from result_store import load_leads
+
+# Column that records each lead's position in the original input
+ROW_COLUMN = "Input Row"
+
+# Default merged output per stage, matching the single-process scripts
+STAGE_OUTPUTS = {
+    "research": "Growth_List_Research.csv",
+    "copy": "Growth_List_copy.csv"
+}
+
+def shard_of(key, shard_count) -> int:
+    """
+    Map a company key to a shard, stably across runs and machines.
+
+    Args:
+        key (str): The company key
+        shard_count (int): Number of shards
+
+    Returns:
+        int: The shard number
+    """
+    return zlib.crc32(key.encode("utf-8")) % shard_count
+
+def shard_paths(shard_dir, shard_count):
+    """
+    Return the (input, output) CSV paths of every shard.
+
+    Args:
+        shard_dir (str): Directory holding the shard files
+        shard_count (int): Number of shards
+
+    Returns:
+        list: One (input path, output path) tuple per shard
+    """
+    return [
+        (os.path.join(shard_dir, f"shard_{shard}.csv"), os.path.join(shard_dir, f"shard_{shard}_output.csv"))
+        for shard in range(shard_count)
+    ]
+
+def partition_leads(input_file, shard_count, shard_dir):
+    """
+    Split a lead file into shards by company key, so every row of a company lands in the same shard.
+
+    Rows without a company key are spread by their row number. Each shard keeps the
+    original row number in ROW_COLUMN for the merge. CSV values are copied as the raw
+    strings from the file.
+
+    Args:
+        input_file (str): Path to the lead CSV or result store
+        shard_count (int): Number of shards
+        shard_dir (str): Directory to write the shard files to
+
+    Returns:
+        list: The shard input paths
+    """
+    os.makedirs(shard_dir, exist_ok=True)
+    df = load_leads(input_file, raw=True)
+    input_columns = list(df.columns)
+    df.insert(0, ROW_COLUMN, range(len(df)))
+
+    keys = add_company_keys(df.copy())["Company Key"]
+    shards = [
+        shard_of(key, shard_count) if key else row_number % shard_count
+        for key, row_number in zip(keys, df[ROW_COLUMN])
+    ]
+
+    paths = []
+    for shard, (shard_input, _) in enumerate(shard_paths(shard_dir, shard_count)):
+        shard_df = df[[assigned == shard for assigned in shards]]
+        shard_df.to_csv(shard_input, index=False)
+        paths.append(shard_input)
+        print(f"Shard {shard}: {len(shard_df)} rows")
+
+    with open(os.path.join(shard_dir, "manifest.json"), "w", encoding="utf-8") as manifest:
+        json.dump({"input_file": input_file, "shard_count": shard_count, "input_columns": input_columns}, manifest)
+    return paths
+
+def run_shard(stage, shard_input, shard_output, api_key=None, resume=False, max_concurrency=10,
+              cache_file="research_cache.sqlite3", index_file="company_index.sqlite3"):
+    """
+    Run one stage over one shard; called in its own worker process.
+
+    Args:
+        stage (str): "research" or "copy"
+        shard_input (str): The shard's input CSV
+        shard_output (str): Where to write the shard's results
+        api_key (str): OpenAI API key for this shard, defaults to OPENAI_API_KEY
+        resume (bool): Replay the shard's checkpoint journal and skip finished rows
+        max_concurrency (int): Research calls in flight at once
+        cache_file (str): Shared response cache
+        index_file (str): Shared company index
+
+    Returns:
+        str: The shard output path
+    """
+    if api_key:
+        os.environ["OPENAI_API_KEY"] = api_key
+
+    from checkpoint import CheckpointJournal, journal_path_for
+    from company_index import COPY_COLUMNS, COPY_WRITTEN_AT_COLUMN, RESEARCH_COLUMNS, CompanyIndex, run_deduplicated
+    from research_cache import ResearchCache
+
+    cache = ResearchCache(cache_file)
+    company_index = CompanyIndex(index_file)
+    journal = CheckpointJournal(journal_path_for(shard_output), resume=resume)
+
+    # Shard values stay the raw strings from the input, so the merged output matches it
+    df = load_leads(shard_input, raw=True)
+    if stage == "research":
+        from target_brief import research_companies_async, setup_async_openai_api
+        df[RESEARCH_COLUMNS] = ""
+        if resume:
+            df = journal.apply(df)
+        client = setup_async_openai_api()
+        df = run_deduplicated(df, "research", RESEARCH_COLUMNS, lambda work_df: asyncio.run(research_companies_async(work_df, "target_brief_prompt.txt", client, max_concurrency=max_concurrency, cache=cache, journal=journal)), index=company_index)
+    else:
+        from copywrite import default_prompt_registry, openai_call, setup_openai_api
+        df[COPY_COLUMNS] = ""
+        if resume:
+            df = journal.apply(df)
+        client = setup_openai_api()
+        prompt = default_prompt_registry.get("CombinedPrompt.txt").text
+        df = run_deduplicated(df, "copy", COPY_COLUMNS, lambda work_df: openai_call(work_df, prompt, client, cache=cache, journal=journal), index=company_index, timestamp_column=COPY_WRITTEN_AT_COLUMN)
+
+    company_index.close()
+    journal.close()
+    cache.close()
+
+    df.to_csv(shard_output, index=False)
+    print(f"Shard output saved to {shard_output}")
+    return shard_output
+
+def run_shards(stage, shard_dir, shards, api_keys=None, processes=None, resume=False, max_concurrency=10):
+    """
+    Run a stage over the given shards in parallel worker processes.
+
+    Args:
+        stage (str): "research" or "copy"
+        shard_dir (str): Directory written by partition_leads
+        shards (list): Shard numbers to run
+        api_keys (list): API keys assigned round-robin to shards, defaults to OPENAI_API_KEY for all
+        processes (int): Worker processes, defaults to one per shard
+        resume (bool): Replay each shard's checkpoint journal and skip finished rows
+        max_concurrency (int): Research calls in flight per shard
+
+    Returns:
+        list: Shard numbers that failed
+    """
+    with open(os.path.join(shard_dir, "manifest.json"), encoding="utf-8") as manifest:
+        shard_count = json.load(manifest)["shard_count"]
+    paths = shard_paths(shard_dir, shard_count)
+
+    failed = []
+    with ProcessPoolExecutor(max_workers=processes or len(shards)) as executor:
+        futures = {}
+        for shard in shards:
+            shard_input, shard_output = paths[shard]
+            api_key = api_keys[shard % len(api_keys)] if api_keys else None
+            futures[shard] = executor.submit(run_shard, stage, shard_input, shard_output, api_key=api_key, resume=resume, max_concurrency=max_concurrency)
+
+        for shard, future in futures.items():
+            try:
+                future.result()
+                print(f"Shard {shard} finished")
+            except Exception as e:
+                print(f"\nShard {shard} failed: {str(e)}")
+                failed.append(shard)
+
+    return failed
+
+def merge_shards(shard_dir, output_file):
+    """
+    Merge every shard's output into one CSV in the original row order.
+
+    Args:
+        shard_dir (str): Directory written by partition_leads
+        output_file (str): Where to write the merged CSV
+
+    Returns:
+        pd.DataFrame: The merged DataFrame
+    """
+    with open(os.path.join(shard_dir, "manifest.json"), encoding="utf-8") as manifest:
+        manifest = json.load(manifest)
+
+    missing = [shard for shard, (_, shard_output) in enumerate(shard_paths(shard_dir, manifest["shard_count"])) if not os.path.exists(shard_output)]
+    if missing:
+        raise FileNotFoundError(f"Shards {missing} have no output yet; re-run them with --only before merging")
+
+    parts = [pd.read_csv(shard_output, dtype=str, keep_default_na=False) for _, shard_output in shard_paths(shard_dir, manifest["shard_count"])]
+    merged = pd.concat(parts).sort_values(ROW_COLUMN, kind="stable", key=lambda rows: rows.astype(int)).reset_index(drop=True)
+
+    # Input columns first in their original order, then the stage's new columns
+    input_columns = manifest["input_columns"]
+    added_columns = [column for column in merged.columns if column not in input_columns and column not in (ROW_COLUMN, "Company Key")]
+    merged = merged[input_columns + added_columns]
+
+    merged.to_csv(output_file, index=False)
+    print(f"Merged {len(parts)} shards ({len(merged)} rows) into {output_file}")
+    return merged
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run research or copy over a lead CSV in parallel shards and merge the results.")
+    parser.add_argument("stage", choices=sorted(STAGE_OUTPUTS), help="The stage to run")
+    parser.add_argument("--input", default="Test3 Growth List Startup Plan_usa_leads - Growth List Startup Plan_usa_leads.csv", help="Lead CSV or .store result store to shard")
+    parser.add_argument("--output", help="Merged output (default: the stage's usual output file)")
+    parser.add_argument("--shards", type=int, default=4, help="Number of shards")
+    parser.add_argument("--shard-dir", default="shards", help="Directory for shard inputs and outputs")
+    parser.add_argument("--only", type=int, action="append", help="Re-run only this shard (repeatable); the existing partition is reused")
+    parser.add_argument("--processes", type=int, help="Worker processes (default: one per shard)")
+    parser.add_argument("--max-concurrency", type=int, default=10, help="Research calls in flight per shard")
+    parser.add_argument("--resume", action="store_true", help="Replay each shard's checkpoint journal and skip finished rows")
+    args = parser.parse_args()
+
+    # Comma-separated keys spread across shards so each uses its own quota
+    api_keys = [key.strip() for key in os.getenv("OPENAI_API_KEYS", "").split(",") if key.strip()]
+
+    if args.only:
+        shards = args.only
+    else:
+        partition_leads(args.input, args.shards, args.shard_dir)
+        shards = list(range(args.shards))
+
+    failed = run_shards(args.stage, args.shard_dir, shards, api_keys=api_keys, processes=args.processes, resume=args.resume, max_concurrency=args.max_concurrency)
+    if failed:
+        only_flags = " ".join(f"--only {shard}" for shard in failed)
+        print(f"Shards {failed} failed. Re-run them with: python shard_runner.py {args.stage} --shard-dir {args.shard_dir} {only_flags} --resume")
+        raise SystemExit(1)
+
+    merge_shards(args.shard_dir, args.output or STAGE_OUTPUTS[args.stage])
@@ -1,10 +1,22 @@
 import pandas as pd
+import numpy as np
 import os
-import time
+import argparse
 from typing import Dict, List
 from openai import OpenAI
 from dotenv import load_dotenv
 import re
+from rate_limiter import estimate_tokens, create_response_with_retry
+from research_cache import ResearchCache, make_cache_key
+from cascade import CASCADE_CONFIG, run_cascade
+from checkpoint import CheckpointJournal, journal_path_for
+from company_index import CompanyIndex, COPY_COLUMNS, COPY_WRITTEN_AT_COLUMN, run_deduplicated
+from prompt_registry import default_prompt_registry, build_prompt_input, input_text, usage_summary
+from incremental import response_time
+from result_store import is_store, load_leads, save_results, typed_frame
+
+# Expected size of a generated email, reserved against the tokens-per-minute limit
+COPY_OUTPUT_TOKENS = 1500
 
 def process_growth_list_csv(input_file_path):
     """
@@ -71,40 +83,61 @@ def setup_openai_api():
     if not api_key:
         raise ValueError("OpenAI API key not found. Please check your .env file.")
     
-    # Initialize the OpenAI client
-    client = OpenAI(api_key=api_key)
+    # Initialize the OpenAI client (retries are handled by the rate limiter)
+    client = OpenAI(api_key=api_key, max_retries=0)
     print("OpenAI API configured successfully")
     return client
 
-def execute_api_call(client, prompt_content, target_url):
+def execute_api_call(client, prompt_content, target_url, rate_limiter=None, cache=None, model="gpt-4o", search_context_size="high"):
     """
-    Execute an API call to OpenAI with web search enabled using high context.
+    Execute an API call to OpenAI with web search enabled, using high context by default.
     
     Args:
         client: The OpenAI client
         prompt_content (str): The content to use as a prompt
         target_url (str): The URL to search
+        rate_limiter (RateLimiter): Limiter to pace the call, defaults to the shared limiter
+        cache (ResearchCache): Optional response cache consulted before calling the API
+        model (str): The OpenAI model to use
+        search_context_size (str): Web search context size ("low", "medium" or "high"), the API default if None
         
     Returns:
         The response from the OpenAI API
     """
     print(f"\nMaking OpenAI API call for target URL: {target_url}")
     
+    # Static prompt first and the target last, so the prompt prefix is cached by the provider
+    copy_input = build_prompt_input(prompt_content, f"Target:\n{target_url}")
+    copy_tools = [
+        {
+            "type": "web_search_preview"
+        }
+    ]
+    if search_context_size:
+        copy_tools[0]["search_context_size"] = search_context_size
+    
+    # Reuse an earlier response for the identical request if one is cached
+    cache_key = make_cache_key(model, copy_tools, prompt_content, target_url)
+    if cache is not None:
+        cached_response = cache.get(cache_key)
+        if cached_response is not None:
+            return cached_response
+    
     try:
         # Using the responses.create method with web search as shown in the documentation
-        # and setting search_context_size to "high" for better search results
-        response = client.responses.create(
-            model="gpt-4o",
-            tools=[
-                {
-                    "type": "web_search_preview",
-                    "search_context_size": "high"  # Use high context for better results
-                }
-            ],
-            input=f"{prompt_content}\nTarget:\n{target_url}"
+        response = create_response_with_retry(
+            client,
+            limiter=rate_limiter,
+            estimated_tokens=estimate_tokens(input_text(copy_input)) + COPY_OUTPUT_TOKENS,
+            model=model,
+            tools=copy_tools,
+            input=copy_input,
+            prompt_cache_key="copywrite"
         )
         
-        print("OpenAI API call completed successfully")
+        print(f"OpenAI API call completed successfully ({usage_summary(response)['cached_tokens']} cached input tokens)")
+        if cache is not None:
+            cache.put(cache_key, response)
         return response
     except Exception as e:
         print(f"Error making OpenAI API call: {str(e)}")
@@ -151,7 +184,7 @@ def parse_response(response):
         "body": body
     }
 
-def openai_call(df: pd.DataFrame, prompt, client):
+def openai_call(df: pd.DataFrame, prompt, client, cache=None, journal=None, model="gpt-4o", search_context_size="high"):
     """
     Process each row in the DataFrame, call OpenAI API, and update the DataFrame with results.
     
@@ -159,6 +192,10 @@ def openai_call(df: pd.DataFrame, prompt, client):
         df (pd.DataFrame): The DataFrame to process
         prompt (str): The prompt template to use
         client: The OpenAI client
+        cache (ResearchCache): Optional response cache shared by every row
+        journal (CheckpointJournal): Optional journal recording each finished row; rows it already holds are skipped
+        model (str): The OpenAI model to use
+        search_context_size (str): Web search context size, the API default if None
         
     Returns:
         pd.DataFrame: The updated DataFrame
@@ -175,6 +212,11 @@ def openai_call(df: pd.DataFrame, prompt, client):
             print(f"Skipping row {index+1} due to missing URL")
             continue
         
+        # Skip rows already finished in an earlier run
+        if journal is not None and index in journal.completed:
+            print(f"Skipping row {index+1}, copy already generated")
+            continue
+        
         # Create target dictionary
         target_dict = {
             "target_url": row["URL"] if pd.notna(row["URL"]) else "",
@@ -187,7 +229,7 @@ def openai_call(df: pd.DataFrame, prompt, client):
         
         try:
             # Call OpenAI API with prompt, target URL
-            response = execute_api_call(client, prompt, target_dict["target_url"])
+            response = execute_api_call(client, prompt, target_dict["target_url"], cache=cache, model=model, search_context_size=search_context_size)
             
             # Parse the response to extract subjects and body
             parsed_data = parse_response(response)
@@ -200,7 +242,7 @@ def openai_call(df: pd.DataFrame, prompt, client):
             body_text = parsed_data["body"].replace("[Target]", ceo_first_name)
             
             # Update the DataFrame with the results
-            df.at[index, "AI Copy Generation Endpoint"] = "gpt-4o"
+            df.at[index, "AI Copy Generation Endpoint"] = model
             
             # Add subjects to the DataFrame
             for i, subject in enumerate(parsed_data["subjects"]):
@@ -211,13 +253,16 @@ def openai_call(df: pd.DataFrame, prompt, client):
             df.at[index, "Body"] = body_text
             print(f"Body preview: {body_text[:100]}...")
             
-            # Save intermediate results after each successful row
-            df.to_csv(f"interim_results_{index+1}.csv", index=False)
-            print(f"Saved interim results to interim_results_{index+1}.csv")
+            # Record when the copy was written, so consolidate keeps the newest copy
+            written_at = response_time(response)
+            df.at[index, COPY_WRITTEN_AT_COLUMN] = written_at
             
-            # Small delay to avoid rate limiting
-            print(f"Waiting for 3 seconds before next API call...")
-            time.sleep(3)
+            # Checkpoint this row's results
+            if journal is not None:
+                fields = {"AI Copy Generation Endpoint": model, "Body": body_text, COPY_WRITTEN_AT_COLUMN: written_at}
+                for i, subject in enumerate(parsed_data["subjects"]):
+                    fields[f"Subject {i+1}"] = subject
+                journal.record(index, target_dict["target_url"], fields)
             
         except Exception as e:
             print(f"\nError processing row {index}: {str(e)}")
@@ -226,11 +271,316 @@ def openai_call(df: pd.DataFrame, prompt, client):
     print("\nAll rows processed successfully")
     return df
 
+# Columns holding dollar amounts or counts written with thousands separators
+MONEY_COLUMNS = [
+    "Funding Amount (in USD)",
+    "IT Spend (in USD)",
+    "Software Spend (in USD)",
+    "Communications Spend (in USD)",
+    "Services Spend (in USD)",
+    "Other Hardware Spend (in USD)",
+    "Other IT Spend (in USD)",
+    "Monthly Website Visits"
+]
+
+# Columns holding percentages such as "-74.12%"
+PERCENT_COLUMNS = ["Monthly Website Visits Growth"]
+
+# Low-cardinality text columns stored as categoricals
+CATEGORY_COLUMNS = ["Industry", "Country", "City", "Funding Type", "B2B or B2C", "Email Status", "CEO Email Status"]
+
+# Values the export uses for "no data"
+MISSING_VALUES = ["", "unknown", "Unknown", "n/a", "N/A", "-"]
+
+# Ready-made segments matching the hand-made lead files
+SEGMENTS = {
+    "usa_leads": {
+        "filters": [("Country", "in", ["United States"])]
+    },
+    "everyone_minus_Ind&china": {
+        "filters": [("Country", "not in", ["United States", "India", "China"])]
+    },
+    "funded_1m_plus": {
+        "filters": [("Funding Amount (in USD)", ">=", 1_000_000)],
+        "sort_by": [("Funding Amount (in USD)", False)]
+    }
+}
+
+def _map_unique(series, parse, dtype):
+    """
+    Apply a vectorized parser to the distinct values of a column only.
+    
+    Exports repeat the same strings many times ("unknown", "11-50", "March 2025"),
+    so parsing the uniques and broadcasting back with the factorize codes avoids
+    repeating the string work on every row.
+    
+    Args:
+        series (pd.Series): The raw column
+        parse (callable): Takes a Series of distinct values and returns parsed values
+        dtype (str): The dtype of the result
+        
+    Returns:
+        pd.Series: Parsed values aligned with series
+    """
+    codes, uniques = pd.factorize(series)
+    parsed = pd.Series(parse(pd.Series(uniques, dtype="string")), dtype=dtype).to_numpy()
+    # Append a missing value for code -1 (NaN in the input)
+    parsed = np.append(parsed, pd.Series([None], dtype=dtype).to_numpy())
+    return pd.Series(parsed[codes], index=series.index, dtype=dtype)
+
+def parse_numeric(series):
+    """
+    Parse money and count strings such as "$10,500,000" or "94,249" into floats.
+    
+    Args:
+        series (pd.Series): The raw column
+        
+    Returns:
+        pd.Series: float64 values, NaN where the value is missing or "unknown"
+    """
+    # Anything that is not part of a number ("$", ",", "%", "unknown") is dropped in one pass
+    def parse(values):
+        return pd.to_numeric(values.str.replace(r"[^\d.\-]", "", regex=True), errors="coerce")
+    return _map_unique(series, parse, "float64")
+
+def parse_percent(series):
+    """
+    Parse percentage strings such as "-74.12%" into fractions.
+    
+    Args:
+        series (pd.Series): The raw column
+        
+    Returns:
+        pd.Series: float64 values (-0.7412), NaN where missing
+    """
+    return parse_numeric(series) / 100.0
+
+def parse_employee_band(series):
+    """
+    Parse employee bands such as "11-50", "1-10" or "10001+" into lower and upper bounds.
+    
+    Args:
+        series (pd.Series): The raw "Number of Employees" column
+        
+    Returns:
+        pd.DataFrame: "Employees Min" and "Employees Max" as float64 (Max is NaN for open bands)
+    """
+    def parse_bound(values, which):
+        bands = values.str.replace(",", "", regex=False).str.extract(r"^\s*(\d+)\s*(?:-\s*(\d+)|(\+))?\s*$")
+        low = pd.to_numeric(bands[0], errors="coerce").astype("float64")
+        high = pd.to_numeric(bands[1], errors="coerce").astype("float64")
+        # A single number is both bounds; "N+" has no upper bound
+        high = high.where(bands[1].notna() | bands[2].notna(), low)
+        # Some bands are written backwards ("3-2")
+        return np.fmin(low, high) if which == "min" else np.fmax(low, high).where(high.notna())
+    
+    return pd.DataFrame({
+        "Employees Min": _map_unique(series, lambda values: parse_bound(values, "min"), "float64"),
+        "Employees Max": _map_unique(series, lambda values: parse_bound(values, "max"), "float64")
+    }, index=series.index)
+
+def parse_month_year(series):
+    """
+    Parse dates such as "March 2025" into timestamps at the start of the month.
+    
+    Args:
+        series (pd.Series): The raw column
+        
+    Returns:
+        pd.Series: datetime64 values, NaT where missing or unparseable
+    """
+    def parse(values):
+        cleaned = values.str.strip()
+        parsed = pd.to_datetime(cleaned, format="%B %Y", errors="coerce")
+        # Fall back to free-form parsing for anything else ("2025-03-14", "Mar 2025")
+        fallback = parsed.isna() & cleaned.notna() & ~cleaned.isin(MISSING_VALUES)
+        if fallback.any():
+            parsed[fallback] = pd.to_datetime(cleaned[fallback], errors="coerce", format="mixed")
+        return parsed
+    return _map_unique(series, parse, "datetime64[ns]")
+
+def parse_lead_columns(df):
+    """
+    Build a typed copy of a lead export for filtering and sorting.
+    
+    Money, spend and visit columns become float64, percentages become fractions,
+    "Funding Date" becomes datetime64, "Founding Year" becomes nullable Int64,
+    low-cardinality text becomes categorical and "Number of Employees" gains
+    "Employees Min"/"Employees Max". Columns keep their original names, so filters
+    can refer to the headers as they appear in the CSV.
+    
+    Args:
+        df (pd.DataFrame): The raw lead DataFrame
+        
+    Returns:
+        pd.DataFrame: The typed DataFrame, with the same index as df
+    """
+    typed = df.copy()
+    
+    for column in MONEY_COLUMNS:
+        if column in typed.columns:
+            typed[column] = parse_numeric(typed[column])
+    
+    for column in PERCENT_COLUMNS:
+        if column in typed.columns:
+            typed[column] = parse_percent(typed[column])
+    
+    if "Funding Date" in typed.columns:
+        typed["Funding Date"] = parse_month_year(typed["Funding Date"])
+    
+    if "Founding Year" in typed.columns:
+        typed["Founding Year"] = parse_numeric(typed["Founding Year"]).round().astype("Int64")
+    
+    for column in ["Number of Lead Investors", "Number of Investors"]:
+        if column in typed.columns:
+            typed[column] = parse_numeric(typed[column]).round().astype("Int64")
+    
+    if "Number of Employees" in typed.columns:
+        bands = parse_employee_band(typed["Number of Employees"])
+        typed["Employees Min"] = bands["Employees Min"]
+        typed["Employees Max"] = bands["Employees Max"]
+    
+    for column in CATEGORY_COLUMNS:
+        if column in typed.columns:
+            typed[column] = typed[column].astype("category")
+    
+    return typed
+
+def build_filter_mask(typed, filters):
+    """
+    Combine declarative filter expressions into one boolean mask.
+    
+    Each filter is a (column, operator, value) tuple and all filters must hold.
+    Supported operators: "==", "!=", ">", ">=", "<", "<=", "in", "not in",
+    "contains" (case-insensitive substring), "has" (any of the comma-separated
+    entries, e.g. Industry "Aerospace, Manufacturing", is in value),
+    "isna" and "notna" (value ignored).
+    
+    Args:
+        typed (pd.DataFrame): The output of parse_lead_columns
+        filters (list): The filter expressions
+        
+    Returns:
+        pd.Series: True for rows that pass every filter
+    """
+    mask = pd.Series(True, index=typed.index)
+    
+    for column, operator, value in filters:
+        if column not in typed.columns:
+            raise ValueError(f"Unknown filter column: {column}")
+        values = typed[column]
+        
+        if operator == "==":
+            condition = values == value
+        elif operator == "!=":
+            condition = values != value
+        elif operator == ">":
+            condition = values > value
+        elif operator == ">=":
+            condition = values >= value
+        elif operator == "<":
+            condition = values < value
+        elif operator == "<=":
+            condition = values <= value
+        elif operator == "in":
+            condition = values.isin(list(value))
+        elif operator == "not in":
+            condition = ~values.isin(list(value))
+        elif operator == "contains":
+            condition = values.astype("string").str.contains(str(value), case=False, regex=False)
+        elif operator == "has":
+            wanted = {str(item).strip().lower() for item in value}
+            entries = values.astype("string").str.lower().str.split(r"\s*,\s*", regex=True).explode()
+            condition = entries.isin(wanted).groupby(level=0).any()
+        elif operator == "isna":
+            condition = values.isna()
+        elif operator == "notna":
+            condition = values.notna()
+        else:
+            raise ValueError(f"Unknown filter operator: {operator}")
+        
+        # Missing values never match a comparison
+        mask &= condition.fillna(False).astype(bool)
+    
+    return mask
+
+def segment_leads(df, filters=None, sort_by=None, typed=None):
+    """
+    Slice a lead export with vectorized filters and sort the result.
+    
+    The returned rows are the original, unparsed rows, so a segment written back
+    to CSV keeps the export's formatting.
+    
+    Args:
+        df (pd.DataFrame): The raw lead DataFrame
+        filters (list): (column, operator, value) filter expressions, see build_filter_mask
+        sort_by (list): (column, ascending) pairs applied to the typed values, missing values last
+        typed (pd.DataFrame): The output of parse_lead_columns, parsed here if omitted
+        
+    Returns:
+        pd.DataFrame: The matching rows of df
+    """
+    if typed is None:
+        typed = parse_lead_columns(df)
+    
+    mask = build_filter_mask(typed, filters or [])
+    selected = typed.loc[mask]
+    
+    if sort_by:
+        columns = [column for column, _ in sort_by]
+        ascending = [ascending for _, ascending in sort_by]
+        selected = selected.sort_values(columns, ascending=ascending, na_position="last", kind="stable")
+    
+    print(f"Segment selected {len(selected)}/{len(df)} leads")
+    return df.loc[selected.index]
+
+def write_segment(input_file, output_file, segment_name):
+    """
+    Write one of the SEGMENTS from a lead export to a new CSV file or result store.
+    
+    Args:
+        input_file (str): Path to the lead export, a CSV or a result store
+        output_file (str): Path to write the segment to, a CSV or a ".store" directory
+        segment_name (str): A key of SEGMENTS
+        
+    Returns:
+        pd.DataFrame: The segment
+    """
+    if segment_name not in SEGMENTS:
+        raise ValueError(f"Unknown segment {segment_name}. Choose from: {', '.join(SEGMENTS)}")
+    
+    segment = SEGMENTS[segment_name]
+    df = load_leads(input_file)
+    # A store is already typed, so only the derived columns need building
+    typed = typed_frame(df) if is_store(input_file) else None
+    result = segment_leads(df, segment.get("filters"), segment.get("sort_by"), typed=typed)
+    save_results(result, output_file)
+    print(f"Saved segment {segment_name} to {output_file}")
+    return result
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate outreach email copy for each lead with OpenAI.")
+    parser.add_argument("--resume", action="store_true", help="Replay the checkpoint journal and skip rows finished in an earlier run")
+    parser.add_argument("--cascade", action="store_true", help="Triage leads with a small model first and only write copy for those above the threshold")
+    parser.add_argument("--segment", choices=sorted(SEGMENTS), help="Write this lead segment and exit without calling the API")
+    parser.add_argument("--segment-input", default="Growth List Startup Plan.csv", help="Lead export to segment")
+    parser.add_argument("--segment-output", help="Where to write the segment (default: '<input>_<segment>.csv')")
+    args = parser.parse_args()
+    
+    if args.segment:
+        segment_output = args.segment_output or f"{os.path.splitext(args.segment_input)[0]}_{args.segment}.csv"
+        write_segment(args.segment_input, segment_output, args.segment)
+        raise SystemExit(0)
+    
     # File paths
     input_file = "Test3 Growth List Startup Plan_usa_leads - Growth List Startup Plan_usa_leads.csv"
     output_file = "Growth_List_copy.csv"
     prompt_file = "CombinedPrompt.txt"  # File containing the prompt template
+    cache_file = "research_cache.sqlite3"  # Responses reused across runs on overlapping lead files
+    index_file = "company_index.sqlite3"  # Results shared by every row of the same company across lead files
+    copy_model = "gpt-4o"  # Model for the full copy call
+    copy_search_context_size = "high"  # Web search context size for the copy call, None for the API default
+    cascade_config = dict(CASCADE_CONFIG)  # Triage model, threshold and search context size for --cascade
     
     print(f"Starting processing with input file: {input_file}")
     
@@ -238,15 +588,40 @@ if __name__ == "__main__":
     df = process_growth_list_csv(input_file)
     print(f"DataFrame loaded with {len(df)} rows and {len(df.columns)} columns")
     
-    # Load the prompt template
-    prompt = load_text_file(prompt_file)
+    # Load and validate the prompt template once
+    prompt = default_prompt_registry.get(prompt_file).text
     
     # Set up OpenAI API
     openai_client = setup_openai_api()
     print("OpenAI client initialized")
 
-    # Process the DataFrame with OpenAI API calls
-    updated_df = openai_call(df, prompt, openai_client)
+    # Open the response cache
+    response_cache = ResearchCache(cache_file)
+
+    # Open the checkpoint journal, restoring finished rows when resuming
+    journal = CheckpointJournal(journal_path_for(output_file), resume=args.resume)
+    if args.resume:
+        df = journal.apply(df)
+
+    # Open the company index so each company gets copy once across all lead files
+    company_index = CompanyIndex(index_file)
+
+    selected_df = df
+    if args.cascade:
+        # Only leads the triage model rates as a fit get the full copy call
+        selected_df = run_cascade(df, selected_df, "copy", openai_client, config=cascade_config, cache=response_cache, index=company_index)
+
+    # Process the unique companies with OpenAI API calls
+    copied_df = run_deduplicated(selected_df, "copy", COPY_COLUMNS, lambda work_df: openai_call(work_df, prompt, openai_client, cache=response_cache, journal=journal, model=copy_model, search_context_size=copy_search_context_size), index=company_index, timestamp_column=COPY_WRITTEN_AT_COLUMN)
+
+    # Write the results back into the full list, leaving rejected leads without copy
+    updated_df = df
+    result_columns = COPY_COLUMNS + [column for column in [COPY_WRITTEN_AT_COLUMN] if column in copied_df.columns]
+    updated_df.loc[copied_df.index, result_columns] = copied_df[result_columns]
+    company_index.close()
+    journal.close()
+    print(f"Response cache stats: {response_cache.stats()}")
+    response_cache.close()
     
     # Save the updated DataFrame to a CSV file
     updated_df.to_csv(output_file, index=False)
@@ -0,0 +1,411 @@
+import argparse
+import asyncio
+import csv
+import io
+import os
+import sqlite3
+
+import pandas as pd
+
+from company_index import COPY_COLUMNS, RESEARCH_COLUMNS
+from copywrite import parse_response
+from pipeline import async_copy_from_brief
+from prompt_registry import default_prompt_registry
+from research_cache import ResearchCache
+from target_brief import async_target_research_search, extract_text_from_response, setup_async_openai_api
+from telemetry import default_metrics, metrics_path_for
+
+# Column that ties each output line back to its input row
+ROW_COLUMN = "Input Row"
+
+def iter_csv_records(path):
+    """
+    Yield the raw bytes of each CSV record with its byte offset, header first.
+
+    A record ends at a line break outside quotes, so fields holding line breaks (long
+    research briefs and bodies) stay in one record. A torn final record left by a crash
+    is only yielded if its quotes balance, and then fails the field count in RowIndex.
+
+    Args:
+        path (str): Path to the CSV
+
+    Yields:
+        tuple: (byte offset, record bytes including its line terminator)
+    """
+    with open(path, "rb") as file:
+        offset = 0
+        lines = []
+        quotes = 0
+        for line in file:
+            lines.append(line)
+            quotes += line.count(b'"')
+            if quotes % 2 == 0:
+                record = b"".join(lines)
+                yield offset, record
+                offset += len(record)
+                lines = []
+                quotes = 0
+
+def parse_record(record) -> list:
+    """
+    Split one raw CSV record from iter_csv_records into its field values.
+
+    Args:
+        record (bytes): The record bytes
+
+    Returns:
+        list: The field values as strings
+    """
+    return next(csv.reader(io.StringIO(record.decode("utf-8"), newline="")), [])
+
+class RowIndex:
+    """
+    On-disk index from each input row of a streaming CSV to the byte range of its last line.
+
+    Resumed runs append a new line for a row that failed earlier, and the last line for
+    a row is the one that counts. The index is built in one pass over the file and kept
+    in a temporary SQLite database, so neither its size nor the number of passes grows
+    with the number of rows held in memory.
+    """
+
+    def __init__(self, path, result_column=None):
+        """
+        Args:
+            path (str): A CSV with a ROW_COLUMN, such as a streaming output
+            result_column (str): Column whose non-blank value marks a row as finished
+        """
+        self.path = path
+        # An empty name gives a private database that SQLite spills to a temporary file
+        self.connection = sqlite3.connect("")
+        self.connection.execute("CREATE TABLE lines (row INTEGER PRIMARY KEY, offset INTEGER, length INTEGER, finished INTEGER)")
+        self.header = b""
+
+        records = iter_csv_records(path)
+        _, self.header = next(records, (0, b""))
+        columns = parse_record(self.header)
+        row_position = columns.index(ROW_COLUMN)
+        result_position = columns.index(result_column) if result_column in columns else None
+
+        def entries():
+            for offset, record in records:
+                fields = parse_record(record)
+                if len(fields) != len(columns):
+                    continue
+                finished = result_position is not None and bool(fields[result_position].strip())
+                yield int(fields[row_position]), offset, len(record), finished
+
+        # Later lines replace earlier ones for the same row
+        self.connection.executemany("INSERT OR REPLACE INTO lines VALUES (?, ?, ?, ?)", entries())
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM lines").fetchone()[0]
+
+    def finished_count(self) -> int:
+        """
+        Returns:
+            int: The number of rows whose last line has a result
+        """
+        return self.connection.execute("SELECT COUNT(*) FROM lines WHERE finished").fetchone()[0]
+
+    def is_finished(self, row_number) -> bool:
+        """
+        Args:
+            row_number (int): The input row number
+
+        Returns:
+            bool: True if the row's last line has a result
+        """
+        entry = self.connection.execute("SELECT finished FROM lines WHERE row = ?", (int(row_number),)).fetchone()
+        return bool(entry and entry[0])
+
+    def iter_records(self):
+        """
+        Yield the last line of every row, in input row order.
+
+        Yields:
+            tuple: (row number, record bytes ending in a line break)
+        """
+        with open(self.path, "rb") as file:
+            for row_number, offset, length in self.connection.execute("SELECT row, offset, length FROM lines ORDER BY row"):
+                file.seek(offset)
+                record = file.read(length)
+                # The file's final line may lack a line break
+                yield row_number, record if record.endswith(b"\n") else record + b"\r\n"
+
+    def close(self):
+        """
+        Drop the index.
+        """
+        self.connection.close()
+
+def iter_lead_records(input_file, chunksize=1000):
+    """
+    Yield one compact record per lead, reading the CSV a chunk at a time.
+
+    Values are kept as the raw strings from the file, so they are written back
+    unchanged (no "2016.0" for "2016", no "nan" for blanks). A file that already has
+    an "Input Row" column, such as the research stage's output, keeps those numbers,
+    and only the last line for each of them is yielded, in input row order.
+
+    Args:
+        input_file (str): Path to the lead CSV
+        chunksize (int): Rows read from disk at a time
+
+    Yields:
+        tuple: (row number, {column: value})
+    """
+    columns = list(pd.read_csv(input_file, nrows=0).columns)
+    if ROW_COLUMN in columns:
+        index = RowIndex(input_file)
+        columns = parse_record(index.header)
+        try:
+            for row_number, record in index.iter_records():
+                yield row_number, dict(zip(columns, parse_record(record)))
+        finally:
+            index.close()
+        return
+
+    position = 0
+    for chunk in pd.read_csv(input_file, chunksize=chunksize, dtype=str, keep_default_na=False):
+        for values in chunk.itertuples(index=False, name=None):
+            yield position, dict(zip(columns, values))
+            position += 1
+
+def compact_output(output_file):
+    """
+    Rewrite a streaming output with one line per input row, in input order.
+
+    Lines are written as rows finish, and resumed runs append retried rows, so the raw
+    output is out of order and can hold several lines per row. The last line of each row
+    is kept. The file is indexed in one pass and each kept line is then copied byte for
+    byte, so memory stays bounded for any file size; the result replaces the output in
+    one rename.
+
+    Args:
+        output_file (str): Path to the streaming output CSV
+
+    Returns:
+        int: The number of rows in the compacted output
+    """
+    index = RowIndex(output_file)
+    temporary_file = output_file + ".tmp"
+    try:
+        with open(temporary_file, "wb") as output:
+            output.write(index.header)
+            for _, record in index.iter_records():
+                output.write(record)
+        count = len(index)
+    finally:
+        index.close()
+    os.replace(temporary_file, output_file)
+    print(f"Compacted {output_file} to {count} rows in input order")
+    return count
+
+async def stream_stage(input_file, output_file, result_columns, process_record, max_concurrency=10, chunksize=1000, resume=False, flush_every=50):
+    """
+    Run one stage over a lead CSV with memory that does not grow with the file.
+
+    The input is read in chunks, at most max_concurrency records are in flight, and
+    each finished row is written to output_file as soon as it completes, tagged with
+    its input row number. Rows that fail are written with empty results and retried on
+    resume; a later line for the same input row supersedes an earlier one. Once every
+    row has been attempted, the output is compacted to one line per row in input order.
+
+    Args:
+        input_file (str): Path to the lead CSV
+        output_file (str): Path to write results to
+        result_columns (list): Columns the stage fills in
+        process_record (callable): Async function taking a record dict and returning {column: value}
+        max_concurrency (int): Records processed at once
+        chunksize (int): Rows read from disk at a time
+        resume (bool): Append to an existing output and skip rows that already have results
+        flush_every (int): Rows written between flushes of the output file
+
+    Returns:
+        int: The number of rows written
+    """
+    input_columns = list(pd.read_csv(input_file, nrows=0).columns)
+    fieldnames = [ROW_COLUMN] + [column for column in input_columns if column not in result_columns and column != ROW_COLUMN] + result_columns
+
+    append = resume and os.path.exists(output_file)
+    finished = RowIndex(output_file, result_columns[-1]) if append else None
+    if finished is not None:
+        print(f"Resuming: {finished.finished_count()} rows already have results in {output_file}")
+
+    written = 0
+
+    async def run(row_number, record):
+        try:
+            result = await process_record(record)
+        except Exception as e:
+            print(f"\nError processing row {row_number+1}: {str(e)}")
+            result = {}
+        return row_number, record, result
+
+    with open(output_file, "a" if append else "w", newline="", encoding="utf-8") as output:
+        writer = csv.DictWriter(output, fieldnames=fieldnames, extrasaction="ignore")
+        if not append:
+            writer.writeheader()
+
+        def write_finished(tasks):
+            nonlocal written
+            for task in tasks:
+                row_number, record, result = task.result()
+                line = dict(record)
+                # Keeps the research stage's numbering when the copy stage reads its output
+                line[ROW_COLUMN] = row_number
+                for column in result_columns:
+                    line[column] = result.get(column, "")
+                writer.writerow(line)
+                written += 1
+                if written % flush_every == 0:
+                    output.flush()
+                    print(f"Streamed {written} rows to {output_file}")
+
+        in_flight = set()
+        for row_number, record in iter_lead_records(input_file, chunksize=chunksize):
+            if finished is not None and finished.is_finished(row_number):
+                continue
+            in_flight.add(asyncio.ensure_future(run(row_number, record)))
+            if len(in_flight) >= max_concurrency:
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                write_finished(done)
+
+        if in_flight:
+            done, _ = await asyncio.wait(in_flight)
+            write_finished(done)
+
+    if finished is not None:
+        finished.close()
+    print(f"Streamed {written} rows to {output_file}")
+    compact_output(output_file)
+    return written
+
+def research_processor(client, research_prompt_file, research_model="gpt-4o", cache=None):
+    """
+    Build a stream_stage processor that writes a target brief for each record.
+
+    Args:
+        client: The AsyncOpenAI client
+        research_prompt_file (str): Path to the research prompt file
+        research_model (str): The model to use for research
+        cache (ResearchCache): Optional response cache
+
+    Returns:
+        callable: Async function taking a record and returning the research columns
+    """
+    prompt_content = default_prompt_registry.get(research_prompt_file).text
+
+    async def process(record):
+        target_url = record.get("URL", "").strip()
+        if not target_url:
+            return {}
+        response = await async_target_research_search(client, prompt_content, target_url, model=research_model, cache=cache)
+        return {
+            "AI Research Endpoint": research_model,
+            "Research Data": extract_text_from_response(response)
+        }
+
+    return process
+
+def copy_processor(client, copy_prompt_file, copy_model="gpt-4o", cache=None):
+    """
+    Build a stream_stage processor that writes email copy from each record's "Research Data".
+
+    Args:
+        client: The AsyncOpenAI client
+        copy_prompt_file (str): Path to the copy prompt file
+        copy_model (str): The model to use for copy generation
+        cache (ResearchCache): Optional response cache
+
+    Returns:
+        callable: Async function taking a record and returning the copy columns
+    """
+    copy_prompt = default_prompt_registry.get(copy_prompt_file).text
+
+    async def process(record):
+        target_url = record.get("URL", "").strip()
+        research_text = record.get("Research Data", "")
+        if not target_url or not research_text:
+            return {}
+        response = await async_copy_from_brief(client, copy_prompt, research_text, target_url, model=copy_model, cache=cache)
+        parsed_data = parse_response(response)
+
+        ceo_name = record.get("CEO Name", "").strip()
+        ceo_first_name = ceo_name.split()[0] if ceo_name else "[Target]"
+        result = {"AI Copy Generation Endpoint": copy_model, "Body": parsed_data["body"].replace("[Target]", ceo_first_name)}
+        for i, subject in enumerate(parsed_data["subjects"]):
+            result[f"Subject {i+1}"] = subject
+        return result
+
+    return process
+
+def stream_research(input_file, output_file, research_prompt_file, client, research_model="gpt-4o", max_concurrency=10, chunksize=1000, cache=None, resume=False):
+    """
+    Research a lead CSV of any size in constant memory.
+
+    Args:
+        input_file (str): Path to the lead CSV
+        output_file (str): Path to write the researched rows to
+        research_prompt_file (str): Path to the research prompt file
+        client: The AsyncOpenAI client
+        research_model (str): The model to use for research
+        max_concurrency (int): Research calls in flight at once
+        chunksize (int): Rows read from disk at a time
+        cache (ResearchCache): Optional response cache
+        resume (bool): Append to an existing output and skip rows that already have results
+
+    Returns:
+        int: The number of rows written
+    """
+    process = research_processor(client, research_prompt_file, research_model=research_model, cache=cache)
+    return asyncio.run(stream_stage(input_file, output_file, RESEARCH_COLUMNS, process, max_concurrency=max_concurrency, chunksize=chunksize, resume=resume))
+
+def stream_copy(input_file, output_file, copy_prompt_file, client, copy_model="gpt-4o", max_concurrency=10, chunksize=1000, cache=None, resume=False):
+    """
+    Write copy for a researched lead CSV of any size in constant memory.
+
+    Args:
+        input_file (str): Path to a CSV with a "Research Data" column, e.g. from stream_research
+        output_file (str): Path to write the rows with copy to
+        copy_prompt_file (str): Path to the copy prompt file
+        client: The AsyncOpenAI client
+        copy_model (str): The model to use for copy generation
+        max_concurrency (int): Copy calls in flight at once
+        chunksize (int): Rows read from disk at a time
+        cache (ResearchCache): Optional response cache
+        resume (bool): Append to an existing output and skip rows that already have results
+
+    Returns:
+        int: The number of rows written
+    """
+    process = copy_processor(client, copy_prompt_file, copy_model=copy_model, cache=cache)
+    return asyncio.run(stream_stage(input_file, output_file, COPY_COLUMNS, process, max_concurrency=max_concurrency, chunksize=chunksize, resume=resume))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Research or write copy for a lead CSV of any size in constant memory.")
+    parser.add_argument("stage", choices=["research", "copy"], help="research: add target briefs; copy: write emails from the briefs")
+    parser.add_argument("input_file", help="Lead CSV (for copy, the output of the research stage)")
+    parser.add_argument("output_file", help="Where to stream the results")
+    parser.add_argument("--max-concurrency", type=int, default=10, help="API calls in flight at once")
+    parser.add_argument("--chunksize", type=int, default=1000, help="Rows read from disk at a time")
+    parser.add_argument("--resume", action="store_true", help="Append to an existing output and skip rows that already have results")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this port while the run is in progress")
+    args = parser.parse_args()
+
+    if args.metrics_port:
+        default_metrics.serve_prometheus(args.metrics_port)
+
+    openai_client = setup_async_openai_api()
+    response_cache = ResearchCache("research_cache.sqlite3")
+
+    if args.stage == "research":
+        stream_research(args.input_file, args.output_file, "target_brief_prompt.txt", openai_client, max_concurrency=args.max_concurrency, chunksize=args.chunksize, cache=response_cache, resume=args.resume)
+    else:
+        stream_copy(args.input_file, args.output_file, "CombinedPrompt.txt", openai_client, max_concurrency=args.max_concurrency, chunksize=args.chunksize, cache=response_cache, resume=args.resume)
+
+    # Save per-stage latency, token, web search and cost metrics next to the output
+    default_metrics.write_json(metrics_path_for(args.output_file))
+
+    print(f"Response cache stats: {response_cache.stats()}")
+    response_cache.close()
@@ -1,23 +1,40 @@
 import pandas as pd
 import os
-import time
+import asyncio
+import argparse
 from typing import Dict, List
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
 import re
+from rate_limiter import estimate_tokens, create_response_with_retry, async_create_response_with_retry
+from research_cache import DEFAULT_TTL_SECONDS, ResearchCache, make_cache_key
+from checkpoint import CheckpointJournal, journal_path_for
+from company_index import CompanyIndex, RESEARCH_COLUMNS, mark_failed, run_deduplicated
+from icp_score import score_leads, select_leads
+from prompt_registry import default_prompt_registry, build_prompt_input, input_text, usage_summary
+from budget import BUDGET_CONFIG, BudgetExceeded, BudgetGovernor
+from cascade import CASCADE_CONFIG, run_cascade
+from incremental import DEFAULT_FRESHNESS_DAYS, RESEARCHED_AT_COLUMN, carry_forward_research, response_time, stamp_research
+from scheduler import SCHEDULE_CONFIG, parse_deadline, report_deferred, schedule_leads, seconds_until
+from resilience import RESILIENCE_CONFIG, default_request_guard
+from telemetry import default_metrics, metrics_path_for
+from result_store import load_leads, save_results
+
+# Expected size of a target brief, reserved against the tokens-per-minute limit
+RESEARCH_OUTPUT_TOKENS = 2000
 
 def process_growth_list_csv(input_file_path):
     """
     Load a CSV file into a pandas DataFrame and add specified columns.
     
     Args:
-        input_file_path (str): Path to the input CSV file
+        input_file_path (str): Path to the input CSV file or result store
         
     Returns:
         pd.DataFrame: The modified DataFrame
     """
     # Load the CSV file into a DataFrame
-    df = pd.read_csv(input_file_path)
+    df = load_leads(input_file_path)
     
     # Add new columns with empty values
     new_columns = [
@@ -67,12 +84,31 @@ def setup_openai_api():
     if not api_key:
         raise ValueError("OpenAI API key not found. Please check your .env file.")
     
-    # Initialize the OpenAI client
-    client = OpenAI(api_key=api_key)
+    # Initialize the OpenAI client (retries are handled by the rate limiter)
+    client = OpenAI(api_key=api_key, max_retries=0)
     print("OpenAI API configured successfully")
     return client
 
-def target_research_search(client, prompt_file_path, target_url, model="gpt-4o"):
+def setup_async_openai_api():
+    """
+    Set up the async OpenAI API with the API key from environment variables.
+    Returns an initialized AsyncOpenAI client.
+    """
+    # Load environment variables from .env file
+    load_dotenv()
+    
+    # Get the API key from environment variable
+    api_key = os.getenv("OPENAI_API_KEY")
+    
+    if not api_key:
+        raise ValueError("OpenAI API key not found. Please check your .env file.")
+    
+    # Initialize the async OpenAI client (retries are handled by the rate limiter)
+    client = AsyncOpenAI(api_key=api_key, max_retries=0)
+    print("Async OpenAI API configured successfully")
+    return client
+
+def target_research_search(client, prompt_file_path, target_url, model="gpt-4o", rate_limiter=None, cache=None, refresh=False, search_context_size="high"):
     """
     Execute a research API call to OpenAI with web search enabled.
     
@@ -81,37 +117,114 @@ def target_research_search(client, prompt_file_path, target_url, model="gpt-4o")
         prompt_file_path (str): Path to the file containing the research prompt
         target_url (str): The URL to search
         model (str): The OpenAI model to use for research
+        rate_limiter (RateLimiter): Limiter to pace the call, defaults to the shared limiter
+        cache (ResearchCache): Optional response cache consulted before calling the API
+        refresh (bool): Skip the cached response, e.g. when the lead changed, and cache the new one
+        search_context_size (str): Web search context size: "low", "medium" or "high"
         
     Returns:
         The response from the OpenAI API with the researched content
     """
     print(f"\nPerforming research for target URL: {target_url} using model {model}")
     
-    # Load the research prompt from file
-    prompt_content = load_text_file(prompt_file_path)
-    if not prompt_content:
-        print("Failed to load research prompt. Cannot proceed.")
+    # Get the research prompt, loaded from file once per run
+    try:
+        prompt_content = default_prompt_registry.get(prompt_file_path).text
+    except (OSError, ValueError) as e:
+        print(f"Failed to load research prompt: {str(e)}. Cannot proceed.")
         return None
     
+    # Static prompt first and the target last, so the prompt prefix is cached by the provider
+    research_input = build_prompt_input(prompt_content, f"Target:\n{target_url}")
+    research_tools = [
+        {
+            "type": "web_search_preview",
+            "search_context_size": search_context_size
+        }
+    ]
+    
+    # Reuse an earlier response for the identical request if one is cached
+    cache_key = make_cache_key(model, research_tools, prompt_content, target_url)
+    if cache is not None and not refresh:
+        cached_response = cache.get(cache_key)
+        if cached_response is not None:
+            return cached_response
+    
     try:
-        # Using the responses.create method with web search
-        response = client.responses.create(
+        # Using the responses.create method with web search, paced and retried by the rate limiter
+        response = create_response_with_retry(
+            client,
+            limiter=rate_limiter,
+            estimated_tokens=estimate_tokens(input_text(research_input)) + RESEARCH_OUTPUT_TOKENS,
             model=model,
-            tools=[
-                {
-                    "type": "web_search_preview",
-                    "search_context_size": "high"
-                }
-            ],
-            input=f"{prompt_content}\nTarget:\n{target_url}"
+            tools=research_tools,
+            input=research_input,
+            prompt_cache_key="target_brief"
         )
         
-        print("Research API call completed successfully")
+        print(f"Research API call completed successfully ({usage_summary(response)['cached_tokens']} cached input tokens)")
+        if cache is not None:
+            cache.put(cache_key, response)
         return response
     except Exception as e:
         print(f"Error making research API call: {str(e)}")
         raise e
 
+async def async_target_research_search(client, prompt_content, target_url, model="gpt-4o", rate_limiter=None, cache=None, refresh=False, search_context_size="high"):
+    """
+    Execute a research API call to OpenAI with web search enabled, without blocking the event loop.
+    
+    Args:
+        client: The AsyncOpenAI client
+        prompt_content (str): The research prompt, already loaded from file
+        target_url (str): The URL to search
+        model (str): The OpenAI model to use for research
+        rate_limiter (RateLimiter): Limiter to pace the call, defaults to the shared limiter
+        cache (ResearchCache): Optional response cache consulted before calling the API
+        refresh (bool): Skip the cached response, e.g. when the lead changed, and cache the new one
+        search_context_size (str): Web search context size: "low", "medium" or "high"
+        
+    Returns:
+        The response from the OpenAI API with the researched content
+    """
+    print(f"\nPerforming research for target URL: {target_url} using model {model}")
+    
+    # Static prompt first and the target last, so the prompt prefix is cached by the provider
+    research_input = build_prompt_input(prompt_content, f"Target:\n{target_url}")
+    research_tools = [
+        {
+            "type": "web_search_preview",
+            "search_context_size": search_context_size
+        }
+    ]
+    
+    # Reuse an earlier response for the identical request if one is cached
+    cache_key = make_cache_key(model, research_tools, prompt_content, target_url)
+    if cache is not None and not refresh:
+        cached_response = cache.get(cache_key)
+        if cached_response is not None:
+            return cached_response
+    
+    try:
+        # Same request as target_research_search, awaited on the async client
+        response = await async_create_response_with_retry(
+            client,
+            limiter=rate_limiter,
+            estimated_tokens=estimate_tokens(input_text(research_input)) + RESEARCH_OUTPUT_TOKENS,
+            model=model,
+            tools=research_tools,
+            input=research_input,
+            prompt_cache_key="target_brief"
+        )
+        
+        print(f"Research API call completed successfully for {target_url} ({usage_summary(response)['cached_tokens']} cached input tokens)")
+        if cache is not None:
+            cache.put(cache_key, response)
+        return response
+    except Exception as e:
+        print(f"Error making research API call for {target_url}: {str(e)}")
+        raise e
+
 def extract_text_from_response(response):
     """
     Extract the text content from an OpenAI API response.
@@ -155,7 +268,7 @@ def extract_text_from_response(response):
     
     return response_text
 
-def research_companies(df, research_prompt_file, client, research_model="gpt-4o"):
+def research_companies(df, research_prompt_file, client, research_model="gpt-4o", cache=None, journal=None, refresh_indices=None, search_context_size="high", budget=None):
     """
     Process each row in the DataFrame to research the company using their URL.
     
@@ -164,11 +277,19 @@ def research_companies(df, research_prompt_file, client, research_model="gpt-4o"
         research_prompt_file (str): Path to the research prompt file
         client: The OpenAI client
         research_model (str): The model to use for research
+        cache (ResearchCache): Optional response cache shared by every row
+        journal (CheckpointJournal): Optional journal recording each finished row; rows it already holds are skipped
+        refresh_indices (set): Rows to research again even if the response cache holds them
+        search_context_size (str): Web search context size for every row
+        budget (BudgetGovernor): Optional spend limits; may downgrade the model or stop the loop
         
     Returns:
         pd.DataFrame: The updated DataFrame
     """
     total_rows = len(df)
+    refresh_indices = refresh_indices or set()
+    if budget is not None:
+        budget.plan(total_rows)
     
     # Iterate through each row in the DataFrame
     for index, row in df.iterrows():
@@ -180,6 +301,11 @@ def research_companies(df, research_prompt_file, client, research_model="gpt-4o"
             print(f"Skipping row {index+1} due to missing URL")
             continue
         
+        # Skip rows already finished in an earlier run
+        if journal is not None and index in journal.completed:
+            print(f"Skipping row {index+1}, already researched")
+            continue
+        
         # Create target dictionary
         target_dict = {
             "target_url": row["URL"] if pd.notna(row["URL"]) else "",
@@ -190,56 +316,289 @@ def research_companies(df, research_prompt_file, client, research_model="gpt-4o"
         print(f"Target URL: {target_dict['target_url']}")
         print(f"CEO Name: {target_dict['ceo_name']}")
         
+        # Stop before the call once the budget is spent; finished rows are already journaled
+        model, context_size = research_model, search_context_size
+        if budget is not None:
+            try:
+                model, context_size = budget.request_settings(research_model, search_context_size)
+            except BudgetExceeded:
+                print(f"Stopping at row {index+1}: budget exhausted. Re-run with --resume to continue.")
+                return df
+        
         try:
             # Research the company
             print("\nResearching company...")
-            research_response = target_research_search(client, research_prompt_file, target_dict["target_url"], model=research_model)
+            research_response = target_research_search(client, research_prompt_file, target_dict["target_url"], model=model, cache=cache, refresh=index in refresh_indices, search_context_size=context_size)
             
             if not research_response:
                 print(f"No research data obtained for row {index+1}. Skipping.")
+                mark_failed(df, index, RESEARCH_COLUMNS, model)
                 continue
             
             # Extract the research text from the response
             research_text = extract_text_from_response(research_response)
             
             # Save the research data in the DataFrame
-            df.at[index, "AI Research Endpoint"] = research_model
+            researched_at = response_time(research_response)
+            df.at[index, "AI Research Endpoint"] = model
             df.at[index, "Research Data"] = research_text
+            df.at[index, RESEARCHED_AT_COLUMN] = researched_at
             print(f"Research data preview: {research_text[:150]}...")
             
-            # Save research results after each row
-            df.to_csv(f"research_results_{index+1}.csv", index=False)
-            print(f"Saved research results to research_results_{index+1}.csv")
-            
-            # Small delay to avoid rate limiting
-            print(f"Waiting for 3 seconds before next company...")
-            time.sleep(3)
+            # Checkpoint this row's results
+            if journal is not None:
+                journal.record(index, target_dict["target_url"], {
+                    "AI Research Endpoint": model,
+                    "Research Data": research_text,
+                    RESEARCHED_AT_COLUMN: researched_at
+                })
             
         except Exception as e:
             print(f"\nError processing row {index}: {str(e)}")
+            mark_failed(df, index, RESEARCH_COLUMNS, model)
             # Continue to the next row rather than failing completely
+        
+        if budget is not None:
+            budget.row_finished()
+    
+    print("\nAll rows processed successfully")
+    return df
+
+async def research_companies_async(df, research_prompt_file, client, research_model="gpt-4o", max_concurrency=10, cache=None, journal=None, refresh_indices=None, search_context_size="high", budget=None):
+    """
+    Research every company in the DataFrame concurrently using the async OpenAI client.
+    
+    Up to max_concurrency web-search calls are kept in flight at once. Each result is
+    written back to the row it was requested for, so completion order does not matter.
+    
+    Args:
+        df (pd.DataFrame): The DataFrame to process
+        research_prompt_file (str): Path to the research prompt file
+        client: The AsyncOpenAI client
+        research_model (str): The model to use for research
+        max_concurrency (int): Maximum number of research calls in flight at once
+        cache (ResearchCache): Optional response cache shared by every row
+        journal (CheckpointJournal): Optional journal recording each finished row; rows it already holds are skipped
+        refresh_indices (set): Rows to research again even if the response cache holds them
+        search_context_size (str): Web search context size for every row
+        budget (BudgetGovernor): Optional spend limits; may downgrade the model or stop rows not yet started
+        
+    Returns:
+        pd.DataFrame: The updated DataFrame
+    """
+    total_rows = len(df)
+    refresh_indices = refresh_indices or set()
+    
+    # Load the research prompt once for every row
+    try:
+        prompt_content = default_prompt_registry.get(research_prompt_file).text
+    except (OSError, ValueError) as e:
+        print(f"Failed to load research prompt: {str(e)}. Cannot proceed.")
+        return df
+    
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def research_row(index, target_url):
+        async with semaphore:
+            model, context_size = research_model, search_context_size
+            if budget is not None:
+                # Checked when the row gets a slot, so rows still waiting stop at the hard limit
+                model, context_size = budget.request_settings(research_model, search_context_size)
+            try:
+                research_response = await async_target_research_search(client, prompt_content, target_url, model=model, cache=cache, refresh=index in refresh_indices, search_context_size=context_size)
+            except Exception:
+                mark_failed(df, index, RESEARCH_COLUMNS, model)
+                raise
+        return index, target_url, model, research_response
+    
+    # Queue one task per row that has a URL and is not already finished
+    tasks = []
+    for index, target_url in df["URL"].items():
+        if pd.isna(target_url) or target_url == "":
+            print(f"Skipping row {index+1} due to missing URL")
+            continue
+        if journal is not None and index in journal.completed:
+            continue
+        tasks.append(asyncio.ensure_future(research_row(index, target_url)))
+    
+    print(f"Researching {len(tasks)}/{total_rows} rows with up to {max_concurrency} calls in flight")
+    if budget is not None:
+        budget.plan(len(tasks))
+    
+    completed = 0
+    stopped = 0
+    for task in asyncio.as_completed(tasks):
+        completed += 1
+        try:
+            index, target_url, model, research_response = await task
+        except BudgetExceeded:
+            stopped += 1
+            continue
+        except Exception as e:
+            if budget is not None:
+                budget.row_finished()
+            print(f"\nError processing row ({completed}/{len(tasks)} done): {str(e)}")
+            # Continue with the remaining rows rather than failing completely
+            continue
+        
+        if not research_response:
+            print(f"No research data obtained for row {index+1}. Skipping.")
+            mark_failed(df, index, RESEARCH_COLUMNS, model)
+            continue
+        
+        # Extract the research text and save it against the row it belongs to
+        research_text = extract_text_from_response(research_response)
+        researched_at = response_time(research_response)
+        df.at[index, "AI Research Endpoint"] = model
+        df.at[index, "Research Data"] = research_text
+        df.at[index, RESEARCHED_AT_COLUMN] = researched_at
+        if journal is not None:
+            journal.record(index, target_url, {
+                "AI Research Endpoint": model,
+                "Research Data": research_text,
+                RESEARCHED_AT_COLUMN: researched_at
+            })
+        if budget is not None:
+            budget.row_finished()
+        print(f"--- Finished row {index+1}/{total_rows} ({completed}/{len(tasks)} done) ---")
+    
+    if stopped:
+        print(f"\n{stopped} rows not researched: budget exhausted. Re-run with --resume to continue.")
+        return df
     
     print("\nAll rows processed successfully")
     return df
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Research each lead's company with OpenAI web search.")
+    parser.add_argument("--input", default="Test3 Growth List Startup Plan_usa_leads - Growth List Startup Plan_usa_leads.csv", help="Lead CSV or .store result store to research")
+    parser.add_argument("--output", default="Growth_List_Research.csv", help="CSV to write the research to, or a .store directory for a typed result store")
+    parser.add_argument("--max-concurrency", type=int, default=20, help="Research calls in flight at once when use_async is set")
+    parser.add_argument("--resume", action="store_true", help="Replay the checkpoint journal and skip rows finished in an earlier run")
+    parser.add_argument("--incremental", action="store_true", help="Carry forward research for unchanged, fresh rows of the previous output and only research the rest")
+    parser.add_argument("--cascade", action="store_true", help="Triage leads with a small model first and only research those above the threshold")
+    parser.add_argument("--max-cost", type=float, help="Stop starting new calls once this run has spent this many USD (cheaper model from 80%% of it)")
+    parser.add_argument("--max-tokens", type=int, help="Stop starting new calls once this run has used this many input plus output tokens (cheaper model from 80%% of them)")
+    parser.add_argument("--max-minutes", type=float, help="Stop starting new calls after this many minutes (cheaper model from 80%% of them)")
+    parser.add_argument("--deadline", help="Stop starting new calls at this local time, HH:MM or YYYY-MM-DD HH:MM, without switching to a cheaper model before it; leads are dispatched by priority")
+    parser.add_argument("--max-rows", type=int, help="Only research this many of the highest-priority leads")
+    parser.add_argument("--request-timeout", type=float, help="Give up on a single API attempt after this many seconds (default: per stage, see RESILIENCE_CONFIG)")
+    parser.add_argument("--hedge", action="store_true", help="Send a duplicate of any call still running past the stage's p95 latency and take the first response")
+    parser.add_argument("--metrics-port", type=int, help="Serve Prometheus metrics on this port while the run is in progress")
+    args = parser.parse_args()
+    try:
+        deadline = parse_deadline(args.deadline) if args.deadline else None
+    except ValueError as e:
+        parser.error(str(e))
+    
+    if args.metrics_port:
+        default_metrics.serve_prometheus(args.metrics_port)
+    
     # File paths
-    input_file = "Test3 Growth List Startup Plan_usa_leads - Growth List Startup Plan_usa_leads.csv"
-    output_file = "Growth_List_Research.csv"
+    input_file = args.input
+    output_file = args.output
     research_prompt_file = "target_brief_prompt.txt"  # File containing the research prompt
+    use_async = True  # Research rows concurrently instead of one at a time
+    max_concurrency = args.max_concurrency  # Research calls in flight at once when use_async is set
+    research_model = "gpt-4o"  # Model for the full research call
+    research_search_context_size = "high"  # Web search context size for the full research call
+    cascade_config = dict(CASCADE_CONFIG)  # Triage model, threshold and search context size for --cascade
+    budget_config = dict(BUDGET_CONFIG)  # Soft-limit fraction and the cheaper model and search context used past it
+    schedule_config = dict(SCHEDULE_CONFIG)  # Funding recency half-life and priority weights for dispatch order
+    resilience_config = dict(RESILIENCE_CONFIG)  # Per-attempt timeouts, hedging and circuit breaker thresholds
+    cache_file = "research_cache.sqlite3"  # Responses reused across runs on overlapping lead files
+    index_file = "company_index.sqlite3"  # Results shared by every row of the same company across lead files
+    icp_min_score = None  # Only research leads with at least this ICP score (0-100), e.g. 50
+    icp_top_k = None  # Only research this many of the best-scoring leads
+    freshness_days = DEFAULT_FRESHNESS_DAYS  # In --incremental mode, research older than this is redone
+    
+    # Bound each call's latency: timeouts and the circuit breaker always apply, duplicate slow calls with --hedge
+    resilience_config["hedge"] = args.hedge
+    if args.request_timeout:
+        resilience_config["timeouts"] = {"default": args.request_timeout}
+    default_request_guard.configure(resilience_config)
+    
     print(f"Starting processing with input file: {input_file}")
     
     # Process the CSV file
     df = process_growth_list_csv(input_file)
     print(f"DataFrame loaded with {len(df)} rows and {len(df.columns)} columns")
     
-    # Set up OpenAI API
-    openai_client = setup_openai_api()
-    print("OpenAI client initialized")
+    # Open the research response cache; in --incremental mode cached research expires with freshness_days
+    research_cache = ResearchCache(cache_file, ttl_seconds=min(DEFAULT_TTL_SECONDS, freshness_days * 86400) if args.incremental else DEFAULT_TTL_SECONDS)
+    
+    # Reuse last run's research for leads that have not changed since
+    refresh_indices = set()
+    if args.incremental:
+        df, refresh_keys, refresh_indices = carry_forward_research(df, output_file, freshness_days=freshness_days)
+    
+    # Open the checkpoint journal, restoring finished rows when resuming
+    journal = CheckpointJournal(journal_path_for(output_file), resume=args.resume)
+    if args.resume:
+        df = journal.apply(df)
+    
+    # Score every lead locally against the ICP and keep the best fits for paid research
+    df = score_leads(df)
+    selected_df = select_leads(df, min_score=icp_min_score, top_k=icp_top_k)
+    
+    # Dispatch recently funded, best-fitting leads first so a run cut short has done the most valuable work
+    selected_df, cut_df = schedule_leads(selected_df, max_rows=args.max_rows, config=schedule_config)
+    
+    # Cap this run's spend; the governor downgrades the model near the limit and stops at it
+    budget = BudgetGovernor(args.max_cost, args.max_tokens, args.max_minutes * 60 if args.max_minutes else None, config=budget_config, deadline_seconds=seconds_until(deadline))
+    
+    # Open the company index so each company is researched once across all lead files
+    company_index = CompanyIndex(index_file)
+    freshness_seconds = None
+    if args.incremental:
+        # Changed and stale companies must not be filled from the index either, nor any company researched too long ago
+        company_index.forget(refresh_keys, "research")
+        company_index.forget(refresh_keys, "research triage")
+        freshness_seconds = freshness_days * 86400
+    
+    if args.cascade:
+        # Only leads the triage model rates as a fit get the full research call
+        selected_df = run_cascade(df, selected_df, "research", setup_openai_api(), config=cascade_config, cache=research_cache, index=company_index, budget=budget)
+    
+    if use_async:
+        # Set up async OpenAI API
+        openai_client = setup_async_openai_api()
+        print("Async OpenAI client initialized")
 
-    # Only perform research on the companies
-    updated_df = research_companies(df, research_prompt_file, openai_client, research_model="gpt-4o")
+        # Research the unique companies concurrently
+        researched_df = run_deduplicated(selected_df, "research", RESEARCH_COLUMNS, lambda work_df: asyncio.run(research_companies_async(work_df, research_prompt_file, openai_client, research_model=research_model, max_concurrency=max_concurrency, cache=research_cache, journal=journal, refresh_indices=refresh_indices, search_context_size=research_search_context_size, budget=budget)), index=company_index, timestamp_column=RESEARCHED_AT_COLUMN, max_age_seconds=freshness_seconds)
+    else:
+        # Set up OpenAI API
+        openai_client = setup_openai_api()
+        print("OpenAI client initialized")
+
+        # Only perform research on the unique companies
+        researched_df = run_deduplicated(selected_df, "research", RESEARCH_COLUMNS, lambda work_df: research_companies(work_df, research_prompt_file, openai_client, research_model=research_model, cache=research_cache, journal=journal, refresh_indices=refresh_indices, search_context_size=research_search_context_size, budget=budget), index=company_index, timestamp_column=RESEARCHED_AT_COLUMN, max_age_seconds=freshness_seconds)
+    
+    # Write the results back into the full list, leaving pruned leads unresearched
+    updated_df = df
+    result_columns = RESEARCH_COLUMNS + [column for column in [RESEARCHED_AT_COLUMN] if column in researched_df.columns]
+    updated_df.loc[researched_df.index, result_columns] = researched_df[result_columns]
+    if args.incremental:
+        # Record what each row's research was based on, for the next incremental run
+        updated_df = stamp_research(updated_df)
+    
+    company_index.close()
+    journal.close()
+    print(f"Research cache stats: {research_cache.stats()}")
+    research_cache.close()
+    
+    # Report spend against the budget
+    print(f"Budget used: {budget.describe()}")
+    if budget.exhausted:
+        print("Budget exhausted before every row was processed; re-run with --resume to continue")
+    
+    # Report the highest-priority leads left for the next run
+    report_deferred(researched_df, cut_df, RESEARCH_COLUMNS, output_file)
+    
+    # Save per-stage latency, token, web search and cost metrics next to the output
+    default_metrics.write_json(metrics_path_for(output_file))
     
-    # Save the updated DataFrame to a CSV file
-    updated_df.to_csv(output_file, index=False)
+    # Save the updated DataFrame to a CSV file or result store
+    save_results(updated_df, output_file)
     print(f"Updated DataFrame saved to {output_file}")
\ No newline at end of file
@@ -0,0 +1,335 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# USD per 1M tokens: (input, cached input, output); longest matching prefix wins
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "o4-mini": (1.10, 0.275, 4.40)
+}
+
+# USD per web search tool call
+WEB_SEARCH_CALL_PRICE = 0.025
+
+# Histogram bucket upper bounds in seconds
+LATENCY_BUCKETS = [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120]
+
+def model_prices(model):
+    """
+    Look up the token prices for a model, allowing dated names such as "gpt-4o-2024-08-06".
+
+    Args:
+        model (str): The model name from the request or response
+
+    Returns:
+        tuple: (input, cached input, output) USD per 1M tokens, or None if unknown
+    """
+    matches = [name for name in MODEL_PRICES if model == name or model.startswith(f"{name}-")]
+    if not matches:
+        return None
+    return MODEL_PRICES[max(matches, key=len)]
+
+def count_web_searches(response) -> int:
+    """
+    Count the web search tool calls in a response.
+
+    Args:
+        response: The response from the OpenAI API
+
+    Returns:
+        int: The number of web_search_call output items
+    """
+    return sum(1 for item in getattr(response, "output", None) or [] if getattr(item, "type", "") == "web_search_call")
+
+def request_cost(model, input_tokens, cached_tokens, output_tokens, web_searches) -> float:
+    """
+    Compute the dollar cost of one request.
+
+    Args:
+        model (str): The model name
+        input_tokens (int): Input tokens, including cached ones
+        cached_tokens (int): Input tokens served from the prompt cache
+        output_tokens (int): Output tokens
+        web_searches (int): Web search tool calls
+
+    Returns:
+        float: Cost in USD; token cost is 0 for models missing from MODEL_PRICES
+    """
+    cost = web_searches * WEB_SEARCH_CALL_PRICE
+    prices = model_prices(model)
+    if prices is not None:
+        input_price, cached_price, output_price = prices
+        cost += ((input_tokens - cached_tokens) * input_price + cached_tokens * cached_price + output_tokens * output_price) / 1_000_000
+    return cost
+
+def finite_or_none(value):
+    """
+    Return value, or None if it is infinite.
+    """
+    return None if value == float("inf") else value
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus layout.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """
+        Args:
+            buckets (list): Ascending bucket upper bounds
+        """
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """
+        Add one observation.
+        """
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[position] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q) -> float:
+        """
+        Estimate a quantile as the upper bound of the bucket that contains it.
+
+        Args:
+            q (float): The quantile, e.g. 0.95
+
+        Returns:
+            float: The estimate, inf if it falls past the last bucket, 0.0 with no observations
+        """
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + [float("inf")], self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return float("inf")
+
+class Metrics:
+    """
+    Thread-safe per-stage metrics for API calls, exportable as Prometheus text or JSON.
+
+    Stages are free-form labels; the scripts use their prompt_cache_key
+    ("target_brief", "copywrite", "pipeline_copy").
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.stages = {}
+
+    def _stage(self, stage):
+        if stage not in self.stages:
+            self.stages[stage] = {
+                "requests": 0,
+                "errors": 0,
+                "retries": 0,
+                "input_tokens": 0,
+                "cached_tokens": 0,
+                "output_tokens": 0,
+                "web_searches": 0,
+                "cost_usd": 0.0,
+                "cost_by_model": {},
+                "latency_seconds": Histogram(),
+                "queue_seconds": Histogram()
+            }
+        return self.stages[stage]
+
+    def record_request(self, stage, model, latency, queue_delay, retries, response=None, error=None):
+        """
+        Record one API call, successful or not.
+
+        Args:
+            stage (str): The pipeline stage the call belongs to
+            model (str): The requested model
+            latency (float): Wall time from the first attempt to the final result, in seconds
+            queue_delay (float): Seconds spent waiting on the rate limiter across attempts
+            retries (int): Retries after the first attempt
+            response: The response, if the call succeeded
+            error (Exception): The final error, if the call failed
+        """
+        usage = getattr(response, "usage", None)
+        details = getattr(usage, "input_tokens_details", None)
+        input_tokens = getattr(usage, "input_tokens", 0) or 0
+        cached_tokens = getattr(details, "cached_tokens", 0) or 0
+        output_tokens = getattr(usage, "output_tokens", 0) or 0
+        web_searches = count_web_searches(response) if response is not None else 0
+        cost = request_cost(getattr(response, "model", None) or model, input_tokens, cached_tokens, output_tokens, web_searches)
+
+        with self.lock:
+            metrics = self._stage(stage)
+            metrics["requests"] += 1
+            metrics["errors"] += error is not None
+            metrics["retries"] += retries
+            metrics["input_tokens"] += input_tokens
+            metrics["cached_tokens"] += cached_tokens
+            metrics["output_tokens"] += output_tokens
+            metrics["web_searches"] += web_searches
+            metrics["cost_usd"] += cost
+            metrics["cost_by_model"][model] = metrics["cost_by_model"].get(model, 0.0) + cost
+            metrics["latency_seconds"].observe(latency)
+            metrics["queue_seconds"].observe(queue_delay)
+
+    def totals(self) -> dict:
+        """
+        Sum requests, tokens and cost over every stage.
+
+        Returns:
+            dict: "requests", "tokens" (input plus output) and "cost_usd"
+        """
+        with self.lock:
+            return {
+                "requests": sum(metrics["requests"] for metrics in self.stages.values()),
+                "tokens": sum(metrics["input_tokens"] + metrics["output_tokens"] for metrics in self.stages.values()),
+                "cost_usd": sum(metrics["cost_usd"] for metrics in self.stages.values())
+            }
+
+    def summary(self) -> dict:
+        """
+        Summarize every stage with totals and latency/queue percentiles.
+
+        Returns:
+            dict: JSON-serializable summary
+        """
+        with self.lock:
+            stages = {}
+            for stage, metrics in self.stages.items():
+                summary = {key: value for key, value in metrics.items() if not isinstance(value, Histogram)}
+                summary["cost_usd"] = round(summary["cost_usd"], 6)
+                summary["cost_by_model"] = {model: round(cost, 6) for model, cost in summary["cost_by_model"].items()}
+                for name in ("latency_seconds", "queue_seconds"):
+                    histogram = metrics[name]
+                    summary[name] = {
+                        "count": histogram.count,
+                        "mean": histogram.sum / histogram.count if histogram.count else 0.0,
+                        # Past the last bucket is reported as null, since JSON has no infinity
+                        "p50": finite_or_none(histogram.quantile(0.5)),
+                        "p95": finite_or_none(histogram.quantile(0.95)),
+                        "p99": finite_or_none(histogram.quantile(0.99)),
+                        "buckets": dict(zip([str(bound) for bound in histogram.buckets] + ["+Inf"], histogram.counts))
+                    }
+                stages[stage] = summary
+
+            return {
+                "started_at": self.started_at,
+                "elapsed_seconds": time.time() - self.started_at,
+                "total_cost_usd": round(sum(stage["cost_usd"] for stage in stages.values()), 6),
+                "stages": stages
+            }
+
+    def to_prometheus(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition text
+        """
+        counters = [
+            ("promptsales_requests_total", "requests", "API calls made"),
+            ("promptsales_request_errors_total", "errors", "API calls that failed after all retries"),
+            ("promptsales_retries_total", "retries", "Retries after throttled or transient failures"),
+            ("promptsales_input_tokens_total", "input_tokens", "Input tokens billed"),
+            ("promptsales_cached_input_tokens_total", "cached_tokens", "Input tokens served from the prompt cache"),
+            ("promptsales_output_tokens_total", "output_tokens", "Output tokens billed"),
+            ("promptsales_web_searches_total", "web_searches", "Web search tool calls"),
+            ("promptsales_cost_usd_total", "cost_usd", "Estimated spend in USD")
+        ]
+        lines = []
+        with self.lock:
+            for name, key, description in counters:
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} counter")
+                for stage, metrics in self.stages.items():
+                    lines.append(f'{name}{{stage="{stage}"}} {metrics[key]}')
+
+            for name, key, description in [
+                ("promptsales_request_latency_seconds", "latency_seconds", "Wall time per API call including retries"),
+                ("promptsales_queue_delay_seconds", "queue_seconds", "Time spent waiting on the rate limiter")
+            ]:
+                lines.append(f"# HELP {name} {description}")
+                lines.append(f"# TYPE {name} histogram")
+                for stage, metrics in self.stages.items():
+                    histogram = metrics[key]
+                    cumulative = 0
+                    for bound, count in zip([str(bound) for bound in histogram.buckets] + ["+Inf"], histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum}')
+                    lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path):
+        """
+        Write the summary to a JSON file.
+
+        Args:
+            path (str): Where to write the summary
+        """
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.summary(), file, indent=2)
+        print(f"Metrics summary saved to {path}")
+
+    def serve_prometheus(self, port, host="127.0.0.1"):
+        """
+        Serve the Prometheus text format at /metrics from a background thread.
+
+        Args:
+            port (int): The port to listen on
+            host (str): The interface to bind
+
+        Returns:
+            ThreadingHTTPServer: The running server; call shutdown() to stop it
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                data = metrics.to_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("content-type", "text/plain; version=0.0.4")
+                self.send_header("content-length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Serving Prometheus metrics at http://{host}:{port}/metrics")
+        return server
+
+# Metrics shared by every script in this repo
+default_metrics = Metrics()
+
+def metrics_path_for(output_file) -> str:
+    """
+    Return the metrics summary path that belongs to an output CSV.
+
+    Args:
+        output_file (str): The output CSV path
+
+    Returns:
+        str: "<output_file>.metrics.json"
+    """
+    return f"{output_file}.metrics.json"